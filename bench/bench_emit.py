@@ -0,0 +1,51 @@
+# coding:utf-8
+# 求值性能测试，先读出全部行，只计时compile_row()生成的求值函数，不含读取表格的时间
+# 用法: python bench/bench_emit.py [数据行数] [重复次数]
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(bench_dir))
+sys.path.insert(0, bench_dir)
+import xlrd
+import xls2lua
+import xlsxgen
+
+
+def main(argv):
+    nrows = int(argv[1]) if len(argv) > 1 else 100000
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    work_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(work_dir, 'bench.xlsx')
+        xlsxgen.write_example_xlsx(file_path, 1, nrows)
+        workbook = xlrd.open_workbook(file_path)
+        sheet = workbook.sheet_by_index(0)
+        rows = [sheet.row_values(y) for y in range(sheet.nrows)]
+    finally:
+        shutil.rmtree(work_dir)
+    rows = [values for values in rows if xls2lua.is_data_row(values)]
+    header = rows[:xls2lua.header_row_count]
+    width = len(header[0])
+    for values in rows:
+        values.extend([''] * (width - len(values)))
+    rows = rows[xls2lua.header_row_count:]
+
+    best = None
+    for _ in range(repeat):
+        parser = xls2lua.build_parser_tree(sheet.name, header)
+        xls2lua.UniqueIndex().bind([(sheet.name, parser)])
+        emit_row = parser.compile_row()
+        start = time.clock()
+        for row_number, values in enumerate(rows):
+            '[%s]=%s,\n' % emit_row((sheet.name, row_number), values)
+        cost = time.clock() - start
+        best = cost if best is None else min(best, cost)
+    print '%d rows: %.3fs, %.0f rows/s' % (len(rows), best, len(rows) / best)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
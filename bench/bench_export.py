@@ -0,0 +1,49 @@
+# coding:utf-8
+# 导出性能测试，生成使用example/test.xlsx表头的xlsx文件，计时xls2lua()整个导出过程
+# 用法: python bench/bench_export.py [每个sheet的数据行数] [sheet数] [重复次数] [sheet_jobs]
+# 输出各次中最短的cpu时间和耗时、按cpu时间计算的每秒导出行数和进程的峰值内存，
+# sheet_jobs大于1时工作进程的cpu时间不计入，以耗时为准
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(bench_dir))
+import xls2lua
+
+
+def main(argv):
+    nrows = int(argv[1]) if len(argv) > 1 else 100000
+    nsheets = int(argv[2]) if len(argv) > 2 else 1
+    repeat = int(argv[3]) if len(argv) > 3 else 5
+    sheet_jobs = int(argv[4]) if len(argv) > 4 else 0
+    work_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(work_dir, 'bench.xlsx')
+        out_file_path = os.path.join(work_dir, 'bench.lua')
+        # 在子进程中生成文件，生成时占用的内存不计入峰值内存
+        subprocess.check_call([sys.executable, os.path.join(bench_dir, 'xlsxgen.py'),
+                               file_path, str(nsheets), str(nrows)])
+        best_cpu = best_wall = None
+        for _ in range(repeat):
+            start_cpu = time.clock()
+            start_wall = time.time()
+            xls2lua.xls2lua(file_path, out_file_path, sheet_jobs=sheet_jobs)
+            cost_cpu = time.clock() - start_cpu
+            cost_wall = time.time() - start_wall
+            best_cpu = cost_cpu if best_cpu is None else min(best_cpu, cost_cpu)
+            best_wall = cost_wall if best_wall is None else min(best_wall, cost_wall)
+        total_rows = nrows * nsheets
+        print '%d rows x %d sheets: cpu %.3fs, wall %.3fs, %.0f rows/s, output %d bytes' % (
+            nrows, nsheets, best_cpu, best_wall, total_rows / best_cpu, os.path.getsize(out_file_path))
+        print 'peak rss %.1f MB' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,66 @@
+# coding:utf-8
+# add_quout性能测试，语料为example目录下各表格的文本单元格，加上较长的多语言描述文本
+# 与逐字符拼接的旧实现对比，并检查两者输出一致
+# 用法: python bench/bench_quout.py [重复次数]
+import os
+import sys
+import glob
+import timeit
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(bench_dir)
+sys.path.insert(0, root_dir)
+import xlrd
+import xls2lua
+
+
+# 原来的实现，逐字符拼接
+def add_quout_loop(text):
+    out = ''
+    for c in text:
+        if c == '"':
+            out += '\\"'
+        elif c == '\\':
+            out += '\\\\'
+        elif c == '\n':
+            out += '\\n'
+        elif c == '\r':
+            out += '\\r'
+        else:
+            out += c
+    return '"' + out + '"'
+
+
+# 收集语料，返回(全部文本, 不需要转义的文本)
+def load_corpus():
+    texts = []
+    for file_path in sorted(glob.glob(os.path.join(root_dir, 'example', '*.xls*'))):
+        workbook = xlrd.open_workbook(file_path)
+        for sheet in workbook.sheets():
+            for y in range(sheet.nrows):
+                texts.extend(v for v in sheet.row_values(y) if isinstance(v, unicode) and v != '')
+    texts += [
+        u'普通的物品描述，没有任何需要转义的字符。' * 20,
+        u'A plain item description without anything to escape. ' * 20,
+        u'第一行\r\n第二行 "引用" \\路径\\' * 30,
+        u'sword_01',
+        u'',
+    ]
+    plain = [text for text in texts if xls2lua.quout_escape_pattern.search(text) is None]
+    return texts, plain
+
+
+def main(argv):
+    number = int(argv[1]) if len(argv) > 1 else 5000
+    texts, plain = load_corpus()
+    for text in texts + [u'a\\"\n\r\\\\']:
+        assert xls2lua.add_quout(text) == add_quout_loop(text), text
+    print '%d texts, %d without escapes, %d passes' % (len(texts), len(plain), number)
+    for name, corpus in (('all', texts), ('plain', plain)):
+        for func in (add_quout_loop, xls2lua.add_quout):
+            cost = min(timeit.repeat(lambda: [func(text) for text in corpus], number=number, repeat=3))
+            print '%-6s %-15s %.3fs' % (name, func.__name__, cost)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,44 @@
+# coding:utf-8
+# RK值批量解码(xlrd.sheet.unpack_RK_values)的正确性检查和性能测试，python 2和python 3都可以运行
+# 先检查随机的32位RK值批量解码和逐个用unpack_RK解码的结果一致，再按MULRK记录的大小分组计时两种解码方式
+# 用法: python bench/bench_rk.py [RK值个数] [每个MULRK的单元格数] [重复次数]
+import sys
+import random
+from struct import pack
+
+import benchutil
+from xlrd.sheet import unpack_RK, unpack_RK_values
+
+
+def decode_each(groups):
+    return [[unpack_RK(pack('<i', rk)) for rk in rks] for rks in groups]
+
+
+def decode_bulk(groups):
+    return [unpack_RK_values(rks) for rks in groups]
+
+
+# 按位比较，NaN也能比较
+def same_floats(a, b):
+    return len(a) == len(b) and all(pack('<d', x) == pack('<d', y) for x, y in zip(a, b))
+
+
+def main(argv):
+    nvalues = int(argv[1]) if len(argv) > 1 else 100000
+    group_size = int(argv[2]) if len(argv) > 2 else 30
+    repeat = int(argv[3]) if len(argv) > 3 else 5
+    rand = random.Random(0)
+    rks = [rand.randint(-0x80000000, 0x7fffffff) for _ in range(nvalues)]
+    groups = [tuple(rks[i:i + group_size]) for i in range(0, nvalues, group_size)]
+    each = decode_each(groups)
+    bulk = decode_bulk(groups)
+    assert all(same_floats(a, b) for a, b in zip(each, bulk)), 'unpack_RK_values disagrees with unpack_RK'
+    print('%d random RK values agree, %d per MULRK, best of %d' % (nvalues, group_size, repeat))
+    cost, _ = benchutil.best_of(lambda: decode_each(groups), repeat)
+    print('%-20s %7.3fs' % ('unpack_RK', cost))
+    cost, _ = benchutil.best_of(lambda: decode_bulk(groups), repeat)
+    print('%-20s %7.3fs' % ('unpack_RK_values', cost))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,64 @@
+# coding:utf-8
+# xls读取性能测试，python 2和python 3都可以运行
+# 用xlsgen生成BIFF8文件，计时完整读取(formatting_info关和开)以及on_demand打开后用Book.iter_rows
+# 逐行读取全部sheet的cpu时间，并检查各种方式读出的单元格一致，包括formatting_info开启时的iter_rows
+# (生成的sheet带有合并单元格)
+# 指定--count-records时先用xlrd.count_records输出测试文件中各类记录的数量
+# 用法: python bench/bench_xls.py [--count-records] [每个sheet的行数] [sheet数] [列数] [mixed|numbers|text|records] [重复次数]
+import os
+import sys
+import shutil
+import tempfile
+
+import benchutil
+import xlrd
+
+
+def sheet_values(workbook):
+    return [[sheet.row_values(rowx) for rowx in range(sheet.nrows)] for sheet in workbook.sheets()]
+
+
+def iter_sheet_values(workbook):
+    return [[values for _, values in workbook.iter_rows(sheet_name)] for sheet_name in workbook.sheet_names()]
+
+
+def iter_all_rows(workbook):
+    for sheet_name in workbook.sheet_names():
+        for _ in workbook.iter_rows(sheet_name):
+            pass
+
+
+def main(argv):
+    count_records = '--count-records' in argv
+    argv = [arg for arg in argv if arg != '--count-records']
+    nrows = int(argv[1]) if len(argv) > 1 else 65535
+    nsheets = int(argv[2]) if len(argv) > 2 else 1
+    ncols = int(argv[3]) if len(argv) > 3 else 20
+    kind = argv[4] if len(argv) > 4 else 'mixed'
+    repeat = int(argv[5]) if len(argv) > 5 else 3
+    work_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(work_dir, 'bench.xls')
+        benchutil.generate_isolated('xlsgen', 'write_generated_xls', file_path, nsheets, nrows, ncols, kind)
+        print('%s: %d sheets x %d rows x %d cols, %.1f MB, best of %d' % (
+            kind, nsheets, nrows, ncols, os.path.getsize(file_path) / 1048576.0, repeat))
+        if count_records:
+            xlrd.count_records(file_path)
+        # 只计时解析，读出的单元格在计时之外比较
+        cost, workbook = benchutil.best_of(lambda: xlrd.open_workbook(file_path), repeat)
+        print('%-32s %7.2fs' % ('open_workbook', cost))
+        cells = sheet_values(workbook)
+        cost, workbook = benchutil.best_of(lambda: xlrd.open_workbook(file_path, formatting_info=True), repeat)
+        print('%-32s %7.2fs' % ('open_workbook, formatting_info', cost))
+        assert sheet_values(workbook) == cells
+        workbook = None
+        cost, _ = benchutil.best_of(lambda: iter_all_rows(xlrd.open_workbook(file_path, on_demand=True)), repeat)
+        print('%-32s %7.2fs' % ('on_demand + iter_rows', cost))
+        assert iter_sheet_values(xlrd.open_workbook(file_path, on_demand=True)) == cells
+        assert iter_sheet_values(xlrd.open_workbook(file_path, on_demand=True, formatting_info=True)) == cells
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,65 @@
+# coding:utf-8
+# xlsx解析后端(xml_backend为etree或expat)的性能测试，python 2和python 3都可以运行
+# 生成以数字为主的xlsx和本地化表式的xlsx，计时open_workbook读取全部sheet的cpu时间并统计峰值内存，
+# 同时检查两种后端读出的单元格一致，每次测试在新进程中执行
+# 用法: python bench/bench_xlsx_backend.py [数字表每个sheet的行数] [本地化表的共享字符串数] [重复次数]
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+
+import benchutil
+import xlrd
+
+backends = ('etree', 'expat')
+
+
+# 在子进程中执行一次测试，输出单元格内容的哈希和测试结果
+def run_case(file_path, xml_backend):
+    start = benchutil.clock()
+    workbook = xlrd.open_workbook(file_path, xml_backend=xml_backend)
+    cost = benchutil.clock() - start
+    h = hashlib.sha1()
+    for sheet in workbook.sheets():
+        for rowx in range(sheet.nrows):
+            h.update(repr((list(sheet.row_types(rowx)), sheet.row_values(rowx))).encode('utf-8'))
+    print(h.hexdigest())
+    benchutil.report_isolated(cost)
+
+
+def main(argv):
+    numeric_rows = int(argv[1]) if len(argv) > 1 else 25000
+    nstrings = int(argv[2]) if len(argv) > 2 else 300000
+    repeat = int(argv[3]) if len(argv) > 3 else 3
+    work_dir = tempfile.mkdtemp()
+    try:
+        numeric_path = os.path.join(work_dir, 'numeric.xlsx')
+        loc_path = os.path.join(work_dir, 'loc.xlsx')
+        benchutil.generate_isolated('xlsxgen', 'write_numeric_xlsx', numeric_path, 4, numeric_rows, 20)
+        benchutil.generate_isolated('xlsxgen', 'write_loc_xlsx', loc_path, nstrings, 200, nstrings // 3)
+        print('best of %d, open_workbook loading every sheet' % repeat)
+        print('%-40s %18s %18s' % ('', 'etree', 'expat'))
+        for label, file_path in (
+                ('numeric.xlsx (4 x %d rows x 20 cols)' % numeric_rows, numeric_path),
+                ('loc.xlsx (%d shared strings)' % nstrings, loc_path)):
+            results = []
+            digests = set()
+            for xml_backend in backends:
+                runs = []
+                for _ in range(repeat):
+                    cost, rss, output = benchutil.run_isolated_output(__file__, ['--case', file_path, xml_backend])
+                    digests.add(output[-1])
+                    runs.append((cost, rss))
+                results.append('%6.2fs / %4.0f MB' % (min(cost for cost, _ in runs), min(rss for _, rss in runs)))
+            assert len(digests) == 1, 'backends read different cells from %s' % label
+            print('%-40s %18s %18s' % (label, results[0], results[1]))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--case']:
+        run_case(sys.argv[2], sys.argv[3])
+    else:
+        main(sys.argv)
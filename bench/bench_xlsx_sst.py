@@ -0,0 +1,53 @@
+# coding:utf-8
+# xlsx共享字符串表延迟解码(lazy_sst)的性能测试，python 2和python 3都可以运行
+# 生成本地化表式的xlsx(见xlsxgen.write_loc_xlsx)，分别只读取小sheet S1和读取全部sheet，
+# 对比lazy_sst开关时open_workbook的cpu时间和峰值内存，每次测试在新进程中执行
+# 用法: python bench/bench_xlsx_sst.py [共享字符串数] [S2的行数] [重复次数]
+import os
+import sys
+import shutil
+import tempfile
+
+import benchutil
+import xlrd
+
+
+# 在子进程中执行一次测试
+def run_case(file_path, lazy_sst, only_s1):
+    sheet_filter = None
+    if only_s1:
+        sheet_filter = lambda sheet_name: sheet_name == 'S1'
+    start = benchutil.clock()
+    workbook = xlrd.open_workbook(file_path, lazy_sst=lazy_sst, sheet_filter=sheet_filter)
+    cost = benchutil.clock() - start
+    for sheet in workbook.sheets():
+        assert sheet.nrows > 0
+    benchutil.report_isolated(cost)
+
+
+def main(argv):
+    nstrings = int(argv[1]) if len(argv) > 1 else 300000
+    big_rows = int(argv[2]) if len(argv) > 2 else 100000
+    repeat = int(argv[3]) if len(argv) > 3 else 3
+    work_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(work_dir, 'loc.xlsx')
+        benchutil.generate_isolated('xlsxgen', 'write_loc_xlsx', file_path, nstrings, 200, big_rows)
+        print('%d shared strings, S1 200 rows, S2 %d rows, best of %d' % (nstrings, big_rows, repeat))
+        print('%-12s %18s %18s' % ('', 'eager', 'lazy'))
+        for only_s1 in (1, 0):
+            results = []
+            for lazy_sst in (0, 1):
+                runs = [benchutil.run_isolated(__file__, ['--case', file_path, lazy_sst, only_s1])
+                        for _ in range(repeat)]
+                results.append('%6.2fs / %4.0f MB' % (min(cost for cost, _ in runs), min(rss for _, rss in runs)))
+            print('%-12s %18s %18s' % ('only S1' if only_s1 else 'all sheets', results[0], results[1]))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--case']:
+        run_case(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main(sys.argv)
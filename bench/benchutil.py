@@ -0,0 +1,59 @@
+# coding:utf-8
+# 基准测试脚本共用的计时和内存统计，python 2和python 3都可以运行
+import os
+import sys
+import time
+import resource
+import subprocess
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(bench_dir)
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+# 进程的cpu时间
+clock = getattr(time, 'process_time', None) or time.clock
+
+
+# 重复调用func，返回最短的cpu时间和最后一次的返回值
+def best_of(func, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = clock()
+        result = func()
+        cost = clock() - start
+        best = cost if best is None else min(best, cost)
+    return best, result
+
+
+# 当前进程的峰值内存，单位MB
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# 在新的python进程中执行一次测试，各次测试的峰值内存互不影响
+# 子进程最后一行输出为"<cpu时间> <峰值内存>"，返回(cpu时间, 峰值内存, 之前各行的输出)
+def run_isolated_output(script, args):
+    output = subprocess.check_output([sys.executable, script] + [str(arg) for arg in args])
+    lines = output.decode('utf-8').strip().split('\n')
+    cost, rss = lines[-1].split()
+    return float(cost), float(rss), lines[:-1]
+
+
+# 同run_isolated_output，只返回(cpu时间, 峰值内存)
+def run_isolated(script, args):
+    cost, rss, _ = run_isolated_output(script, args)
+    return cost, rss
+
+
+# 子进程中输出一次测试的结果，供run_isolated读取
+def report_isolated(cost):
+    print('%.3f %.1f' % (cost, peak_rss_mb()))
+
+
+# 在新的python进程中调用bench目录下模块的函数生成测试文件，生成时占用的内存不会留在当前进程中；
+# linux下子进程exec后仍沿用fork时的峰值内存，当前进程内存小时run_isolated的统计才准确
+def generate_isolated(module, func, *args):
+    code = 'import sys; sys.path.insert(0, %r); import %s; %s.%s(*%r)' % (bench_dir, module, module, func, args)
+    subprocess.check_call([sys.executable, '-c', code])
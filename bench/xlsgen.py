@@ -0,0 +1,278 @@
+# coding:utf-8
+# 生成基准测试用的xls文件，只依赖标准库，python 2和python 3都可以运行
+# 文件内容为BIFF8工作簿流本身，不封装为OLE2复合文档，xlrd可以直接读取这样的文件
+# 单元格按excel的方式写出：每32行一组ROW记录，随后是这些行的单元格和DBCELL，
+# 字符串写入共享字符串表(SST)，同一行中相邻的可用RK表示的数字合并为MULRK记录，相邻的空白单元格合并为MULBLANK
+# 用法: python bench/xlsgen.py <输出文件> [sheet数] [每个sheet的行数] [列数] [mixed|numbers|text|records]
+import sys
+from struct import pack, unpack
+
+XL_BOF = 0x809
+XL_EOF = 0x0a
+XL_CODEPAGE = 0x42
+XL_WINDOW1 = 0x3d
+XL_FONT = 0x31
+XL_XF = 0xe0
+XL_BOUNDSHEET = 0x85
+XL_SST = 0xfc
+XL_CONTINUE = 0x3c
+XL_DIMENSION = 0x200
+XL_ROW = 0x208
+XL_LABELSST = 0xfd
+XL_NUMBER = 0x203
+XL_RK = 0x27e
+XL_MULRK = 0xbd
+XL_BLANK = 0x201
+XL_MULBLANK = 0xbe
+XL_FORMULA = 0x06
+XL_DBCELL = 0xd7
+XL_WINDOW2 = 0x23e
+XL_MERGEDCELLS = 0xe5
+
+# 记录数据的最大长度，超出部分写入CONTINUE记录
+max_record_size = 8224
+# 单元格使用的XF序号，前15个为样式XF
+cell_xf = 15
+
+if sys.version_info[0] >= 3:
+    text_type = str
+    number_types = (int, float)
+else:
+    text_type = unicode
+    number_types = (int, long, float)
+
+
+# 只有格式的空白单元格，作为单元格的值使用
+class Blank(object):
+    pass
+
+
+BLANK = Blank()
+
+
+# 公式单元格，value为缓存的计算结果，公式本身固定为常量1
+class Formula(object):
+    def __init__(self, value):
+        self.value = value
+
+
+def record(code, data):
+    return pack('<HH', code, len(data)) + data
+
+
+# BIFF8字符串，只含latin-1字符时按单字节压缩存储
+def biff_string(text, len_format):
+    try:
+        return pack(len_format, len(text)) + b'\x00' + text.encode('latin-1')
+    except UnicodeEncodeError:
+        return pack(len_format, len(text)) + b'\x01' + text.encode('utf-16-le')
+
+
+# 数字可以用RK表示时返回RK值，否则返回None
+def rk_value(value):
+    if isinstance(value, int) and -0x20000000 <= value < 0x20000000:
+        return (value << 2) | 2
+    value = float(value)
+    # 整数的百分之一
+    hundredths = int(round(value * 100))
+    if -0x20000000 <= hundredths < 0x20000000 and hundredths / 100.0 == value:
+        return (hundredths << 2) | 3
+    # 低34位为0的浮点数
+    packed = pack('<d', value)
+    if packed[:4] == b'\x00\x00\x00\x00' and ord(packed[4:5]) & 3 == 0:
+        return unpack('<i', packed[4:])[0]
+    return None
+
+
+# 共享字符串表，返回SST记录和后续的CONTINUE记录
+# 字符串的字符跨越记录边界时，CONTINUE记录以该字符串的选项字节开头
+def sst_records(strings):
+    records = []
+    data = [pack('<ii', len(strings), len(strings))]
+    size = 8
+    for text in strings:
+        encoded = biff_string(text, '<H')
+        header, chars = encoded[:3], encoded[3:]
+        char_size = 2 if header[2:3] == b'\x01' else 1
+        if size + len(header) + char_size > max_record_size:
+            records.append(b''.join(data))
+            data = []
+            size = 0
+        data.append(header)
+        size += len(header)
+        while size + len(chars) > max_record_size:
+            room = (max_record_size - size) // char_size * char_size
+            data.append(chars[:room])
+            chars = chars[room:]
+            records.append(b''.join(data))
+            data = [header[2:3]]
+            size = 1
+        data.append(chars)
+        size += len(chars)
+    records.append(b''.join(data))
+    return record(XL_SST, records[0]) + b''.join(record(XL_CONTINUE, r) for r in records[1:])
+
+
+# 一行单元格的记录
+def row_cell_records(rowx, values, string_index, strings):
+    out = []
+    colx = 0
+    ncols = len(values)
+    while colx < ncols:
+        value = values[colx]
+        if value is None or value == '':
+            colx += 1
+            continue
+        if isinstance(value, (text_type, str)):
+            if not isinstance(value, text_type):
+                value = value.decode('utf-8')
+            index = string_index.get(value)
+            if index is None:
+                index = string_index[value] = len(strings)
+                strings.append(value)
+            out.append(record(XL_LABELSST, pack('<HHHi', rowx, colx, cell_xf, index)))
+            colx += 1
+            continue
+        if value is BLANK:
+            # 相邻的空白单元格合并为MULBLANK
+            end = colx + 1
+            while end < ncols and values[end] is BLANK:
+                end += 1
+            if end - colx == 1:
+                out.append(record(XL_BLANK, pack('<HHH', rowx, colx, cell_xf)))
+            else:
+                out.append(record(XL_MULBLANK, pack('<HH', rowx, colx) +
+                                  pack('<H', cell_xf) * (end - colx) + pack('<H', end - 1)))
+            colx = end
+            continue
+        if isinstance(value, Formula):
+            out.append(record(XL_FORMULA, pack('<HHHdHi', rowx, colx, cell_xf, float(value.value), 0, 0) +
+                              pack('<H', 3) + b'\x1e\x01\x00'))
+            colx += 1
+            continue
+        rk = rk_value(value)
+        if rk is None:
+            out.append(record(XL_NUMBER, pack('<HHHd', rowx, colx, cell_xf, float(value))))
+            colx += 1
+            continue
+        # 相邻的RK数字合并为MULRK
+        rks = [rk]
+        end = colx + 1
+        while end < ncols and isinstance(values[end], number_types):
+            next_rk = rk_value(values[end])
+            if next_rk is None:
+                break
+            rks.append(next_rk)
+            end += 1
+        if len(rks) == 1:
+            out.append(record(XL_RK, pack('<HHHi', rowx, colx, cell_xf, rk)))
+        else:
+            out.append(record(XL_MULRK, pack('<HH', rowx, colx) +
+                              b''.join(pack('<Hi', cell_xf, r) for r in rks) + pack('<H', end - 1)))
+        colx = end
+    return b''.join(out)
+
+
+# merged_cells为合并单元格区域(rlo, rhi, clo, chi)的列表，与xlrd的Sheet.merged_cells相同，不含rhi和chi
+def sheet_stream(rows, string_index, strings, merged_cells=()):
+    ncols = max([len(values) for values in rows] or [0])
+    out = [record(XL_BOF, pack('<HHHHii', 0x600, 0x10, 0x0dbb, 0x07cc, 0, 0x06)),
+           record(XL_DIMENSION, pack('<iiHHH', 0, len(rows), 0, ncols, 0))]
+    for block in range(0, len(rows), 32):
+        block_rows = range(block, min(block + 32, len(rows)))
+        for rowx in block_rows:
+            out.append(record(XL_ROW, pack('<HHHHHHi', rowx, 0, len(rows[rowx]), 0xff, 0, 0, 0x100)))
+        for rowx in block_rows:
+            out.append(row_cell_records(rowx, rows[rowx], string_index, strings))
+        out.append(record(XL_DBCELL, pack('<i', 0) + b'\x00\x00' * len(block_rows)))
+    out.append(record(XL_WINDOW2, pack('<HHHHHHHi', 0x6b6, 0, 0, 0x40, 0, 0, 0, 0)))
+    if merged_cells:
+        out.append(record(XL_MERGEDCELLS, pack('<H', len(merged_cells)) + b''.join(
+            pack('<HHHH', rlo, rhi - 1, clo, chi - 1) for rlo, rhi, clo, chi in merged_cells)))
+    out.append(record(XL_EOF, b''))
+    return b''.join(out)
+
+
+def globals_stream(sheet_names, sheet_offsets, strings):
+    out = [record(XL_BOF, pack('<HHHHii', 0x600, 0x05, 0x0dbb, 0x07cc, 0, 0x06)),
+           record(XL_CODEPAGE, pack('<H', 1200)),
+           record(XL_WINDOW1, pack('<HHHHHHHHH', 0, 0, 0x4000, 0x2000, 0x38, 0, 0, 1, 0x258))]
+    # 序号4的字体不存在，共写5个字体
+    for _ in range(5):
+        out.append(record(XL_FONT, pack('<HHHHHBBBB', 200, 0, 0x7fff, 400, 0, 0, 0, 0, 0) +
+                          biff_string(u'Arial', '<B')))
+    for xfx in range(cell_xf + 1):
+        if xfx < cell_xf:
+            type_prot = 0xfff5     # 样式XF
+        else:
+            type_prot = 0x0001     # 单元格XF，父样式为0
+        out.append(record(XL_XF, pack('<HHHBBBBIiH', 0, 0, type_prot, 0x20, 0, 0, 0, 0, 0, 0x20c0)))
+    for name, offset in zip(sheet_names, sheet_offsets):
+        out.append(record(XL_BOUNDSHEET, pack('<iBB', offset, 0, 0) + biff_string(name, '<B')))
+    out.append(sst_records(strings))
+    out.append(record(XL_EOF, b''))
+    return b''.join(out)
+
+
+# 写出xls文件，sheets为[(sheet名, 各行的值)]，值为字符串或数字，空字符串和None不输出单元格
+# merged_cells为各sheet相同的合并单元格区域，见sheet_stream
+def write_xls(path, sheets, merged_cells=()):
+    strings = []
+    string_index = {}
+    streams = [sheet_stream(rows, string_index, strings, merged_cells) for _, rows in sheets]
+    names = [name for name, _ in sheets]
+    # BOUNDSHEET记录中sheet的位置不影响工作簿全局流的长度，先按0计算长度
+    globals_size = len(globals_stream(names, [0] * len(names), strings))
+    offsets = []
+    pos = globals_size
+    for stream in streams:
+        offsets.append(pos)
+        pos += len(stream)
+    with open(path, 'wb') as f:
+        f.write(globals_stream(names, offsets, strings))
+        for stream in streams:
+            f.write(stream)
+
+
+# 生成各sheet的行，kind为mixed时每行第一列为文本，其余列为整数(RK、MULRK)和小数(NUMBER)；
+# numbers时全部为可用RK表示的整数、两位小数和二进制小数，每行只有一个MULRK记录；
+# text时全部为文本，不重复的字符串约占一半；records时每12列依次为LABELSST、NUMBER、RK、BLANK、
+# 3个单元格的MULRK、FORMULA、3个单元格的MULBLANK和NUMBER，用于比较各种记录的处理
+def generate_rows(nrows, ncols, kind='mixed', sheetx=0):
+    rows = []
+    for rowx in range(nrows):
+        if kind == 'records':
+            pattern = [u'item %d' % (rowx % 4), rowx + 1 / 3.0, rowx, BLANK, rowx, rowx + 1, rowx + 2,
+                       Formula(rowx * 2.0), BLANK, BLANK, BLANK, rowx + 1 / 7.0]
+            row = (pattern * (ncols // len(pattern) + 1))[:ncols]
+        elif kind == 'numbers':
+            row = [rowx * 31 + colx if colx % 2 else (rowx * 7 + colx) / 100.0 if colx % 4 else rowx % 1000 + 0.5
+                   for colx in range(ncols)]
+        elif kind == 'text':
+            row = [u'文本 %d %d 较长的本地化字符串 some localisation text' % (sheetx, (rowx * ncols + colx) // 2)
+                   for colx in range(ncols)]
+        else:
+            row = [u'item %d' % (rowx % 5000)]
+            row += [rowx * colx if colx % 3 == 0 else rowx * 0.1 + colx / 7.0 for colx in range(1, ncols)]
+        rows.append(row)
+    return rows
+
+
+# 各sheet的第一行前两列和最后两行的第一列为合并单元格
+def write_generated_xls(path, nsheets=1, nrows=10000, ncols=20, kind='mixed'):
+    merged_cells = []
+    if nrows >= 2 and ncols >= 2:
+        merged_cells = [(0, 1, 0, 2), (nrows - 2, nrows, 0, 1)]
+    write_xls(path, [(u'S%d' % sheetx, generate_rows(nrows, ncols, kind, sheetx)) for sheetx in range(nsheets)],
+              merged_cells)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: xlsgen.py <output_file> [nsheets] [nrows] [ncols] [mixed|numbers|text|records]')
+        sys.exit(3)
+    write_generated_xls(sys.argv[1],
+                        int(sys.argv[2]) if len(sys.argv) > 2 else 1,
+                        int(sys.argv[3]) if len(sys.argv) > 3 else 10000,
+                        int(sys.argv[4]) if len(sys.argv) > 4 else 20,
+                        sys.argv[5] if len(sys.argv) > 5 else 'mixed')
@@ -0,0 +1,194 @@
+# coding:utf-8
+# 生成基准测试用的xlsx文件，只依赖标准库，python 2和python 3都可以运行
+# 用法: python bench/xlsxgen.py <输出文件> [sheet数] [每个sheet的数据行数]
+import sys
+import zipfile
+
+ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+worksheet_rel = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+
+# example/test.xlsx的表头，包含嵌套的array、dict和路径变量
+example_header = [
+    [u'unique', u'required', u'required', u'', u'required', u'', u'', u'', u'', u'', u'',
+     u'', u'', u'', u'', u'', u'', u'', u'required', u'', u''],
+    [u'int', u'string', u'number', u'bool', u'array<', u'dict<', u'number', u'number', u'>', u'>', u'dict<',
+     u'number', u'number', u'dict<', u'string', u'>', u'>', u'number', u'table', u'function(def)', u'function()'],
+    [u'id', u'name', u'gold', u'friendly', u'items', u'', u'itemID', u'count', u'', u'', u'attr',
+     u'hp', u'mp', u'skill', u'near', u'', u'', u'attr.speed', u'list', u'atk', u'def'],
+]
+
+
+# 将列序号转换为excel的列名
+def col_name(colx):
+    name = ''
+    colx += 1
+    while colx:
+        colx, remain = divmod(colx - 1, 26)
+        name = chr(65 + remain) + name
+    return name
+
+
+def escape(text):
+    return text.replace(u'&', u'&amp;').replace(u'<', u'&lt;').replace(u'>', u'&gt;')
+
+
+# 生成一个使用example_header的sheet，first_id为第一行的主键，各列的取值随行号变化，
+# 部分可选列为空，部分字符串需要转义
+def example_rows(nrows, first_id=1):
+    rows = [list(values) for values in example_header]
+    rows.insert(0, [u'//注释行'])
+    for i in range(nrows):
+        row_id = first_id + i
+        name = u'名字%d' % (row_id % 1000)
+        if row_id % 7 == 0:
+            name = u'"%d"\n"quoted"' % row_id
+        row = [row_id, name, float(row_id % 500) / 4, row_id % 3 == 0,
+               u'', u'', row_id % 100 + 1000, row_id % 9 + 1, u'', u'',
+               u'', row_id % 1000, row_id % 200, u'', u'',
+               u'', u'', float(row_id % 50) / 2, u'%d,%d' % (row_id % 10, row_id % 11), u'', u'']
+        if row_id % 4 == 0:
+            # 整个items数组为空
+            row[6] = row[7] = u''
+        if row_id % 5 == 0:
+            row[14] = u'near%d' % (row_id % 30)
+            row[19] = u'def+%d' % (row_id % 10)
+        rows.append(row)
+    return rows
+
+
+def sheet_xml(rows, strings, string_index, shared_strings):
+    ncols = max(len(row) for row in rows)
+    parts = [u'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+             u'<worksheet %s><dimension ref="A1:%s%d"/><sheetData>' % (ns, col_name(ncols - 1), len(rows))]
+    for rowx, row in enumerate(rows):
+        cells = []
+        for colx, value in enumerate(row):
+            ref = u'%s%d' % (col_name(colx), rowx + 1)
+            if value is None or value == u'':
+                continue
+            elif isinstance(value, bool):
+                cells.append(u'<c r="%s" t="b"><v>%d</v></c>' % (ref, value))
+            elif isinstance(value, (int, float)):
+                cells.append(u'<c r="%s"><v>%r</v></c>' % (ref, value))
+            elif shared_strings:
+                index = string_index.get(value)
+                if index is None:
+                    index = string_index[value] = len(strings)
+                    strings.append(value)
+                cells.append(u'<c r="%s" t="s"><v>%d</v></c>' % (ref, index))
+            else:
+                cells.append(u'<c r="%s" t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>'
+                             % (ref, escape(value)))
+        parts.append(u'<row r="%d">%s</row>' % (rowx + 1, u''.join(cells)))
+    parts.append(u'</sheetData></worksheet>')
+    return u''.join(parts).encode('utf-8')
+
+
+# 写出共享字符串表，si_items为各<si>元素的xml
+def write_shared_strings(z, si_items):
+    z.writestr('xl/sharedStrings.xml', (
+        u'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n'
+        u'<sst %s count="%d" uniqueCount="%d">%s</sst>' % (ns, len(si_items), len(si_items), u''.join(si_items))
+    ).encode('utf-8'))
+
+
+# 写出工作簿、关系和内容类型，sheet依次对应worksheets/sheet<序号>.xml
+def write_workbook_parts(z, sheet_names):
+    z.writestr('xl/workbook.xml', (
+        u'<?xml version="1.0" encoding="UTF-8"?><workbook %s %s><sheets>%s</sheets></workbook>' % (
+            ns, rel_ns,
+            u''.join(u'<sheet name="%s" sheetId="%d" r:id="rId%d"/>' % (escape(name), i + 1, i + 1)
+                     for i, name in enumerate(sheet_names)))
+    ).encode('utf-8'))
+    z.writestr('xl/_rels/workbook.xml.rels', (
+        u'<?xml version="1.0" encoding="UTF-8"?>'
+        u'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">%s</Relationships>'
+        % u''.join(u'<Relationship Id="rId%d" Type="%s" Target="worksheets/sheet%d.xml"/>'
+                   % (i + 1, worksheet_rel, i + 1) for i in range(len(sheet_names)))
+    ).encode('utf-8'))
+    z.writestr('[Content_Types].xml',
+               '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+
+
+# 写出xlsx文件，sheets为[(sheet名, 各行的值)]，值为字符串、数字或bool，空字符串和None不输出单元格
+# shared_strings为假时字符串以内联方式写入各单元格
+def write_xlsx(path, sheets, shared_strings=True):
+    strings = []
+    string_index = {}
+    z = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+    try:
+        for i, (_, rows) in enumerate(sheets):
+            z.writestr('xl/worksheets/sheet%d.xml' % (i + 1),
+                       sheet_xml(rows, strings, string_index, shared_strings))
+        write_shared_strings(z, [u'<si><t xml:space="preserve">%s</t></si>' % escape(text) for text in strings])
+        write_workbook_parts(z, [name for name, _ in sheets])
+    finally:
+        z.close()
+
+
+# 生成nsheets个使用example_header的sheet，各sheet的主键不重复
+def write_example_xlsx(path, nsheets=1, nrows=10000, shared_strings=True):
+    sheets = [(u'Sheet%d' % (i + 1), example_rows(nrows, i * nrows + 1)) for i in range(nsheets)]
+    write_xlsx(path, sheets, shared_strings)
+
+
+# 生成以数字为主的xlsx，每行第一列为字符串，其余列为整数和小数
+def write_numeric_xlsx(path, nsheets=4, nrows=25000, ncols=20):
+    sheets = []
+    for sheetx in range(nsheets):
+        rows = []
+        for rowx in range(nrows):
+            row_id = sheetx * nrows + rowx
+            row = [u'name %d' % (row_id % 5000)]
+            row += [row_id * colx if colx % 2 else (row_id * colx) % 1000 / 8.0 for colx in range(1, ncols)]
+            rows.append(row)
+        sheets.append((u'S%d' % (sheetx + 1), rows))
+    write_xlsx(path, sheets)
+
+
+# 生成本地化表式的xlsx，共享字符串表很大，其中有富文本、实体引用、首尾空白和空字符串；
+# sheet S1只有small_rows行，S2有big_rows行，每行3个字符串单元格
+def write_loc_xlsx(path, nstrings=300000, small_rows=200, big_rows=100000):
+    si_items = []
+    for i in range(nstrings):
+        k = i % 10
+        if k == 0:
+            si_items.append(u'<si><r><rPr><b/></rPr><t>bold %d</t></r>'
+                            u'<r><t xml:space="preserve"> tail _x0041_</t></r></si>' % i)
+        elif k == 1:
+            si_items.append(u'<si><t>a &amp; b &lt; %d 中文</t></si>' % i)
+        elif k == 2:
+            si_items.append(u'<si><t>  spaced %d  </t></si>' % i)
+        elif k == 3:
+            si_items.append(u'<si><t/></si>')
+        else:
+            si_items.append(u'<si><t xml:space="preserve">text %d 文本 some longer localisation string</t></si>' % i)
+
+    def string_sheet_xml(nrows, base):
+        parts = [u'<?xml version="1.0" encoding="UTF-8"?><worksheet %s><sheetData>' % ns]
+        for rowx in range(nrows):
+            cells = u''.join(u'<c r="%s%d" t="s"><v>%d</v></c>' % (col_name(colx), rowx + 1,
+                                                                    (base + rowx * 3 + colx) % nstrings)
+                             for colx in range(3))
+            parts.append(u'<row r="%d">%s</row>' % (rowx + 1, cells))
+        parts.append(u'</sheetData></worksheet>')
+        return u''.join(parts).encode('utf-8')
+
+    z = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+    try:
+        write_shared_strings(z, si_items)
+        z.writestr('xl/worksheets/sheet1.xml', string_sheet_xml(small_rows, 7))
+        z.writestr('xl/worksheets/sheet2.xml', string_sheet_xml(big_rows, 0))
+        write_workbook_parts(z, [u'S1', u'S2'])
+    finally:
+        z.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: xlsxgen.py <output_file> [nsheets] [nrows]')
+        sys.exit(3)
+    write_example_xlsx(sys.argv[1],
+                       int(sys.argv[2]) if len(sys.argv) > 2 else 1,
+                       int(sys.argv[3]) if len(sys.argv) > 3 else 10000)
@@ -270,6 +270,11 @@ from . import licences
 # data and returns without releasing resources. At this stage, the only
 # information available about sheets is Book.nsheets and Book.sheet_names().</p>
 #
+# <p>on_demand=True and an Excel 2007 (xlsx) file: open_workbook() loads the
+# workbook, styles and shared string parts and keeps the ZIP file open. Each
+# worksheet part is decompressed and parsed only when the sheet is requested.
+# Book.release_resources() closes the ZIP file.</p>
+#
 # <p>Book.sheet_by_name() and Book.sheet_by_index() will load the requested
 # sheet if it is not already loaded.</p>
 #
@@ -376,6 +381,54 @@ USE_MMAP = MMAP_AVAILABLE
 # Sheet.row_len() method.
 # <br /> -- New in version 0.7.2
 #
+# @param stop_at_row None (the default) means every row of every sheet is read.
+# Otherwise a callable stop_at_row(sheet, rowx) which is called each time row rowx of
+# a sheet has been read (all rows up to and including rowx are then present in the
+# sheet). If it returns a true value, the rest of that sheet is skipped and the sheet
+# holds only the rows read so far. This allows e.g. reading just the header rows
+# of every sheet without decoding the data below them. The sheets are then always
+# parsed in this process, whatever sheet_workers is, so that stop_at_row sees each
+# sheet's cells as they are returned by the Sheet methods.
+#
+# @param sheet_filter None (the default) means all worksheets are loaded.
+# Otherwise either a callable sheet_filter(sheet_name) returning a true value for
+# each worksheet wanted, or a list of the names of the worksheets wanted.
+# Worksheets not selected are treated like chart sheets: they are not included in
+# Book.nsheets or Book.sheet_names(), and their data is never decompressed or parsed.
+#
+# @param sheet_workers 0 (the default) means worksheets are parsed one after another.
+# Otherwise the number of worker processes among which the worksheets of an
+# Excel 2007+ (xlsx) or Excel 5.0+ (xls) file are parsed; the Sheet objects are then
+# assembled in this process. It has no effect with on_demand=True, with stop_at_row,
+# or when there is only one worksheet.
+#
+# @param lazy_sst False (the default) means the shared string table of the file
+# is decoded in full before any worksheet is read. True means it is only indexed,
+# and each string is decoded when a cell using it is first read. This saves time
+# and memory when only some of the strings are used, e.g. with on_demand=True,
+# sheet_filter or stop_at_row.
+#
+# @param xml_backend The XML parser used for Excel 2007+ (xlsx) files: 'etree' (the default)
+# uses ElementTree, 'expat' decodes the styles, shared strings and worksheets directly
+# from pyexpat events without building Element objects.
+#
+# @param compact_cells False (the default) means each sheet holds a list of values per row.
+# True means the cells are stored column by column in typed arrays (see the ColumnarSheet class),
+# which takes much less memory for sheets that are mostly numbers. The cell values returned
+# by Sheet.cell_value(), Sheet.row_values() etc. are the same. ragged_rows is then ignored.
+# The storage is dense: every cell of the sheet's nrows x ncols range takes about 9 bytes
+# (11 with formatting_info), including empty and blank cells, and text cells hold an
+# index into a table of the sheet's distinct strings rather than an SST index.
+#
+# @param snapshot_dir None (the default) means the file is always parsed. Otherwise a
+# directory where a snapshot of the loaded Book is saved, keyed by a hash of the file's
+# contents, the xlrd version and the options; when the same file is next opened with the
+# same options, the Book is rebuilt from the snapshot without parsing the file.
+# Only the cells and the Book and Sheet attributes available without formatting_info
+# are kept. It has no effect with formatting_info, on_demand, stop_at_row or sheet_filter.
+# The directory is created if it does not exist. A snapshot that cannot be written is
+# reported on logfile, and the Book is returned as usual.
+#
 # @return An instance of the Book class.
 
 def open_workbook(filename=None,
@@ -387,7 +440,36 @@ def open_workbook(filename=None,
     formatting_info=False,
     on_demand=False,
     ragged_rows=False,
+    stop_at_row=None,
+    sheet_filter=None,
+    sheet_workers=0,
+    lazy_sst=False,
+    xml_backend='etree',
+    compact_cells=False,
+    snapshot_dir=None,
     ):
+    if (snapshot_dir is not None and not formatting_info and not on_demand
+        and stop_at_row is None and sheet_filter is None):
+        from . import snapshot
+        path = snapshot.snapshot_path(snapshot_dir, filename, file_contents, dict(
+            encoding_override=encoding_override,
+            ragged_rows=ragged_rows,
+            compact_cells=compact_cells,
+            ))
+        bk = snapshot.load_snapshot(path, logfile, verbosity)
+        if bk is None:
+            bk = open_workbook(filename, logfile, verbosity, use_mmap, file_contents,
+                encoding_override,
+                ragged_rows=ragged_rows,
+                sheet_workers=sheet_workers,
+                lazy_sst=lazy_sst,
+                xml_backend=xml_backend,
+                compact_cells=compact_cells,
+                )
+            snapshot.save_snapshot(path, bk)
+        return bk
+    if sheet_filter is not None and not callable(sheet_filter):
+        sheet_filter = frozenset(sheet_filter).__contains__
     peeksz = 4
     if file_contents:
         peek = file_contents[:peeksz]
@@ -420,6 +502,14 @@ def open_workbook(filename=None,
                 formatting_info=formatting_info,
                 on_demand=on_demand,
                 ragged_rows=ragged_rows,
+                stop_at_row=stop_at_row,
+                sheet_filter=sheet_filter,
+                sheet_workers=sheet_workers,
+                lazy_sst=lazy_sst,
+                xml_backend=xml_backend,
+                compact_cells=compact_cells,
+                filename=filename,
+                file_contents=file_contents,
                 )
             return bk
         if 'xl/workbook.bin' in component_names:
@@ -439,6 +529,11 @@ def open_workbook(filename=None,
         formatting_info=formatting_info,
         on_demand=on_demand,
         ragged_rows=ragged_rows,
+        stop_at_row=stop_at_row,
+        sheet_filter=sheet_filter,
+        compact_cells=compact_cells,
+        lazy_sst=lazy_sst,
+        sheet_workers=sheet_workers,
         )
     return bk
 
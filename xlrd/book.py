@@ -6,9 +6,10 @@ from __future__ import print_function
 
 from .timemachine import *
 from .biffh import *
-import struct; unpack = struct.unpack
+import struct; unpack = struct.unpack; unpack_from = struct.unpack_from
 import sys
 import time
+from array import array
 from . import sheet
 from . import compdoc
 from .formula import *
@@ -70,6 +71,11 @@ def open_workbook_xls(filename=None,
     file_contents=None,
     encoding_override=None,
     formatting_info=False, on_demand=False, ragged_rows=False,
+    stop_at_row=None,
+    sheet_filter=None,
+    compact_cells=False,
+    lazy_sst=False,
+    sheet_workers=0,
     ):
     t0 = time.clock()
     if TOGGLE_GC:
@@ -85,6 +91,10 @@ def open_workbook_xls(filename=None,
             formatting_info=formatting_info,
             on_demand=on_demand,
             ragged_rows=ragged_rows,
+            stop_at_row=stop_at_row,
+            sheet_filter=sheet_filter,
+            compact_cells=compact_cells,
+            lazy_sst=lazy_sst,
             )
         t1 = time.clock()
         bk.load_time_stage_1 = t1 - t0
@@ -115,7 +125,12 @@ def open_workbook_xls(filename=None,
         else:
             bk.parse_globals()
             bk._sheet_list = [None for sh in bk._sheet_names]
-            if not on_demand:
+            if on_demand:
+                pass
+            elif (sheet_workers > 1 and len(bk._sheet_names) > 1 and stop_at_row is None
+                  and (filename or file_contents)):
+                bk.get_sheets_parallel(sheet_workers, filename, file_contents)
+            else:
                 bk.get_sheets()
         bk.nsheets = len(bk._sheet_list)
         if biff_version == 45 and bk.nsheets > 1:
@@ -137,6 +152,41 @@ def open_workbook_xls(filename=None,
         bk.release_resources()
     return bk
 
+# open_workbook options that a worker process for Book.get_sheets_parallel() opens the file with.
+_WORKER_LOAD_OPTIONS = (
+    'verbosity', 'use_mmap', 'encoding_override', 'formatting_info', 'ragged_rows',
+    'compact_cells',
+    )
+
+# Book attributes describing the worksheets, copied to a worker process so that
+# its sheet numbers are those of the parent's (e.g. after sheet_filter).
+_WORKER_SHEET_LIST_ATTRS = (
+    '_sheet_names', '_sh_abs_posn', '_sheet_visibility', '_all_sheets_map', '_sheet_num_from_name',
+    )
+
+# Sheet attributes that are not sent back from a worker process; the parent's Sheet has its own.
+_UNSENT_SHEET_ATTRS = ('book', 'logfile', 'put_cell', '_xf_index_to_xl_type_map')
+
+_worker_book = None
+
+def _init_sheet_worker(filename, file_contents, load_options, sheet_state):
+    global _worker_book
+    # lazy_sst: the SST is only indexed, as text cells get SST indexes
+    bk = open_workbook_xls(filename=filename, file_contents=file_contents,
+        on_demand=True, lazy_sst=True, **load_options)
+    bk.__dict__.update(sheet_state)
+    bk._sheet_list = [None] * len(bk._sheet_names)
+    bk._sharedstrings = sheet.SSTIndexes()
+    _worker_book = bk
+
+def _load_sheet_state(sheetx):
+    sh = _worker_book.get_sheet(sheetx)
+    _worker_book.unload_sheet(sheetx)
+    return sheetx, dict(
+        (attr, value) for attr, value in sh.__dict__.items()
+        if attr not in _UNSENT_SHEET_ATTRS
+        )
+
 ##
 # For debugging: dump the file's BIFF records in char & hex.
 # @param filename The path to the file to be dumped.
@@ -441,6 +491,52 @@ class Book(BaseObject):
             raise XLRDError('No sheet named <%r>' % sheet_name)
         return self.sheet_by_index(sheetx)
 
+    ##
+    # Iterate over the rows of a worksheet while it is being parsed, so that the
+    # whole sheet never has to be held in memory. This is most useful with
+    # open_workbook(..., on_demand=True); if the sheet is already loaded, its rows
+    # are taken from the Sheet object instead. The sheet is not kept after the
+    # iteration.
+    # @param sheet_name_or_index Name or index of the sheet.
+    # @return A generator of (rowx, values) tuples in the order the rows are stored in the file
+    # (normally increasing rowx). values is a list of cell values as from Sheet.row_values(),
+    # ending at the last cell of the row, so rows may have different lengths; rows
+    # without any cells are skipped. For an already loaded sheet, every row is given
+    # as from Sheet.row_values().
+    # <br /> stop_at_row does not apply here; stop iterating instead.
+    def iter_rows(self, sheet_name_or_index):
+        if isinstance(sheet_name_or_index, int):
+            sheetx = sheet_name_or_index
+        else:
+            try:
+                sheetx = self._sheet_names.index(sheet_name_or_index)
+            except ValueError:
+                raise XLRDError('No sheet named <%r>' % sheet_name_or_index)
+        sh = self._sheet_list[sheetx]
+        if sh:
+            return ((rowx, sh.row_values(rowx)) for rowx in xrange(sh.nrows))
+        if self._resources_released:
+            raise XLRDError("Can't load sheets after releasing resources.")
+        if self._sheet_loader is not None:
+            return self._sheet_loader.iter_rows(sheetx)
+        return self.iter_biff_rows(sheetx)
+
+    def iter_biff_rows(self, sheetx):
+        self._position = self._sh_abs_posn[sheetx]
+        self.getbof(XL_WORKSHEET)
+        sh = sheet.Sheet(self,
+                self._position,
+                self._sheet_names[sheetx],
+                sheetx,
+                )
+        row_buffer = sheet.RowBuffer()
+        sh.put_cell = row_buffer.put_cell
+        for row in sh.iter_read(self, row_buffer):
+            yield row
+        row_buffer.flush()
+        for row in row_buffer.done_rows:
+            yield row
+
     ##
     # @return A list of the names of all the worksheets in the workbook file.
     # This information is available even when no sheets have yet been loaded.
@@ -485,6 +581,9 @@ class Book(BaseObject):
     # same object has no ill effect.
     def release_resources(self):
         self._resources_released = 1
+        if self._sheet_loader is not None:
+            self._sheet_loader.release_resources()
+            self._sheet_loader = None
         if hasattr(self.mem, "close"):
             # must be a mmap.mmap object
             self.mem.close()
@@ -546,6 +645,13 @@ class Book(BaseObject):
         self.style_name_map = {}
         self.mem = b''
         self.filestr = b''
+        self.stop_at_row = None
+        self.sheet_filter = None
+        self._sheet_loader = None # loads sheets in place of the BIFF reader, e.g. for xlsx files
+        self.xml_backend = 'etree' # parser used for xlsx files
+        self.compact_cells = False
+        self.lazy_sst = False
+        self._mem_record_at = None # mem.record_at if mem is a compdoc.VirtualStream
 
     def biff2_8_load(self, filename=None, file_contents=None,
         logfile=sys.stdout, verbosity=0, use_mmap=USE_MMAP,
@@ -553,6 +659,10 @@ class Book(BaseObject):
         formatting_info=False,
         on_demand=False,
         ragged_rows=False,
+        stop_at_row=None,
+        sheet_filter=None,
+        compact_cells=False,
+        lazy_sst=False,
         ):
         # DEBUG = 0
         self.logfile = logfile
@@ -562,6 +672,10 @@ class Book(BaseObject):
         self.formatting_info = formatting_info
         self.on_demand = on_demand
         self.ragged_rows = ragged_rows
+        self.stop_at_row = stop_at_row
+        self.sheet_filter = sheet_filter
+        self.compact_cells = compact_cells
+        self.lazy_sst = lazy_sst
 
         if not file_contents:
             with open(filename, "rb") as f:
@@ -602,9 +716,11 @@ class Book(BaseObject):
                 self.stream_len = len(self.mem)
             del cd
             if self.mem is not self.filestr:
-                if hasattr(self.filestr, "close"):
+                # A VirtualStream reads from filestr, and closes it when released.
+                if hasattr(self.filestr, "close") and not isinstance(self.mem, compdoc.VirtualStream):
                     self.filestr.close()
                 self.filestr = b''
+        self._mem_record_at = getattr(self.mem, "record_at", None)
         self._position = self.base
         if DEBUG:
             print("mem: %s, base: %d, len: %d" % (type(self.mem), self.base, self.stream_len), file=self.logfile)
@@ -630,10 +746,16 @@ class Book(BaseObject):
         lo, hi = buff_two
         return (BYTES_ORD(hi) << 8) | BYTES_ORD(lo)
 
+    # Record headers are decoded in place (mem may be an mmap); only the
+    # record body is copied.
     def get_record_parts(self):
         pos = self._position
+        if self._mem_record_at is not None:
+            buf, body_pos, code, length = self._mem_record_at(pos)
+            self._position = pos + 4 + length
+            return (code, length, buf[body_pos:body_pos+length])
         mem = self.mem
-        code, length = unpack('<HH', mem[pos:pos+4])
+        code, length = unpack_from('<HH', mem, pos)
         pos += 4
         data = mem[pos:pos+length]
         self._position = pos + length
@@ -641,8 +763,14 @@ class Book(BaseObject):
 
     def get_record_parts_conditional(self, reqd_record):
         pos = self._position
+        if self._mem_record_at is not None:
+            buf, body_pos, code, length = self._mem_record_at(pos)
+            if code != reqd_record:
+                return (None, 0, b'')
+            self._position = pos + 4 + length
+            return (code, length, buf[body_pos:body_pos+length])
         mem = self.mem
-        code, length = unpack('<HH', mem[pos:pos+4])
+        code, length = unpack_from('<HH', mem, pos)
         if code != reqd_record:
             return (None, 0, b'')
         pos += 4
@@ -653,6 +781,8 @@ class Book(BaseObject):
     def get_sheet(self, sh_number, update_pos=True):
         if self._resources_released:
             raise XLRDError("Can't load sheets after releasing resources.")
+        if self._sheet_loader is not None:
+            return self._sheet_loader.get_sheet(sh_number)
         if update_pos:
             self._position = self._sh_abs_posn[sh_number]
         _unused_biff_version = self.getbof(XL_WORKSHEET)
@@ -661,7 +791,7 @@ class Book(BaseObject):
         # It appears to work OK if the sheet version is ignored.
         # Confirmed by Daniel Rentz: happens when Excel does "save as"
         # creating an old version file; ignore version details on sheet BOF.
-        sh = sheet.Sheet(self,
+        sh = self.new_sheet(
                 self._position,
                 self._sheet_names[sh_number],
                 sh_number,
@@ -670,6 +800,18 @@ class Book(BaseObject):
         self._sheet_list[sh_number] = sh
         return sh
 
+    ##
+    # @return a new, empty Sheet, or ColumnarSheet if open_workbook(..., compact_cells=True)
+    def new_sheet(self, position, name, number):
+        if self.compact_cells:
+            return sheet.ColumnarSheet(self, position, name, number)
+        return sheet.Sheet(self, position, name, number)
+
+    ##
+    # @return true if the worksheet is selected by open_workbook(..., sheet_filter=...)
+    def want_sheet(self, sheet_name):
+        return self.sheet_filter is None or self.sheet_filter(sheet_name)
+
     def get_sheets(self):
         # DEBUG = 0
         if DEBUG: print("GET_SHEETS:", self._sheet_names, self._sh_abs_posn, file=self.logfile)
@@ -677,9 +819,36 @@ class Book(BaseObject):
             if DEBUG: print("GET_SHEETS: sheetno =", sheetno, self._sheet_names, self._sh_abs_posn, file=self.logfile)
             self.get_sheet(sheetno)
 
+    ##
+    # Read the worksheets in nworkers processes; see open_workbook(..., sheet_workers=n).
+    # Each worker opens the file itself, with on_demand=True, and reads the sheets
+    # at the positions in _sh_abs_posn that it is given. Text cells come back
+    # holding SST indexes, which are looked up here.
+    def get_sheets_parallel(self, nworkers, filename=None, file_contents=None):
+        import multiprocessing
+        load_options = dict((attr, getattr(self, attr)) for attr in _WORKER_LOAD_OPTIONS)
+        sheet_state = dict((attr, getattr(self, attr)) for attr in _WORKER_SHEET_LIST_ATTRS)
+        nsheets = len(self._sheet_names)
+        pool = multiprocessing.Pool(
+            min(nworkers, nsheets),
+            _init_sheet_worker,
+            (filename, file_contents, load_options, sheet_state),
+            )
+        try:
+            for sheetx, state in pool.imap_unordered(_load_sheet_state, range(nsheets)):
+                sh = self.new_sheet(self._sh_abs_posn[sheetx], self._sheet_names[sheetx], sheetx)
+                sh.__dict__.update(state)
+                sheet.resolve_sst_indexes(sh, self._sharedstrings)
+                self._sheet_list[sheetx] = sh
+        finally:
+            pool.close()
+            pool.join()
+
     def fake_globals_get_sheet(self): # for BIFF 4.0 and earlier
         formatting.initialise_book(self)
         fake_sheet_name = UNICODE_LITERAL('Sheet 1')
+        if not self.want_sheet(fake_sheet_name):
+            return
         self._sheet_names = [fake_sheet_name]
         self._sh_abs_posn = [0]
         self._sheet_visibility = [0] # one sheet, visible
@@ -718,7 +887,13 @@ class Book(BaseObject):
                 "BOUNDSHEET: inx=%d vis=%r sheet_name=%r abs_posn=%d sheet_type=0x%02x\n",
                 self._all_sheets_count, visibility, sheet_name, abs_posn, sheet_type)
         self._all_sheets_count += 1
-        if sheet_type != XL_BOUNDSHEET_WORKSHEET:
+        if sheet_type == XL_BOUNDSHEET_WORKSHEET and not self.want_sheet(sheet_name):
+            self._all_sheets_map.append(-1)
+            if DEBUG or self.verbosity >= 1:
+                fprintf(self.logfile,
+                    "NOTE *** Ignoring worksheet %r not selected by sheet_filter\n",
+                    sheet_name)
+        elif sheet_type != XL_BOUNDSHEET_WORKSHEET:
             self._all_sheets_map.append(-1)
             descr = {
                 1: 'Macro sheet',
@@ -1089,10 +1264,13 @@ class Book(BaseObject):
         self.derive_encoding()
         sheet_len = unpack('<i', data[:4])[0]
         sheet_name = unpack_string(data, 4, self.encoding, lenlen=1)
-        sheetno = self._sheethdr_count
-        assert sheet_name == self._sheet_names[sheetno]
         self._sheethdr_count += 1
         BOF_posn = self._position
+        if not self.want_sheet(sheet_name):
+            self._position = BOF_posn + sheet_len
+            return
+        sheetno = len(self._sheet_list)
+        assert sheet_name == self._sheet_names[sheetno]
         posn = BOF_posn - 4 - len(data)
         if DEBUG: fprintf(self.logfile, 'SHEETHDR %d at posn %d: len=%d name=%r\n', sheetno, posn, sheet_len, sheet_name)
         self.initialise_format_info()
@@ -1126,7 +1304,11 @@ class Book(BaseObject):
             if DEBUG >= 2:
                 fprintf(self.logfile, "CONTINUE: adding %d bytes to SST -> %d\n", nb, nbt)
             strlist.append(data)
-        self._sharedstrings, rt_runlist = unpack_SST_table(strlist, uniquestrings)
+        if self.lazy_sst:
+            datainxs, positions, rt_runlist = index_SST_table(strlist, uniquestrings)
+            self._sharedstrings = LazySST(strlist, datainxs, positions)
+        else:
+            self._sharedstrings, rt_runlist = unpack_SST_table(strlist, uniquestrings)
         if self.formatting_info:
             self._rich_text_runlist_map = rt_runlist        
         if DEBUG:
@@ -1418,3 +1600,158 @@ def unpack_SST_table(datatab, nstrings):
                 assert _unused_i == nstrings - 1
         strappend(accstrg)
     return strings, richtext_runs
+
+##
+# Find where each string of the SST starts, without decoding it; see LazySST.
+# @param datatab List of the bodies of the SST record and its CONTINUE records.
+# @param nstrings Number of strings in the SST.
+# @return (datainxs, positions, richtext_runs): string i starts at
+# datatab[datainxs[i]][positions[i]]; richtext_runs is as for unpack_SST_table().
+def index_SST_table(datatab, nstrings):
+    datainx = 0
+    ndatas = len(datatab)
+    data = datatab[0]
+    datalen = len(data)
+    pos = 8
+    datainxs = array('i')
+    positions = array('i')
+    datainx_append = datainxs.append
+    pos_append = positions.append
+    richtext_runs = {}
+    local_unpack_from = unpack_from
+    local_BYTES_ORD = BYTES_ORD
+    for stringx in xrange(nstrings):
+        datainx_append(datainx)
+        pos_append(pos)
+        nchars, options = local_unpack_from('<HB', data, pos)
+        pos += 3
+        rtcount = 0
+        phosz = 0
+        if options & 0x08: # richtext
+            rtcount = local_unpack_from('<H', data, pos)[0]
+            pos += 2
+        if options & 0x04: # phonetic
+            phosz = local_unpack_from('<i', data, pos)[0]
+            pos += 4
+        charsneed = nchars
+        while 1:
+            if options & 0x01:
+                # Uncompressed UTF-16
+                charsavail = (datalen - pos) >> 1
+                if charsavail > charsneed:
+                    charsavail = charsneed
+                pos += 2*charsavail
+            else:
+                charsavail = datalen - pos
+                if charsavail > charsneed:
+                    charsavail = charsneed
+                pos += charsavail
+            charsneed -= charsavail
+            if not charsneed:
+                break
+            datainx += 1
+            data = datatab[datainx]
+            datalen = len(data)
+            options = local_BYTES_ORD(data[0])
+            pos = 1
+        if rtcount:
+            runs = []
+            for runindex in xrange(rtcount):
+                if pos == datalen:
+                    pos = 0
+                    datainx += 1
+                    data = datatab[datainx]
+                    datalen = len(data)
+                runs.append(local_unpack_from("<HH", data, pos))
+                pos += 4
+            richtext_runs[stringx] = runs
+        pos += phosz # size of the phonetic stuff to skip
+        if pos >= datalen:
+            # adjust to correct position in next record
+            pos = pos - datalen
+            datainx += 1
+            if datainx < ndatas:
+                data = datatab[datainx]
+                datalen = len(data)
+            else:
+                assert stringx == nstrings - 1
+    return datainxs, positions, richtext_runs
+
+##
+# Decode the SST string that starts at datatab[datainx][pos]; see index_SST_table().
+def unpack_SST_string(datatab, datainx, pos):
+    data = datatab[datainx]
+    datalen = len(data)
+    nchars, options = unpack_from('<HB', data, pos)
+    pos += 3
+    if options & 0x08: # richtext
+        pos += 2
+    if options & 0x04: # phonetic
+        pos += 4
+    pieces = []
+    charsneed = nchars
+    while 1:
+        if options & 0x01:
+            # Uncompressed UTF-16
+            charsavail = min((datalen - pos) >> 1, charsneed)
+            pieces.append(unicode(data[pos:pos+2*charsavail], "utf_16_le"))
+        else:
+            # Note: this is COMPRESSED (not ASCII!) encoding!!!
+            charsavail = min(datalen - pos, charsneed)
+            pieces.append(unicode(data[pos:pos+charsavail], "latin_1"))
+        charsneed -= charsavail
+        if not charsneed:
+            break
+        datainx += 1
+        data = datatab[datainx]
+        datalen = len(data)
+        options = BYTES_ORD(data[0])
+        pos = 1
+    if len(pieces) == 1:
+        return pieces[0]
+    return UNICODE_LITERAL('').join(pieces)
+
+##
+# A shared string table that decodes each string when it is first looked up.
+# It holds the bodies of the SST and CONTINUE records and the position of each
+# string in them, found by index_SST_table(). Strings are cached once decoded.
+class LazySST(object):
+
+    def __init__(self, datatab, datainxs, positions):
+        self.datatab = datatab
+        self.datainxs = datainxs
+        self.positions = positions
+        self.decoded = [None] * len(positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        for index in xrange(len(self.positions)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        value = self.decoded[index]
+        if value is not None:
+            return value
+        datainx = self.datainxs[index]
+        pos = self.positions[index]
+        data = self.datatab[datainx]
+        nchars, options = unpack_from('<HB', data, pos)
+        if options & 0x0c:
+            # rich text or phonetic
+            value = unpack_SST_string(self.datatab, datainx, pos)
+        elif options & 0x01:
+            end = pos + 3 + 2*nchars
+            if end <= len(data):
+                value = unicode(data[pos+3:end], "utf_16_le")
+            else:
+                value = unpack_SST_string(self.datatab, datainx, pos)
+        else:
+            end = pos + 3 + nchars
+            if end <= len(data):
+                value = unicode(data[pos+3:end], "latin_1")
+            else:
+                value = unpack_SST_string(self.datatab, datainx, pos)
+        self.decoded[index] = value
+        return value
@@ -17,7 +17,8 @@
 
 from __future__ import print_function
 import sys
-from struct import unpack
+from struct import unpack, unpack_from
+from bisect import bisect_right
 from .timemachine import *
 import array
 
@@ -443,7 +444,91 @@ class CompDoc(object):
             return (mem, start_pos, expected_stream_size)
         slices.append((start_pos, end_pos))
         # print >> self.logfile, "+++>>> %d fragments" % len(slices)
-        return (b''.join([mem[start_pos:end_pos] for start_pos, end_pos in slices]), 0, expected_stream_size)
+        return (VirtualStream(mem, slices, expected_stream_size), 0, expected_stream_size)
+
+##
+# The bytes of a stream whose sectors are not contiguous in the file, read in place.
+# Stands in for the bytes object that the fragments would otherwise be joined into:
+# len() and indexing and slicing work as for bytes (a slice that spans fragments is
+# the only thing copied), and record_at() decodes a BIFF record header.
+# @param mem The file's contents (bytes or an mmap).
+# @param slices List of (start_pos, end_pos) of the runs of sectors in mem, in stream order.
+# @param size Size of the stream; the last run may extend beyond it.
+
+class VirtualStream(object):
+
+    def __init__(self, mem, slices, size):
+        self.mem = mem
+        self.size = size
+        self.run_starts = [] # offset in the stream of each run
+        self.run_ends = []
+        self.run_deltas = [] # offset in mem minus offset in the stream
+        stream_pos = 0
+        for start_pos, end_pos in slices:
+            if stream_pos >= size:
+                break
+            self.run_starts.append(stream_pos)
+            self.run_deltas.append(start_pos - stream_pos)
+            stream_pos += end_pos - start_pos
+            self.run_ends.append(min(stream_pos, size))
+        self._run = (0, self.run_ends[0], self.run_deltas[0]) # last run used
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.size)
+            if step != 1:
+                return self.read(0, self.size)[index]
+            return self.read(start, stop - start)
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("VirtualStream index out of range")
+        _unused, _unused, delta = self.find_run(index)
+        return self.mem[index + delta]
+
+    def find_run(self, pos):
+        run = self._run
+        if not run[0] <= pos < run[1]:
+            runx = bisect_right(self.run_starts, pos) - 1
+            run = self._run = (self.run_starts[runx], self.run_ends[runx], self.run_deltas[runx])
+        return run
+
+    ##
+    # @return The bytes from pos to pos+length (fewer at the end of the stream).
+    def read(self, pos, length):
+        end = min(pos + length, self.size)
+        if pos >= end:
+            return b''
+        pieces = []
+        while pos < end:
+            _unused, run_end, delta = self.find_run(pos)
+            piece_end = min(run_end, end)
+            pieces.append(self.mem[pos + delta:piece_end + delta])
+            pos = piece_end
+        if len(pieces) == 1:
+            return pieces[0]
+        return b''.join(pieces)
+
+    ##
+    # Decode the header of the BIFF record at pos.
+    # @return (buf, body_pos, code, length): the record body is buf[body_pos:body_pos+length].
+    # buf is the file's contents unless the record spans two runs, when it is a copy of the body.
+    def record_at(self, pos):
+        _unused, run_end, delta = self.find_run(pos)
+        if pos + 4 <= run_end:
+            code, length = unpack_from('<HH', self.mem, pos + delta)
+            if pos + 4 + length <= run_end:
+                return (self.mem, pos + delta + 4, code, length)
+        else:
+            code, length = unpack('<HH', self.read(pos, 4))
+        return (self.read(pos + 4, length), 0, code, length)
+
+    def close(self):
+        if hasattr(self.mem, "close"):
+            self.mem.close()
 
 # ==========================================================================================
 def x_dump_line(alist, stride, f, dpos, equal=0):
@@ -1125,7 +1125,7 @@ def evaluate_name_formula(bk, nobj, namex, blah=0, level=0):
                 assert len(tgtobj.stack) == 1
                 res = copy.deepcopy(tgtobj.stack[0])
             res.rank = LEAF_RANK
-            if tgtobj.scope == -1:
+            if tgtobj.scope < 0: # global, or a sheet not loaded (see names_epilogue)
                 res.text = tgtobj.name
             else:
                 res.text = "%s!%s" \
@@ -1307,7 +1307,7 @@ def evaluate_name_formula(bk, nobj, namex, blah=0, level=0):
                     assert len(tgtobj.stack) == 1
                     res = copy.deepcopy(tgtobj.stack[0])
                 res.rank = LEAF_RANK
-                if tgtobj.scope == -1:
+                if tgtobj.scope < 0:
                     res.text = tgtobj.name
                 else:
                     res.text = "%s!%s" \
@@ -1653,7 +1653,7 @@ def decompile_formula(bk, fmla, fmlalen,
             # Only change with BIFF version is number of trailing UNUSED bytes!
             if blah: print("   tgtnamex=%d" % tgtnamex, file=bk.logfile)
             tgtobj = bk.name_obj_list[tgtnamex]
-            if tgtobj.scope == -1:
+            if tgtobj.scope < 0:
                 otext = tgtobj.name
             else:
                 otext = "%s!%s" % (bk._sheet_names[tgtobj.scope], tgtobj.name)
@@ -1838,7 +1838,7 @@ def decompile_formula(bk, fmla, fmlalen,
                         % (tgtnamex, origrefx)
             else:
                 tgtobj = bk.name_obj_list[tgtnamex]
-                if tgtobj.scope == -1:
+                if tgtobj.scope < 0:
                     otext = tgtobj.name
                 else:
                     otext = "%s!%s" \
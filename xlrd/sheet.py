@@ -30,7 +30,7 @@
 from __future__ import print_function
 
 from array import array
-from struct import unpack, calcsize
+from struct import unpack, unpack_from, pack, calcsize, Struct
 from .biffh import *
 from .timemachine import *
 from .formula import dump_formula, decompile_formula, rangename2d, FMLA_TYPE_CELL, FMLA_TYPE_SHARED
@@ -301,6 +301,8 @@ class Sheet(BaseObject):
     # <br /> -- New in version 0.7.2
     vertical_page_breaks = []
 
+    # Attributes holding the cell data: one list or array per row.
+    _cell_storage_attrs = ('_cell_types', '_cell_values', '_cell_xf_indexes')
 
     def __init__(self, book, position, name, number):
         self.book = book
@@ -424,6 +426,11 @@ class Sheet(BaseObject):
         if xfx > -1:
             self._xf_index_stats[0] += 1
             return xfx
+        return self.default_xf_index(rowx, colx)
+
+    # XF index of a cell that has none of its own: that of its row or column,
+    # else the global default.
+    def default_xf_index(self, rowx, colx):
         # Check for a row xf_index
         try:
             xfx = self.rowinfo_map[rowx].xf_index
@@ -456,7 +463,7 @@ class Sheet(BaseObject):
     def row(self, rowx):
         return [
             self.cell(rowx, colx)
-            for colx in xrange(len(self._cell_values[rowx]))
+            for colx in xrange(self.row_len(rowx))
             ]
 
     ##
@@ -483,7 +490,7 @@ class Sheet(BaseObject):
     ##
     # Returns a slice of the {@link #Cell} objects in the given row.
     def row_slice(self, rowx, start_colx=0, end_colx=None):
-        nc = len(self._cell_values[rowx])
+        nc = self.row_len(rowx)
         if start_colx < 0:
             start_colx += nc
             if start_colx < 0:
@@ -597,26 +604,29 @@ class Sheet(BaseObject):
                 self.ncols,
                 )
         if not self.ragged_rows:
-            # fix ragged rows
-            ncols = self.ncols
-            s_cell_types = self._cell_types
-            s_cell_values = self._cell_values
-            s_cell_xf_indexes = self._cell_xf_indexes
-            s_fmt_info = self.formatting_info
-            # for rowx in xrange(self.nrows):
-            if self._first_full_rowx == -2:
-                ubound = self.nrows
-            else:
-                ubound = self._first_full_rowx
-            for rowx in xrange(ubound):
-                trow = s_cell_types[rowx]
-                rlen = len(trow)
-                nextra = ncols - rlen
-                if nextra > 0:
-                    s_cell_values[rowx][rlen:] = [UNICODE_LITERAL('')] * nextra
-                    trow[rlen:] = self.bt * nextra
-                    if s_fmt_info:
-                        s_cell_xf_indexes[rowx][rlen:] = self.bf * nextra
+            self.fix_ragged_rows()
+
+    def fix_ragged_rows(self):
+        # pad every row out to ncols cells
+        ncols = self.ncols
+        s_cell_types = self._cell_types
+        s_cell_values = self._cell_values
+        s_cell_xf_indexes = self._cell_xf_indexes
+        s_fmt_info = self.formatting_info
+        # for rowx in xrange(self.nrows):
+        if self._first_full_rowx == -2:
+            ubound = self.nrows
+        else:
+            ubound = self._first_full_rowx
+        for rowx in xrange(ubound):
+            trow = s_cell_types[rowx]
+            rlen = len(trow)
+            nextra = ncols - rlen
+            if nextra > 0:
+                s_cell_values[rowx][rlen:] = [UNICODE_LITERAL('')] * nextra
+                trow[rlen:] = self.bt * nextra
+                if s_fmt_info:
+                    s_cell_xf_indexes[rowx][rlen:] = self.bf * nextra
 
     def put_cell_ragged(self, rowx, colx, ctype, value, xf_index):
         if ctype is None:
@@ -750,356 +760,428 @@ class Sheet(BaseObject):
            raise
 
 
+    # Put the number cells values[i], with XF index xf_indexes[i], in row rowx
+    # from column first_colx onwards, as for a MULRK record. The cell types
+    # are looked up as in put_cell.
+    def put_number_cells(self, rowx, first_colx, values, xf_indexes):
+        nvalues = len(values)
+        if not nvalues:
+            return
+        type_map = self._xf_index_to_xl_type_map
+        last_colx = first_colx + nvalues - 1
+        # Putting the last cell first makes the row long enough for the rest.
+        self.put_cell(rowx, last_colx, None, values[-1], xf_indexes[-1])
+        self._cell_types[rowx][first_colx:last_colx] = array('B', [type_map[xf_index] for xf_index in xf_indexes[:-1]])
+        self._cell_values[rowx][first_colx:last_colx] = values[:-1]
+        if self.formatting_info:
+            self._cell_xf_indexes[rowx][first_colx:last_colx] = array('h', xf_indexes[:-1])
+
+    # Wraps put_cell for open_workbook(stop_at_row=...).
+    # Cell records arrive in row order, so the first cell of a later row means
+    # that the previous row is complete. Once stop_at_row returns true,
+    # stop_state[1] is set and all further cells are ignored.
+    def make_stopping_put_cell(self, stop_at_row, stop_state):
+        put_cell = self.put_cell
+        def stopping_put_cell(rowx, colx, ctype, value, xf_index):
+            if stop_state[1]:
+                return
+            if rowx > stop_state[0]:
+                if stop_state[0] >= 0 and stop_at_row(self, stop_state[0]):
+                    stop_state[1] = 1
+                    return
+                stop_state[0] = rowx
+            put_cell(rowx, colx, ctype, value, xf_index)
+        return stopping_put_cell
+
     # === Methods after this line neither know nor care about how cells are stored.
 
-    def read(self, bk):
-        global rc_stats
+    # Handlers for worksheet records, keyed by record code. iter_read() looks each
+    # record code up here and skips records that have no handler; there is no
+    # other dispatch. handler(buf, pos, data_len) is called with the record body
+    # at offset pos in buf, which is bk.mem unless that is a compdoc.VirtualStream,
+    # and bk._position already past the record. Only the EOF handler returns a
+    # true value, to end the sheet.
+    # The table is built for the sheet's BIFF version and formatting_info:
+    # records that are only used for formatting information (ROW, BLANK,
+    # COLINFO, MERGEDCELLS, ...) have no handler when formatting_info is False,
+    # and the hot cell records (NUMBER, RK, LABELSST) are decoded in place with
+    # precompiled Struct objects.
+    # put_number_cells is as for Sheet.put_number_cells, or None to put each
+    # cell of a MULRK record with put_cell.
+    def record_handlers(self, bk, put_cell, put_number_cells=None):
         DEBUG = 0
         blah = DEBUG or self.verbosity >= 2
         blah_rows = DEBUG or self.verbosity >= 4
         blah_formulas = 0 and blah
         r1c1 = 0
-        oldpos = bk._position
-        bk._position = self._position
         XL_SHRFMLA_ETC_ETC = (
             XL_SHRFMLA, XL_ARRAY, XL_TABLEOP, XL_TABLEOP2,
             XL_ARRAY2, XL_TABLEOP_B2,
             )
-        self_put_cell = self.put_cell
         local_unpack = unpack
-        bk_get_record_parts = bk.get_record_parts
         bv = self.biff_version
         fmt_info = self.formatting_info
-        do_sst_rich_text = fmt_info and bk._rich_text_runlist_map
+        rich_text_runlist_map = bk._rich_text_runlist_map
+        sharedstrings = bk._sharedstrings
         rowinfo_sharing_dict = {}
         txos = {}
-        eof_found = 0
-        while 1:
-            # if DEBUG: print "SHEET.READ: about to read from position %d" % bk._position
-            rc, data_len, data = bk_get_record_parts()
-            # if rc in rc_stats:
-            #     rc_stats[rc] += 1
-            # else:
-            #     rc_stats[rc] = 1
-            # if DEBUG: print "SHEET.READ: op 0x%04x, %d bytes %r" % (rc, data_len, data)
-            if rc == XL_NUMBER:
-                # [:14] in following stmt ignores extraneous rubbish at end of record.
-                # Sample file testEON-8.xls supplied by Jan Kraus.
-                rowx, colx, xf_index, d = local_unpack('<HHHd', data[:14])
-                # if xf_index == 0:
-                #     fprintf(self.logfile,
-                #         "NUMBER: r=%d c=%d xfx=%d %f\n", rowx, colx, xf_index, d)
-                self_put_cell(rowx, colx, None, d, xf_index)
-            elif rc == XL_LABELSST:
-                rowx, colx, xf_index, sstindex = local_unpack('<HHHi', data)
-                # print "LABELSST", rowx, colx, sstindex, bk._sharedstrings[sstindex]
-                self_put_cell(rowx, colx, XL_CELL_TEXT, bk._sharedstrings[sstindex], xf_index)
-                if do_sst_rich_text:
-                    runlist = bk._rich_text_runlist_map.get(sstindex)
-                    if runlist:
-                        self.rich_text_runlist_map[(rowx, colx)] = runlist
-            elif rc == XL_LABEL:
-                rowx, colx, xf_index = local_unpack('<HHH', data[0:6])
-                if bv < BIFF_FIRST_UNICODE:
-                    strg = unpack_string(data, 6, bk.encoding or bk.derive_encoding(), lenlen=2)
-                else:
-                    strg = unpack_unicode(data, 6, lenlen=2)
-                self_put_cell(rowx, colx, XL_CELL_TEXT, strg, xf_index)
-            elif rc == XL_RSTRING:
-                rowx, colx, xf_index = local_unpack('<HHH', data[0:6])
-                if bv < BIFF_FIRST_UNICODE:
-                    strg, pos = unpack_string_update_pos(data, 6, bk.encoding or bk.derive_encoding(), lenlen=2)
-                    nrt = BYTES_ORD(data[pos])
-                    pos += 1
-                    runlist = []
-                    for _unused in xrange(nrt):
-                        runlist.append(unpack('<BB', data[pos:pos+2]))
-                        pos += 2
-                    assert pos == len(data)
+        obj_state = [None] # [id of the last OBJ record, for a following TXO]
+        unpack_cell_header = _cell_header_struct.unpack_from
+        unpack_number = _number_struct.unpack_from
+
+        def do_number(buf, pos, data_len):
+            # Reading only 14 bytes ignores extraneous rubbish at end of record.
+            # Sample file testEON-8.xls supplied by Jan Kraus.
+            rowx, colx, xf_index, d = unpack_number(buf, pos)
+            put_cell(rowx, colx, None, d, xf_index)
+
+        def do_labelsst(buf, pos, data_len):
+            rowx, colx, xf_index, sstindex = unpack_cell_header(buf, pos)
+            put_cell(rowx, colx, XL_CELL_TEXT, sharedstrings[sstindex], xf_index)
+
+        def do_labelsst_rich_text(buf, pos, data_len):
+            rowx, colx, xf_index, sstindex = unpack_cell_header(buf, pos)
+            put_cell(rowx, colx, XL_CELL_TEXT, sharedstrings[sstindex], xf_index)
+            runlist = rich_text_runlist_map.get(sstindex)
+            if runlist:
+                self.rich_text_runlist_map[(rowx, colx)] = runlist
+
+        def do_rk(buf, pos, data_len):
+            rowx, colx, xf_index, rk = unpack_cell_header(buf, pos)
+            if rk & 2:
+                # integer; see unpack_RK()
+                if rk & 1:
+                    d = (rk >> 2) / 100.0
                 else:
-                    strg, pos = unpack_unicode_update_pos(data, 6, lenlen=2)
-                    nrt = unpack('<H', data[pos:pos+2])[0]
+                    d = float(rk >> 2)
+            else:
+                d = unpack_RK(buf[pos+6:pos+10])
+            put_cell(rowx, colx, None, d, xf_index)
+
+        def do_mulrk(buf, pos, data_len):
+            # The whole record is decoded with one struct call:
+            # row, first col, (xf_index, RK value) * n, last col
+            nitems = (data_len - 6) // 6
+            mulrk_struct = _mulrk_structs.get(nitems)
+            if mulrk_struct is None:
+                mulrk_struct = _mulrk_structs[nitems] = Struct('<HH' + 'Hi' * nitems)
+            result = mulrk_struct.unpack_from(buf, pos)
+            put_number_cells(result[0], result[1], unpack_RK_values(result[3::2]), result[2::2])
+
+        def do_mulrk_singly(buf, pos, data_len):
+            mulrk_row, mulrk_first = unpack_from('<HH', buf, pos)
+            nitems = (data_len - 6) // 6
+            result = unpack_from('<' + 'Hi' * nitems, buf, pos + 4)
+            values = unpack_RK_values(result[1::2])
+            for i in xrange(nitems):
+                put_cell(mulrk_row, mulrk_first + i, None, values[i], result[2 * i])
+
+        def do_label(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            rowx, colx, xf_index = local_unpack('<HHH', data[0:6])
+            if bv < BIFF_FIRST_UNICODE:
+                strg = unpack_string(data, 6, bk.encoding or bk.derive_encoding(), lenlen=2)
+            else:
+                strg = unpack_unicode(data, 6, lenlen=2)
+            put_cell(rowx, colx, XL_CELL_TEXT, strg, xf_index)
+
+        def do_rstring(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            rowx, colx, xf_index = local_unpack('<HHH', data[0:6])
+            if bv < BIFF_FIRST_UNICODE:
+                strg, pos = unpack_string_update_pos(data, 6, bk.encoding or bk.derive_encoding(), lenlen=2)
+                nrt = BYTES_ORD(data[pos])
+                pos += 1
+                runlist = []
+                for _unused in xrange(nrt):
+                    runlist.append(unpack('<BB', data[pos:pos+2]))
                     pos += 2
-                    runlist = []
-                    for _unused in xrange(nrt):
-                        runlist.append(unpack('<HH', data[pos:pos+4]))
-                        pos += 4
-                    assert pos == len(data)
-                self_put_cell(rowx, colx, XL_CELL_TEXT, strg, xf_index)
-                self.rich_text_runlist_map[(rowx, colx)] = runlist
-            elif rc == XL_RK:
-                rowx, colx, xf_index = local_unpack('<HHH', data[:6])
-                d = unpack_RK(data[6:10])
-                self_put_cell(rowx, colx, None, d, xf_index)
-            elif rc == XL_MULRK:
-                mulrk_row, mulrk_first = local_unpack('<HH', data[0:4])
-                mulrk_last, = local_unpack('<H', data[-2:])
-                pos = 4
-                for colx in xrange(mulrk_first, mulrk_last+1):
-                    xf_index, = local_unpack('<H', data[pos:pos+2])
-                    d = unpack_RK(data[pos+2:pos+6])
-                    pos += 6
-                    self_put_cell(mulrk_row, colx, None, d, xf_index)
-            elif rc == XL_ROW:
-                # Version 0.6.0a3: ROW records are just not worth using (for memory allocation).
-                # Version 0.6.1: now used for formatting info.
-                if not fmt_info: continue
-                rowx, bits1, bits2 = local_unpack('<H4xH4xi', data[0:16])
-                if not(0 <= rowx < self.utter_max_rows):
-                    print("*** NOTE: ROW record has row index %d; " \
-                        "should have 0 <= rowx < %d -- record ignored!" \
-                        % (rowx, self.utter_max_rows), file=self.logfile)
-                    continue
-                key = (bits1, bits2)
-                r = rowinfo_sharing_dict.get(key)
-                if r is None:
-                    rowinfo_sharing_dict[key] = r = Rowinfo()
-                    # Using upkbits() is far too slow on a file
-                    # with 30 sheets each with 10K rows :-(
-                    #    upkbits(r, bits1, (
-                    #        ( 0, 0x7FFF, 'height'),
-                    #        (15, 0x8000, 'has_default_height'),
-                    #        ))
-                    #    upkbits(r, bits2, (
-                    #        ( 0, 0x00000007, 'outline_level'),
-                    #        ( 4, 0x00000010, 'outline_group_starts_ends'),
-                    #        ( 5, 0x00000020, 'hidden'),
-                    #        ( 6, 0x00000040, 'height_mismatch'),
-                    #        ( 7, 0x00000080, 'has_default_xf_index'),
-                    #        (16, 0x0FFF0000, 'xf_index'),
-                    #        (28, 0x10000000, 'additional_space_above'),
-                    #        (29, 0x20000000, 'additional_space_below'),
-                    #        ))
-                    # So:
-                    r.height = bits1 & 0x7fff
-                    r.has_default_height = (bits1 >> 15) & 1
-                    r.outline_level = bits2 & 7
-                    r.outline_group_starts_ends = (bits2 >> 4) & 1
-                    r.hidden = (bits2 >> 5) & 1
-                    r.height_mismatch = (bits2 >> 6) & 1
-                    r.has_default_xf_index = (bits2 >> 7) & 1
-                    r.xf_index = (bits2 >> 16) & 0xfff
-                    r.additional_space_above = (bits2 >> 28) & 1
-                    r.additional_space_below = (bits2 >> 29) & 1
-                    if not r.has_default_xf_index:
-                        r.xf_index = -1
-                self.rowinfo_map[rowx] = r
-                if 0 and r.xf_index > -1:
-                    fprintf(self.logfile,
-                        "**ROW %d %d %d\n",
-                        self.number, rowx, r.xf_index)
-                if blah_rows:
-                    print('ROW', rowx, bits1, bits2, file=self.logfile)
-                    r.dump(self.logfile,
-                        header="--- sh #%d, rowx=%d ---" % (self.number, rowx))
-            elif rc in XL_FORMULA_OPCODES: # 06, 0206, 0406
-                # DEBUG = 1
-                # if DEBUG: print "FORMULA: rc: 0x%04x data: %r" % (rc, data)
-                if bv >= 50:
-                    rowx, colx, xf_index, result_str, flags = local_unpack('<HHH8sH', data[0:16])
-                    lenlen = 2
-                    tkarr_offset = 20
-                elif bv >= 30:
-                    rowx, colx, xf_index, result_str, flags = local_unpack('<HHH8sH', data[0:16])
-                    lenlen = 2
-                    tkarr_offset = 16
-                else: # BIFF2
-                    rowx, colx, cell_attr,  result_str, flags = local_unpack('<HH3s8sB', data[0:16])
-                    xf_index =  self.fixed_BIFF2_xfindex(cell_attr, rowx, colx)
-                    lenlen = 1
-                    tkarr_offset = 16
-                if blah_formulas: # testing formula dumper
-                    #### XXXX FIXME
-                    fprintf(self.logfile, "FORMULA: rowx=%d colx=%d\n", rowx, colx)
-                    fmlalen = local_unpack("<H", data[20:22])[0]
-                    decompile_formula(bk, data[22:], fmlalen, FMLA_TYPE_CELL,
-                        browx=rowx, bcolx=colx, blah=1, r1c1=r1c1)
-                if result_str[6:8] == b"\xFF\xFF":
-                    first_byte = BYTES_ORD(result_str[0])
-                    if first_byte == 0:
-                        # need to read next record (STRING)
-                        gotstring = 0
-                        # if flags & 8:
-                        if 1: # "flags & 8" applies only to SHRFMLA
-                            # actually there's an optional SHRFMLA or ARRAY etc record to skip over
-                            rc2, data2_len, data2 = bk.get_record_parts()
-                            if rc2 == XL_STRING or rc2 == XL_STRING_B2:
-                                gotstring = 1
-                            elif rc2 == XL_ARRAY:
-                                row1x, rownx, col1x, colnx, array_flags, tokslen = \
-                                    local_unpack("<HHBBBxxxxxH", data2[:14])
-                                if blah_formulas:
-                                    fprintf(self.logfile, "ARRAY: %d %d %d %d %d\n",
-                                        row1x, rownx, col1x, colnx, array_flags)
-                                    # dump_formula(bk, data2[14:], tokslen, bv, reldelta=0, blah=1)
-                            elif rc2 == XL_SHRFMLA:
-                                row1x, rownx, col1x, colnx, nfmlas, tokslen = \
-                                    local_unpack("<HHBBxBH", data2[:10])
-                                if blah_formulas:
-                                    fprintf(self.logfile, "SHRFMLA (sub): %d %d %d %d %d\n",
-                                        row1x, rownx, col1x, colnx, nfmlas)
-                                    decompile_formula(bk, data2[10:], tokslen, FMLA_TYPE_SHARED,
-                                        blah=1, browx=rowx, bcolx=colx, r1c1=r1c1)
-                            elif rc2 not in XL_SHRFMLA_ETC_ETC:
-                                raise XLRDError(
-                                    "Expected SHRFMLA, ARRAY, TABLEOP* or STRING record; found 0x%04x" % rc2)
-                            # if DEBUG: print "gotstring:", gotstring
-                        # now for the STRING record
-                        if not gotstring:
-                            rc2, _unused_len, data2 = bk.get_record_parts()
-                            if rc2 not in (XL_STRING, XL_STRING_B2):
-                                raise XLRDError("Expected STRING record; found 0x%04x" % rc2)
-                        # if DEBUG: print "STRING: data=%r BIFF=%d cp=%d" % (data2, self.biff_version, bk.encoding)
-                        strg = self.string_record_contents(data2)
-                        self.put_cell(rowx, colx, XL_CELL_TEXT, strg, xf_index)
-                        # if DEBUG: print "FORMULA strg %r" % strg
-                    elif first_byte == 1:
-                        # boolean formula result
-                        value = BYTES_ORD(result_str[2])
-                        self_put_cell(rowx, colx, XL_CELL_BOOLEAN, value, xf_index)
-                    elif first_byte == 2:
-                        # Error in cell
-                        value = BYTES_ORD(result_str[2])
-                        self_put_cell(rowx, colx, XL_CELL_ERROR, value, xf_index)
-                    elif first_byte == 3:
-                        # empty ... i.e. empty (zero-length) string, NOT an empty cell.
-                        self_put_cell(rowx, colx, XL_CELL_TEXT, "", xf_index)
-                    else:
-                        raise XLRDError("unexpected special case (0x%02x) in FORMULA" % first_byte)
+                assert pos == len(data)
+            else:
+                strg, pos = unpack_unicode_update_pos(data, 6, lenlen=2)
+                nrt = unpack('<H', data[pos:pos+2])[0]
+                pos += 2
+                runlist = []
+                for _unused in xrange(nrt):
+                    runlist.append(unpack('<HH', data[pos:pos+4]))
+                    pos += 4
+                assert pos == len(data)
+            put_cell(rowx, colx, XL_CELL_TEXT, strg, xf_index)
+            self.rich_text_runlist_map[(rowx, colx)] = runlist
+
+        def do_row(buf, pos, data_len):
+            # Version 0.6.1: now used for formatting info.
+            rowx, bits1, bits2 = local_unpack('<H4xH4xi', buf[pos:pos+16])
+            if not(0 <= rowx < self.utter_max_rows):
+                print("*** NOTE: ROW record has row index %d; " \
+                    "should have 0 <= rowx < %d -- record ignored!" \
+                    % (rowx, self.utter_max_rows), file=self.logfile)
+                return
+            key = (bits1, bits2)
+            r = rowinfo_sharing_dict.get(key)
+            if r is None:
+                rowinfo_sharing_dict[key] = r = Rowinfo()
+                # Using upkbits() is far too slow on a file
+                # with 30 sheets each with 10K rows :-(
+                #    upkbits(r, bits1, (
+                #        ( 0, 0x7FFF, 'height'),
+                #        (15, 0x8000, 'has_default_height'),
+                #        ))
+                #    upkbits(r, bits2, (
+                #        ( 0, 0x00000007, 'outline_level'),
+                #        ( 4, 0x00000010, 'outline_group_starts_ends'),
+                #        ( 5, 0x00000020, 'hidden'),
+                #        ( 6, 0x00000040, 'height_mismatch'),
+                #        ( 7, 0x00000080, 'has_default_xf_index'),
+                #        (16, 0x0FFF0000, 'xf_index'),
+                #        (28, 0x10000000, 'additional_space_above'),
+                #        (29, 0x20000000, 'additional_space_below'),
+                #        ))
+                # So:
+                r.height = bits1 & 0x7fff
+                r.has_default_height = (bits1 >> 15) & 1
+                r.outline_level = bits2 & 7
+                r.outline_group_starts_ends = (bits2 >> 4) & 1
+                r.hidden = (bits2 >> 5) & 1
+                r.height_mismatch = (bits2 >> 6) & 1
+                r.has_default_xf_index = (bits2 >> 7) & 1
+                r.xf_index = (bits2 >> 16) & 0xfff
+                r.additional_space_above = (bits2 >> 28) & 1
+                r.additional_space_below = (bits2 >> 29) & 1
+                if not r.has_default_xf_index:
+                    r.xf_index = -1
+            self.rowinfo_map[rowx] = r
+            if 0 and r.xf_index > -1:
+                fprintf(self.logfile,
+                    "**ROW %d %d %d\n",
+                    self.number, rowx, r.xf_index)
+            if blah_rows:
+                print('ROW', rowx, bits1, bits2, file=self.logfile)
+                r.dump(self.logfile,
+                    header="--- sh #%d, rowx=%d ---" % (self.number, rowx))
+
+        def do_formula(buf, pos, data_len): # 06, 0206, 0406
+            data = buf[pos:pos+data_len]
+            # DEBUG = 1
+            # if DEBUG: print "FORMULA: rc: 0x%04x data: %r" % (rc, data)
+            if bv >= 50:
+                rowx, colx, xf_index, result_str, flags = local_unpack('<HHH8sH', data[0:16])
+                lenlen = 2
+                tkarr_offset = 20
+            elif bv >= 30:
+                rowx, colx, xf_index, result_str, flags = local_unpack('<HHH8sH', data[0:16])
+                lenlen = 2
+                tkarr_offset = 16
+            else: # BIFF2
+                rowx, colx, cell_attr,  result_str, flags = local_unpack('<HH3s8sB', data[0:16])
+                xf_index =  self.fixed_BIFF2_xfindex(cell_attr, rowx, colx)
+                lenlen = 1
+                tkarr_offset = 16
+            if blah_formulas: # testing formula dumper
+                #### XXXX FIXME
+                fprintf(self.logfile, "FORMULA: rowx=%d colx=%d\n", rowx, colx)
+                fmlalen = local_unpack("<H", data[20:22])[0]
+                decompile_formula(bk, data[22:], fmlalen, FMLA_TYPE_CELL,
+                    browx=rowx, bcolx=colx, blah=1, r1c1=r1c1)
+            if result_str[6:8] == b"\xFF\xFF":
+                first_byte = BYTES_ORD(result_str[0])
+                if first_byte == 0:
+                    # need to read next record (STRING)
+                    gotstring = 0
+                    # if flags & 8:
+                    if 1: # "flags & 8" applies only to SHRFMLA
+                        # actually there's an optional SHRFMLA or ARRAY etc record to skip over
+                        rc2, data2_len, data2 = bk.get_record_parts()
+                        if rc2 == XL_STRING or rc2 == XL_STRING_B2:
+                            gotstring = 1
+                        elif rc2 == XL_ARRAY:
+                            row1x, rownx, col1x, colnx, array_flags, tokslen = \
+                                local_unpack("<HHBBBxxxxxH", data2[:14])
+                            if blah_formulas:
+                                fprintf(self.logfile, "ARRAY: %d %d %d %d %d\n",
+                                    row1x, rownx, col1x, colnx, array_flags)
+                                # dump_formula(bk, data2[14:], tokslen, bv, reldelta=0, blah=1)
+                        elif rc2 == XL_SHRFMLA:
+                            row1x, rownx, col1x, colnx, nfmlas, tokslen = \
+                                local_unpack("<HHBBxBH", data2[:10])
+                            if blah_formulas:
+                                fprintf(self.logfile, "SHRFMLA (sub): %d %d %d %d %d\n",
+                                    row1x, rownx, col1x, colnx, nfmlas)
+                                decompile_formula(bk, data2[10:], tokslen, FMLA_TYPE_SHARED,
+                                    blah=1, browx=rowx, bcolx=colx, r1c1=r1c1)
+                        elif rc2 not in XL_SHRFMLA_ETC_ETC:
+                            raise XLRDError(
+                                "Expected SHRFMLA, ARRAY, TABLEOP* or STRING record; found 0x%04x" % rc2)
+                        # if DEBUG: print "gotstring:", gotstring
+                    # now for the STRING record
+                    if not gotstring:
+                        rc2, _unused_len, data2 = bk.get_record_parts()
+                        if rc2 not in (XL_STRING, XL_STRING_B2):
+                            raise XLRDError("Expected STRING record; found 0x%04x" % rc2)
+                    # if DEBUG: print "STRING: data=%r BIFF=%d cp=%d" % (data2, self.biff_version, bk.encoding)
+                    strg = self.string_record_contents(data2)
+                    put_cell(rowx, colx, XL_CELL_TEXT, strg, xf_index)
+                    # if DEBUG: print "FORMULA strg %r" % strg
+                elif first_byte == 1:
+                    # boolean formula result
+                    value = BYTES_ORD(result_str[2])
+                    put_cell(rowx, colx, XL_CELL_BOOLEAN, value, xf_index)
+                elif first_byte == 2:
+                    # Error in cell
+                    value = BYTES_ORD(result_str[2])
+                    put_cell(rowx, colx, XL_CELL_ERROR, value, xf_index)
+                elif first_byte == 3:
+                    # empty ... i.e. empty (zero-length) string, NOT an empty cell.
+                    put_cell(rowx, colx, XL_CELL_TEXT, "", xf_index)
                 else:
-                    # it is a number
-                    d = local_unpack('<d', result_str)[0]
-                    self_put_cell(rowx, colx, None, d, xf_index)
-            elif rc == XL_BOOLERR:
-                rowx, colx, xf_index, value, is_err = local_unpack('<HHHBB', data[:8])
-                # Note OOo Calc 2.0 writes 9-byte BOOLERR records.
-                # OOo docs say 8. Excel writes 8.
-                cellty = (XL_CELL_BOOLEAN, XL_CELL_ERROR)[is_err]
-                # if DEBUG: print "XL_BOOLERR", rowx, colx, xf_index, value, is_err
-                self_put_cell(rowx, colx, cellty, value, xf_index)
-            elif rc == XL_COLINFO:
-                if not fmt_info: continue
-                c = Colinfo()
-                first_colx, last_colx, c.width, c.xf_index, flags \
-                    = local_unpack("<HHHHH", data[:10])
-                #### Colinfo.width is denominated in 256ths of a character,
-                #### *not* in characters.
-                if not(0 <= first_colx <= last_colx <= 256):
-                    # Note: 256 instead of 255 is a common mistake.
-                    # We silently ignore the non-existing 257th column in that case.
-                    print("*** NOTE: COLINFO record has first col index %d, last %d; " \
-                        "should have 0 <= first <= last <= 255 -- record ignored!" \
-                        % (first_colx, last_colx), file=self.logfile)
-                    del c
-                    continue
-                upkbits(c, flags, (
-                    ( 0, 0x0001, 'hidden'),
-                    ( 1, 0x0002, 'bit1_flag'),
-                    # *ALL* colinfos created by Excel in "default" cases are 0x0002!!
-                    # Maybe it's "locked" by analogy with XFProtection data.
-                    ( 8, 0x0700, 'outline_level'),
-                    (12, 0x1000, 'collapsed'),
-                    ))
-                for colx in xrange(first_colx, last_colx+1):
-                    if colx > 255: break # Excel does 0 to 256 inclusive
-                    self.colinfo_map[colx] = c
-                    if 0:
-                        fprintf(self.logfile,
-                            "**COL %d %d %d\n",
-                            self.number, colx, c.xf_index)
-                if blah:
-                    fprintf(
-                        self.logfile,
-                        "COLINFO sheet #%d cols %d-%d: wid=%d xf_index=%d flags=0x%04x\n",
-                        self.number, first_colx, last_colx, c.width, c.xf_index, flags,
-                        )
-                    c.dump(self.logfile, header='===')
-            elif rc == XL_DEFCOLWIDTH:
-                self.defcolwidth, = local_unpack("<H", data[:2])
-                if 0: print('DEFCOLWIDTH', self.defcolwidth, file=self.logfile)
-            elif rc == XL_STANDARDWIDTH:
-                if data_len != 2:
-                    print('*** ERROR *** STANDARDWIDTH', data_len, repr(data), file=self.logfile)
-                self.standardwidth, = local_unpack("<H", data[:2])
-                if 0: print('STANDARDWIDTH', self.standardwidth, file=self.logfile)
-            elif rc == XL_GCW:
-                if not fmt_info: continue # useless w/o COLINFO
-                assert data_len == 34
-                assert data[0:2] == b"\x20\x00"
-                iguff = unpack("<8i", data[2:34])
-                gcw = []
-                for bits in iguff:
-                    for j in xrange(32):
-                        gcw.append(bits & 1)
-                        bits >>= 1
-                self.gcw = tuple(gcw)
+                    raise XLRDError("unexpected special case (0x%02x) in FORMULA" % first_byte)
+            else:
+                # it is a number
+                d = local_unpack('<d', result_str)[0]
+                put_cell(rowx, colx, None, d, xf_index)
+
+        def do_boolerr(buf, pos, data_len):
+            rowx, colx, xf_index, value, is_err = local_unpack('<HHHBB', buf[pos:pos+8])
+            # Note OOo Calc 2.0 writes 9-byte BOOLERR records.
+            # OOo docs say 8. Excel writes 8.
+            cellty = (XL_CELL_BOOLEAN, XL_CELL_ERROR)[is_err]
+            # if DEBUG: print "XL_BOOLERR", rowx, colx, xf_index, value, is_err
+            put_cell(rowx, colx, cellty, value, xf_index)
+
+        def do_colinfo(buf, pos, data_len):
+            c = Colinfo()
+            first_colx, last_colx, c.width, c.xf_index, flags \
+                = local_unpack("<HHHHH", buf[pos:pos+10])
+            #### Colinfo.width is denominated in 256ths of a character,
+            #### *not* in characters.
+            if not(0 <= first_colx <= last_colx <= 256):
+                # Note: 256 instead of 255 is a common mistake.
+                # We silently ignore the non-existing 257th column in that case.
+                print("*** NOTE: COLINFO record has first col index %d, last %d; " \
+                    "should have 0 <= first <= last <= 255 -- record ignored!" \
+                    % (first_colx, last_colx), file=self.logfile)
+                return
+            upkbits(c, flags, (
+                ( 0, 0x0001, 'hidden'),
+                ( 1, 0x0002, 'bit1_flag'),
+                # *ALL* colinfos created by Excel in "default" cases are 0x0002!!
+                # Maybe it's "locked" by analogy with XFProtection data.
+                ( 8, 0x0700, 'outline_level'),
+                (12, 0x1000, 'collapsed'),
+                ))
+            for colx in xrange(first_colx, last_colx+1):
+                if colx > 255: break # Excel does 0 to 256 inclusive
+                self.colinfo_map[colx] = c
                 if 0:
-                    showgcw = "".join(map(lambda x: "F "[x], gcw)).rstrip().replace(' ', '.')
-                    print("GCW:", showgcw, file=self.logfile)
-            elif rc == XL_BLANK:
-                if not fmt_info: continue
-                rowx, colx, xf_index = local_unpack('<HHH', data[:6])
-                # if 0: print >> self.logfile, "BLANK", rowx, colx, xf_index
-                self_put_cell(rowx, colx, XL_CELL_BLANK, '', xf_index)
-            elif rc == XL_MULBLANK: # 00BE
-                if not fmt_info: continue
-                nitems = data_len >> 1
-                result = local_unpack("<%dH" % nitems, data)
-                rowx, mul_first = result[:2]
-                mul_last = result[-1]
-                # print >> self.logfile, "MULBLANK", rowx, mul_first, mul_last, data_len, nitems, mul_last + 4 - mul_first
-                assert nitems == mul_last + 4 - mul_first
-                pos = 2
-                for colx in xrange(mul_first, mul_last + 1):
-                    self_put_cell(rowx, colx, XL_CELL_BLANK, '', result[pos])
-                    pos += 1
-            elif rc == XL_DIMENSION or rc == XL_DIMENSION2:
-                if data_len == 0:
-                    # Four zero bytes after some other record. See github issue 64.
-                    continue
-                # if data_len == 10:
-                # Was crashing on BIFF 4.0 file w/o the two trailing unused bytes.
-                # Reported by Ralph Heimburger.
-                if bv < 80:
-                    dim_tuple = local_unpack('<HxxH', data[2:8])
-                else:
-                    dim_tuple = local_unpack('<ixxH', data[4:12])
-                self.nrows, self.ncols = 0, 0
-                self._dimnrows, self._dimncols = dim_tuple
-                if bv in (21, 30, 40) and self.book.xf_list and not self.book._xf_epilogue_done:
-                    self.book.xf_epilogue()
-                if blah:
                     fprintf(self.logfile,
-                        "sheet %d(%r) DIMENSIONS: ncols=%d nrows=%d\n",
-                        self.number, self.name, self._dimncols, self._dimnrows
-                        )
-            elif rc == XL_HLINK:
-                self.handle_hlink(data)
-            elif rc == XL_QUICKTIP:
-                self.handle_quicktip(data)
-            elif rc == XL_EOF:
-                DEBUG = 0
-                if DEBUG: print("SHEET.READ: EOF", file=self.logfile)
-                eof_found = 1
-                break
-            elif rc == XL_OBJ:
-                # handle SHEET-level objects; note there's a separate Book.handle_obj
-                saved_obj = self.handle_obj(data)
-                if saved_obj: saved_obj_id = saved_obj.id
-                else: saved_obj_id = None
-            elif rc == XL_MSO_DRAWING:
-                self.handle_msodrawingetc(rc, data_len, data)
-            elif rc == XL_TXO:
-                txo = self.handle_txo(data)
-                if txo and saved_obj_id:
-                    txos[saved_obj_id] = txo
-                    saved_obj_id = None
-            elif rc == XL_NOTE:
-                self.handle_note(data, txos)
-            elif rc == XL_FEAT11:
-                self.handle_feat11(data)
-            elif rc in bofcodes: ##### EMBEDDED BOF #####
-                version, boftype = local_unpack('<HH', data[0:4])
+                        "**COL %d %d %d\n",
+                        self.number, colx, c.xf_index)
+            if blah:
+                fprintf(
+                    self.logfile,
+                    "COLINFO sheet #%d cols %d-%d: wid=%d xf_index=%d flags=0x%04x\n",
+                    self.number, first_colx, last_colx, c.width, c.xf_index, flags,
+                    )
+                c.dump(self.logfile, header='===')
+
+        def do_defcolwidth(buf, pos, data_len):
+            self.defcolwidth, = local_unpack("<H", buf[pos:pos+2])
+            if 0: print('DEFCOLWIDTH', self.defcolwidth, file=self.logfile)
+
+        def do_standardwidth(buf, pos, data_len):
+            if data_len != 2:
+                print('*** ERROR *** STANDARDWIDTH', data_len, repr(buf[pos:pos+data_len]), file=self.logfile)
+            self.standardwidth, = local_unpack("<H", buf[pos:pos+2])
+            if 0: print('STANDARDWIDTH', self.standardwidth, file=self.logfile)
+
+        def do_gcw(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            assert data_len == 34
+            assert data[0:2] == b"\x20\x00"
+            iguff = unpack("<8i", data[2:34])
+            gcw = []
+            for bits in iguff:
+                for j in xrange(32):
+                    gcw.append(bits & 1)
+                    bits >>= 1
+            self.gcw = tuple(gcw)
+            if 0:
+                showgcw = "".join(map(lambda x: "F "[x], gcw)).rstrip().replace(' ', '.')
+                print("GCW:", showgcw, file=self.logfile)
+
+        def do_blank(buf, pos, data_len):
+            rowx, colx, xf_index = local_unpack('<HHH', buf[pos:pos+6])
+            # if 0: print >> self.logfile, "BLANK", rowx, colx, xf_index
+            put_cell(rowx, colx, XL_CELL_BLANK, '', xf_index)
+
+        def do_mulblank(buf, pos, data_len): # 00BE
+            nitems = data_len >> 1
+            result = local_unpack("<%dH" % nitems, buf[pos:pos+data_len])
+            rowx, mul_first = result[:2]
+            mul_last = result[-1]
+            # print >> self.logfile, "MULBLANK", rowx, mul_first, mul_last, data_len, nitems, mul_last + 4 - mul_first
+            assert nitems == mul_last + 4 - mul_first
+            pos = 2
+            for colx in xrange(mul_first, mul_last + 1):
+                put_cell(rowx, colx, XL_CELL_BLANK, '', result[pos])
+                pos += 1
+
+        def do_dimension(buf, pos, data_len):
+            if data_len == 0:
+                # Four zero bytes after some other record. See github issue 64.
+                return
+            data = buf[pos:pos+data_len]
+            # if data_len == 10:
+            # Was crashing on BIFF 4.0 file w/o the two trailing unused bytes.
+            # Reported by Ralph Heimburger.
+            if bv < 80:
+                dim_tuple = local_unpack('<HxxH', data[2:8])
+            else:
+                dim_tuple = local_unpack('<ixxH', data[4:12])
+            self.nrows, self.ncols = 0, 0
+            self._dimnrows, self._dimncols = dim_tuple
+            if bv in (21, 30, 40) and self.book.xf_list and not self.book._xf_epilogue_done:
+                self.book.xf_epilogue()
+            if blah:
+                fprintf(self.logfile,
+                    "sheet %d(%r) DIMENSIONS: ncols=%d nrows=%d\n",
+                    self.number, self.name, self._dimncols, self._dimnrows
+                    )
+
+        def do_hlink(buf, pos, data_len):
+            self.handle_hlink(buf[pos:pos+data_len])
+
+        def do_quicktip(buf, pos, data_len):
+            self.handle_quicktip(buf[pos:pos+data_len])
+
+        def do_eof(buf, pos, data_len):
+            if DEBUG: print("SHEET.READ: EOF", file=self.logfile)
+            return 1
+
+        def do_obj(buf, pos, data_len):
+            # handle SHEET-level objects; note there's a separate Book.handle_obj
+            saved_obj = self.handle_obj(buf[pos:pos+data_len])
+            if saved_obj: obj_state[0] = saved_obj.id
+            else: obj_state[0] = None
+
+        def do_msodrawing(buf, pos, data_len):
+            self.handle_msodrawingetc(XL_MSO_DRAWING, data_len, buf[pos:pos+data_len])
+
+        def do_txo(buf, pos, data_len):
+            txo = self.handle_txo(buf[pos:pos+data_len])
+            if txo and obj_state[0]:
+                txos[obj_state[0]] = txo
+                obj_state[0] = None
+
+        def do_note(buf, pos, data_len):
+            self.handle_note(buf[pos:pos+data_len], txos)
+
+        def do_feat11(buf, pos, data_len):
+            self.handle_feat11(buf[pos:pos+data_len])
+
+        def make_do_embedded_bof(rc):
+            def do_embedded_bof(buf, pos, data_len): ##### EMBEDDED BOF #####
+                version, boftype = local_unpack('<HH', buf[pos:pos+4])
                 if boftype != 0x20: # embedded chart
                     print("*** Unexpected embedded BOF (0x%04x) at offset %d: version=0x%04x type=0x%04x" \
                         % (rc, bk._position - data_len - 4, version, boftype), file=self.logfile)
@@ -1108,372 +1190,565 @@ class Sheet(BaseObject):
                     if code == XL_EOF:
                         break
                 if DEBUG: print("---> found EOF", file=self.logfile)
-            elif rc == XL_COUNTRY:
-                bk.handle_country(data)
-            elif rc == XL_LABELRANGES:
-                pos = 0
-                pos = unpack_cell_range_address_list_update_pos(
-                        self.row_label_ranges, data, pos, bv, addr_size=8,
-                        )
-                pos = unpack_cell_range_address_list_update_pos(
-                        self.col_label_ranges, data, pos, bv, addr_size=8,
-                        )
-                assert pos == data_len
-            elif rc == XL_ARRAY:
-                row1x, rownx, col1x, colnx, array_flags, tokslen = \
-                    local_unpack("<HHBBBxxxxxH", data[:14])
-                if blah_formulas:
-                    print("ARRAY:", row1x, rownx, col1x, colnx, array_flags, file=self.logfile)
-                    # dump_formula(bk, data[14:], tokslen, bv, reldelta=0, blah=1)
-            elif rc == XL_SHRFMLA:
-                row1x, rownx, col1x, colnx, nfmlas, tokslen = \
-                    local_unpack("<HHBBxBH", data[:10])
-                if blah_formulas:
-                    print("SHRFMLA (main):", row1x, rownx, col1x, colnx, nfmlas, file=self.logfile)
-                    decompile_formula(bk, data[10:], tokslen, FMLA_TYPE_SHARED,
-                        blah=1, browx=rowx, bcolx=colx, r1c1=r1c1)
-            elif rc == XL_CONDFMT:
-                if not fmt_info: continue
-                assert bv >= 80
-                num_CFs, needs_recalc, browx1, browx2, bcolx1, bcolx2 = \
-                    unpack("<6H", data[0:12])
-                if self.verbosity >= 1:
-                    fprintf(self.logfile,
-                        "\n*** WARNING: Ignoring CONDFMT (conditional formatting) record\n" \
-                        "*** in Sheet %d (%r).\n" \
-                        "*** %d CF record(s); needs_recalc_or_redraw = %d\n" \
-                        "*** Bounding box is %s\n",
-                        self.number, self.name, num_CFs, needs_recalc,
-                        rangename2d(browx1, browx2+1, bcolx1, bcolx2+1),
-                        )
-                olist = [] # updated by the function
-                pos = unpack_cell_range_address_list_update_pos(
-                    olist, data, 12, bv, addr_size=8)
-                # print >> self.logfile, repr(result), len(result)
-                if self.verbosity >= 1:
-                    fprintf(self.logfile,
-                        "*** %d individual range(s):\n" \
-                        "*** %s\n",
-                        len(olist),
-                        ", ".join([rangename2d(*coords) for coords in olist]),
-                        )
-            elif rc == XL_CF:
-                if not fmt_info: continue
-                cf_type, cmp_op, sz1, sz2, flags = unpack("<BBHHi", data[0:10])
-                font_block = (flags >> 26) & 1
-                bord_block = (flags >> 28) & 1
-                patt_block = (flags >> 29) & 1
+            return do_embedded_bof
+
+        def do_country(buf, pos, data_len):
+            bk.handle_country(buf[pos:pos+data_len])
+
+        def do_labelranges(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            pos = 0
+            pos = unpack_cell_range_address_list_update_pos(
+                    self.row_label_ranges, data, pos, bv, addr_size=8,
+                    )
+            pos = unpack_cell_range_address_list_update_pos(
+                    self.col_label_ranges, data, pos, bv, addr_size=8,
+                    )
+            assert pos == data_len
+
+        def do_array(buf, pos, data_len):
+            row1x, rownx, col1x, colnx, array_flags, tokslen = \
+                local_unpack("<HHBBBxxxxxH", buf[pos:pos+14])
+            if blah_formulas:
+                print("ARRAY:", row1x, rownx, col1x, colnx, array_flags, file=self.logfile)
+                # dump_formula(bk, data[14:], tokslen, bv, reldelta=0, blah=1)
+
+        def do_shrfmla(buf, pos, data_len):
+            row1x, rownx, col1x, colnx, nfmlas, tokslen = \
+                local_unpack("<HHBBxBH", buf[pos:pos+10])
+            if blah_formulas:
+                print("SHRFMLA (main):", row1x, rownx, col1x, colnx, nfmlas, file=self.logfile)
+                decompile_formula(bk, buf[pos+10:pos+data_len], tokslen, FMLA_TYPE_SHARED,
+                    blah=1, browx=row1x, bcolx=col1x, r1c1=r1c1)
+
+        def do_condfmt(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            assert bv >= 80
+            num_CFs, needs_recalc, browx1, browx2, bcolx1, bcolx2 = \
+                unpack("<6H", data[0:12])
+            if self.verbosity >= 1:
+                fprintf(self.logfile,
+                    "\n*** WARNING: Ignoring CONDFMT (conditional formatting) record\n" \
+                    "*** in Sheet %d (%r).\n" \
+                    "*** %d CF record(s); needs_recalc_or_redraw = %d\n" \
+                    "*** Bounding box is %s\n",
+                    self.number, self.name, num_CFs, needs_recalc,
+                    rangename2d(browx1, browx2+1, bcolx1, bcolx2+1),
+                    )
+            olist = [] # updated by the function
+            pos = unpack_cell_range_address_list_update_pos(
+                olist, data, 12, bv, addr_size=8)
+            # print >> self.logfile, repr(result), len(result)
+            if self.verbosity >= 1:
+                fprintf(self.logfile,
+                    "*** %d individual range(s):\n" \
+                    "*** %s\n",
+                    len(olist),
+                    ", ".join([rangename2d(*coords) for coords in olist]),
+                    )
+
+        def do_cf(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            cf_type, cmp_op, sz1, sz2, flags = unpack("<BBHHi", data[0:10])
+            font_block = (flags >> 26) & 1
+            bord_block = (flags >> 28) & 1
+            patt_block = (flags >> 29) & 1
+            if self.verbosity >= 1:
+                fprintf(self.logfile,
+                    "\n*** WARNING: Ignoring CF (conditional formatting) sub-record.\n" \
+                    "*** cf_type=%d, cmp_op=%d, sz1=%d, sz2=%d, flags=0x%08x\n" \
+                    "*** optional data blocks: font=%d, border=%d, pattern=%d\n",
+                    cf_type, cmp_op, sz1, sz2, flags,
+                    font_block, bord_block, patt_block,
+                    )
+            # hex_char_dump(data, 0, data_len, fout=self.logfile)
+            pos = 12
+            if font_block:
+                (font_height, font_options, weight, escapement, underline,
+                font_colour_index, two_bits, font_esc, font_underl) = \
+                unpack("<64x i i H H B 3x i 4x i i i 18x", data[pos:pos+118])
+                font_style = (two_bits > 1) & 1
+                posture = (font_options > 1) & 1
+                font_canc = (two_bits > 7) & 1
+                cancellation = (font_options > 7) & 1
                 if self.verbosity >= 1:
                     fprintf(self.logfile,
-                        "\n*** WARNING: Ignoring CF (conditional formatting) sub-record.\n" \
-                        "*** cf_type=%d, cmp_op=%d, sz1=%d, sz2=%d, flags=0x%08x\n" \
-                        "*** optional data blocks: font=%d, border=%d, pattern=%d\n",
-                        cf_type, cmp_op, sz1, sz2, flags,
-                        font_block, bord_block, patt_block,
-                        )
-                # hex_char_dump(data, 0, data_len, fout=self.logfile)
-                pos = 12
-                if font_block:
-                    (font_height, font_options, weight, escapement, underline,
-                    font_colour_index, two_bits, font_esc, font_underl) = \
-                    unpack("<64x i i H H B 3x i 4x i i i 18x", data[pos:pos+118])
-                    font_style = (two_bits > 1) & 1
-                    posture = (font_options > 1) & 1
-                    font_canc = (two_bits > 7) & 1
-                    cancellation = (font_options > 7) & 1
-                    if self.verbosity >= 1:
-                        fprintf(self.logfile,
-                            "*** Font info: height=%d, weight=%d, escapement=%d,\n" \
-                            "*** underline=%d, colour_index=%d, esc=%d, underl=%d,\n" \
-                            "*** style=%d, posture=%d, canc=%d, cancellation=%d\n",
-                            font_height, weight, escapement, underline,
-                            font_colour_index, font_esc, font_underl,
-                            font_style, posture, font_canc, cancellation,
-                            )
-                    pos += 118
-                if bord_block:
-                    pos += 8
-                if patt_block:
-                    pos += 4
-                fmla1 = data[pos:pos+sz1]
-                pos += sz1
-                if blah and sz1:
-                    fprintf(self.logfile,
-                        "*** formula 1:\n",
+                        "*** Font info: height=%d, weight=%d, escapement=%d,\n" \
+                        "*** underline=%d, colour_index=%d, esc=%d, underl=%d,\n" \
+                        "*** style=%d, posture=%d, canc=%d, cancellation=%d\n",
+                        font_height, weight, escapement, underline,
+                        font_colour_index, font_esc, font_underl,
+                        font_style, posture, font_canc, cancellation,
                         )
-                    dump_formula(bk, fmla1, sz1, bv, reldelta=0, blah=1)
-                fmla2 = data[pos:pos+sz2]
-                pos += sz2
-                assert pos == data_len
-                if blah and sz2:
-                    fprintf(self.logfile,
-                        "*** formula 2:\n",
-                        )
-                    dump_formula(bk, fmla2, sz2, bv, reldelta=0, blah=1)
-            elif rc == XL_DEFAULTROWHEIGHT:
-                if data_len == 4:
-                    bits, self.default_row_height = unpack("<HH", data[:4])
-                elif data_len == 2:
-                    self.default_row_height, = unpack("<H", data)
-                    bits = 0
-                    fprintf(self.logfile,
-                        "*** WARNING: DEFAULTROWHEIGHT record len is 2, " \
-                        "should be 4; assuming BIFF2 format\n")
-                else:
-                    bits = 0
-                    fprintf(self.logfile,
-                        "*** WARNING: DEFAULTROWHEIGHT record len is %d, " \
-                        "should be 4; ignoring this record\n",
-                        data_len)
-                self.default_row_height_mismatch = bits & 1
-                self.default_row_hidden = (bits >> 1) & 1
-                self.default_additional_space_above = (bits >> 2) & 1
-                self.default_additional_space_below = (bits >> 3) & 1
-            elif rc == XL_MERGEDCELLS:
-                if not fmt_info: continue
-                pos = unpack_cell_range_address_list_update_pos(
-                    self.merged_cells, data, 0, bv, addr_size=8)
-                if blah:
-                    fprintf(self.logfile,
-                        "MERGEDCELLS: %d ranges\n", (pos - 2) // 8)
-                assert pos == data_len, \
-                    "MERGEDCELLS: pos=%d data_len=%d" % (pos, data_len)
-            elif rc == XL_WINDOW2:
-                if bv >= 80 and data_len >= 14:
-                    (options,
-                    self.first_visible_rowx, self.first_visible_colx,
-                    self.gridline_colour_index,
-                    self.cached_page_break_preview_mag_factor,
-                    self.cached_normal_view_mag_factor
-                    ) = unpack("<HHHHxxHH", data[:14])
-                else:
-                    assert bv >= 30 # BIFF3-7
-                    (options,
-                    self.first_visible_rowx, self.first_visible_colx,
-                    ) = unpack("<HHH", data[:6])
-                    self.gridline_colour_rgb = unpack("<BBB", data[6:9])
-                    self.gridline_colour_index = nearest_colour_index(
-                        self.book.colour_map, self.gridline_colour_rgb, debug=0)
-                # options -- Bit, Mask, Contents:
-                # 0 0001H 0 = Show formula results 1 = Show formulas
-                # 1 0002H 0 = Do not show grid lines 1 = Show grid lines
-                # 2 0004H 0 = Do not show sheet headers 1 = Show sheet headers
-                # 3 0008H 0 = Panes are not frozen 1 = Panes are frozen (freeze)
-                # 4 0010H 0 = Show zero values as empty cells 1 = Show zero values
-                # 5 0020H 0 = Manual grid line colour 1 = Automatic grid line colour
-                # 6 0040H 0 = Columns from left to right 1 = Columns from right to left
-                # 7 0080H 0 = Do not show outline symbols 1 = Show outline symbols
-                # 8 0100H 0 = Keep splits if pane freeze is removed 1 = Remove splits if pane freeze is removed
-                # 9 0200H 0 = Sheet not selected 1 = Sheet selected (BIFF5-BIFF8)
-                # 10 0400H 0 = Sheet not visible 1 = Sheet visible (BIFF5-BIFF8)
-                # 11 0800H 0 = Show in normal view 1 = Show in page break preview (BIFF8)
-                # The freeze flag specifies, if a following PANE record (6.71) describes unfrozen or frozen panes.
-                for attr, _unused_defval in _WINDOW2_options:
-                    setattr(self, attr, options & 1)
-                    options >>= 1
-            elif rc == XL_SCL:
-                num, den = unpack("<HH", data)
-                result = 0
-                if den:
-                    result = (num * 100) // den
-                if not(10 <= result <= 400):
-                    if DEBUG or self.verbosity >= 0:
-                        print((
-                            "WARNING *** SCL rcd sheet %d: should have 0.1 <= num/den <= 4; got %d/%d"
-                            % (self.number, num, den)
-                            ), file=self.logfile)
-                    result = 100
-                self.scl_mag_factor = result
-            elif rc == XL_PANE:
-                (
-                self.vert_split_pos,
-                self.horz_split_pos,
-                self.horz_split_first_visible,
-                self.vert_split_first_visible,
-                self.split_active_pane,
-                ) = unpack("<HHHHB", data[:9])
-                self.has_pane_record = 1
-            elif rc == XL_HORIZONTALPAGEBREAKS:
-                if not fmt_info: continue
+                pos += 118
+            if bord_block:
+                pos += 8
+            if patt_block:
+                pos += 4
+            fmla1 = data[pos:pos+sz1]
+            pos += sz1
+            if blah and sz1:
+                fprintf(self.logfile,
+                    "*** formula 1:\n",
+                    )
+                dump_formula(bk, fmla1, sz1, bv, reldelta=0, blah=1)
+            fmla2 = data[pos:pos+sz2]
+            pos += sz2
+            assert pos == data_len
+            if blah and sz2:
+                fprintf(self.logfile,
+                    "*** formula 2:\n",
+                    )
+                dump_formula(bk, fmla2, sz2, bv, reldelta=0, blah=1)
+
+        def do_defaultrowheight(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            if data_len == 4:
+                bits, self.default_row_height = unpack("<HH", data[:4])
+            elif data_len == 2:
+                self.default_row_height, = unpack("<H", data)
+                bits = 0
+                fprintf(self.logfile,
+                    "*** WARNING: DEFAULTROWHEIGHT record len is 2, " \
+                    "should be 4; assuming BIFF2 format\n")
+            else:
+                bits = 0
+                fprintf(self.logfile,
+                    "*** WARNING: DEFAULTROWHEIGHT record len is %d, " \
+                    "should be 4; ignoring this record\n",
+                    data_len)
+            self.default_row_height_mismatch = bits & 1
+            self.default_row_hidden = (bits >> 1) & 1
+            self.default_additional_space_above = (bits >> 2) & 1
+            self.default_additional_space_below = (bits >> 3) & 1
+
+        def do_mergedcells(buf, pos, data_len):
+            pos = unpack_cell_range_address_list_update_pos(
+                self.merged_cells, buf[pos:pos+data_len], 0, bv, addr_size=8)
+            if blah:
+                fprintf(self.logfile,
+                    "MERGEDCELLS: %d ranges\n", (pos - 2) // 8)
+            assert pos == data_len, \
+                "MERGEDCELLS: pos=%d data_len=%d" % (pos, data_len)
+
+        def do_window2(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            if bv >= 80 and data_len >= 14:
+                (options,
+                self.first_visible_rowx, self.first_visible_colx,
+                self.gridline_colour_index,
+                self.cached_page_break_preview_mag_factor,
+                self.cached_normal_view_mag_factor
+                ) = unpack("<HHHHxxHH", data[:14])
+            else:
+                assert bv >= 30 # BIFF3-7
+                (options,
+                self.first_visible_rowx, self.first_visible_colx,
+                ) = unpack("<HHH", data[:6])
+                self.gridline_colour_rgb = unpack("<BBB", data[6:9])
+                self.gridline_colour_index = nearest_colour_index(
+                    self.book.colour_map, self.gridline_colour_rgb, debug=0)
+            # options -- Bit, Mask, Contents:
+            # 0 0001H 0 = Show formula results 1 = Show formulas
+            # 1 0002H 0 = Do not show grid lines 1 = Show grid lines
+            # 2 0004H 0 = Do not show sheet headers 1 = Show sheet headers
+            # 3 0008H 0 = Panes are not frozen 1 = Panes are frozen (freeze)
+            # 4 0010H 0 = Show zero values as empty cells 1 = Show zero values
+            # 5 0020H 0 = Manual grid line colour 1 = Automatic grid line colour
+            # 6 0040H 0 = Columns from left to right 1 = Columns from right to left
+            # 7 0080H 0 = Do not show outline symbols 1 = Show outline symbols
+            # 8 0100H 0 = Keep splits if pane freeze is removed 1 = Remove splits if pane freeze is removed
+            # 9 0200H 0 = Sheet not selected 1 = Sheet selected (BIFF5-BIFF8)
+            # 10 0400H 0 = Sheet not visible 1 = Sheet visible (BIFF5-BIFF8)
+            # 11 0800H 0 = Show in normal view 1 = Show in page break preview (BIFF8)
+            # The freeze flag specifies, if a following PANE record (6.71) describes unfrozen or frozen panes.
+            for attr, _unused_defval in _WINDOW2_options:
+                setattr(self, attr, options & 1)
+                options >>= 1
+
+        def do_scl(buf, pos, data_len):
+            num, den = unpack("<HH", buf[pos:pos+data_len])
+            result = 0
+            if den:
+                result = (num * 100) // den
+            if not(10 <= result <= 400):
+                if DEBUG or self.verbosity >= 0:
+                    print((
+                        "WARNING *** SCL rcd sheet %d: should have 0.1 <= num/den <= 4; got %d/%d"
+                        % (self.number, num, den)
+                        ), file=self.logfile)
+                result = 100
+            self.scl_mag_factor = result
+
+        def do_pane(buf, pos, data_len):
+            (
+            self.vert_split_pos,
+            self.horz_split_pos,
+            self.horz_split_first_visible,
+            self.vert_split_first_visible,
+            self.split_active_pane,
+            ) = unpack("<HHHHB", buf[pos:pos+9])
+            self.has_pane_record = 1
+
+        def make_do_pagebreaks(page_breaks, max_index):
+            def do_pagebreaks(buf, pos, data_len):
+                data = buf[pos:pos+data_len]
                 num_breaks, = local_unpack("<H", data[:2])
                 assert num_breaks * (2 + 4 * (bv >= 80)) + 2 == data_len
                 pos = 2
                 if bv < 80:
                     while pos < data_len:
-                        self.horizontal_page_breaks.append((local_unpack("<H", data[pos:pos+2])[0], 0, 255))
+                        page_breaks.append((local_unpack("<H", data[pos:pos+2])[0], 0, max_index))
                         pos += 2
                 else:
                     while pos < data_len:
-                        self.horizontal_page_breaks.append(local_unpack("<HHH", data[pos:pos+6]))
+                        page_breaks.append(local_unpack("<HHH", data[pos:pos+6]))
                         pos += 6
-            elif rc == XL_VERTICALPAGEBREAKS:
-                if not fmt_info: continue
-                num_breaks, = local_unpack("<H", data[:2])
-                assert num_breaks * (2 + 4 * (bv >= 80)) + 2 == data_len
-                pos = 2
-                if bv < 80:
-                    while pos < data_len:
-                        self.vertical_page_breaks.append((local_unpack("<H", data[pos:pos+2])[0], 0, 65535))
-                        pos += 2
+            return do_pagebreaks
+
+        handlers = {
+            XL_NUMBER: do_number,
+            XL_LABELSST: do_labelsst_rich_text if fmt_info and rich_text_runlist_map else do_labelsst,
+            XL_RK: do_rk,
+            XL_MULRK: do_mulrk if put_number_cells is not None else do_mulrk_singly,
+            XL_LABEL: do_label,
+            XL_RSTRING: do_rstring,
+            XL_BOOLERR: do_boolerr,
+            XL_DEFCOLWIDTH: do_defcolwidth,
+            XL_STANDARDWIDTH: do_standardwidth,
+            XL_DIMENSION: do_dimension,
+            XL_DIMENSION2: do_dimension,
+            XL_HLINK: do_hlink,
+            XL_QUICKTIP: do_quicktip,
+            XL_EOF: do_eof,
+            XL_OBJ: do_obj,
+            XL_MSO_DRAWING: do_msodrawing,
+            XL_TXO: do_txo,
+            XL_NOTE: do_note,
+            XL_FEAT11: do_feat11,
+            XL_COUNTRY: do_country,
+            XL_LABELRANGES: do_labelranges,
+            XL_ARRAY: do_array,
+            XL_SHRFMLA: do_shrfmla,
+            XL_DEFAULTROWHEIGHT: do_defaultrowheight,
+            XL_WINDOW2: do_window2,
+            XL_SCL: do_scl,
+            XL_PANE: do_pane,
+            }
+        for rc in XL_FORMULA_OPCODES:
+            handlers[rc] = do_formula
+        for rc in bofcodes:
+            handlers[rc] = make_do_embedded_bof(rc)
+        if fmt_info:
+            # Version 0.6.0a3: without formatting_info, ROW records are just not
+            # worth using (for memory allocation), and BLANK and MULBLANK records
+            # are ignored, as are the other records below.
+            handlers.update({
+                XL_ROW: do_row,
+                XL_COLINFO: do_colinfo,
+                XL_GCW: do_gcw, # useless w/o COLINFO
+                XL_BLANK: do_blank,
+                XL_MULBLANK: do_mulblank,
+                XL_CONDFMT: do_condfmt,
+                XL_CF: do_cf,
+                XL_MERGEDCELLS: do_mergedcells,
+                XL_HORIZONTALPAGEBREAKS: make_do_pagebreaks(self.horizontal_page_breaks, 255),
+                XL_VERTICALPAGEBREAKS: make_do_pagebreaks(self.vertical_page_breaks, 65535),
+                })
+        if bv <= 45:
+            handlers.update(self.biff2_to_4_record_handlers(bk, put_cell, rowinfo_sharing_dict, blah, blah_rows))
+        return handlers
+
+    # Handlers for the records that only occur in BIFF 2 to 4 worksheets; see record_handlers().
+    def biff2_to_4_record_handlers(self, bk, put_cell, rowinfo_sharing_dict, blah, blah_rows):
+        local_unpack = unpack
+        fmt_info = self.formatting_info
+
+        def do_format(buf, pos, data_len):
+            bk.handle_format(buf[pos:pos+data_len], XL_FORMAT)
+
+        def do_format2(buf, pos, data_len):
+            bk.handle_format(buf[pos:pos+data_len], XL_FORMAT2)
+
+        def do_font(buf, pos, data_len):
+            bk.handle_font(buf[pos:pos+data_len])
+
+        def do_style(buf, pos, data_len):
+            if not self.book._xf_epilogue_done:
+                self.book.xf_epilogue()
+            bk.handle_style(buf[pos:pos+data_len])
+
+        def do_palette(buf, pos, data_len):
+            bk.handle_palette(buf[pos:pos+data_len])
+
+        def do_builtinfmtcount(buf, pos, data_len):
+            bk.handle_builtinfmtcount(buf[pos:pos+data_len])
+
+        def do_xf(buf, pos, data_len): #### N.B. not XL_XF
+            bk.handle_xf(buf[pos:pos+data_len])
+
+        def do_datemode(buf, pos, data_len):
+            bk.handle_datemode(buf[pos:pos+data_len])
+
+        def do_codepage(buf, pos, data_len):
+            bk.handle_codepage(buf[pos:pos+data_len])
+
+        def do_filepass(buf, pos, data_len):
+            bk.handle_filepass(buf[pos:pos+data_len])
+
+        def do_writeaccess(buf, pos, data_len):
+            bk.handle_writeaccess(buf[pos:pos+data_len])
+
+        def do_ixfe(buf, pos, data_len):
+            self._ixfe = local_unpack('<H', buf[pos:pos+data_len])[0]
+
+        def do_number_b2(buf, pos, data_len):
+            rowx, colx, cell_attr, d = local_unpack('<HH3sd', buf[pos:pos+data_len])
+            put_cell(rowx, colx, None, d, self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
+
+        def do_integer(buf, pos, data_len):
+            rowx, colx, cell_attr, d = local_unpack('<HH3sH', buf[pos:pos+data_len])
+            put_cell(rowx, colx, None, float(d), self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
+
+        def do_label_b2(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            rowx, colx, cell_attr = local_unpack('<HH3s', data[0:7])
+            strg = unpack_string(data, 7, bk.encoding or bk.derive_encoding(), lenlen=1)
+            put_cell(rowx, colx, XL_CELL_TEXT, strg, self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
+
+        def do_boolerr_b2(buf, pos, data_len):
+            rowx, colx, cell_attr, value, is_err = local_unpack('<HH3sBB', buf[pos:pos+data_len])
+            cellty = (XL_CELL_BOOLEAN, XL_CELL_ERROR)[is_err]
+            # if DEBUG: print "XL_BOOLERR_B2", rowx, colx, cell_attr, value, is_err
+            put_cell(rowx, colx, cellty, value, self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
+
+        def do_blank_b2(buf, pos, data_len):
+            rowx, colx, cell_attr = local_unpack('<HH3s', buf[pos:pos+7])
+            put_cell(rowx, colx, XL_CELL_BLANK, '', self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
+
+        def do_efont(buf, pos, data_len):
+            bk.handle_efont(buf[pos:pos+data_len])
+
+        def do_row_b2(buf, pos, data_len):
+            data = buf[pos:pos+data_len]
+            rowx, bits1, bits2 = local_unpack('<H4xH2xB', data[0:11])
+            if not(0 <= rowx < self.utter_max_rows):
+                print("*** NOTE: ROW_B2 record has row index %d; " \
+                    "should have 0 <= rowx < %d -- record ignored!" \
+                    % (rowx, self.utter_max_rows), file=self.logfile)
+                return
+            if not (bits2 & 1):  # has_default_xf_index is false
+                xf_index = -1
+            elif data_len == 18:
+                # Seems the XF index in the cell_attr is dodgy
+                 xfx = local_unpack('<H', data[16:18])[0]
+                 xf_index = self.fixed_BIFF2_xfindex(cell_attr=None, rowx=rowx, colx=-1, true_xfx=xfx)
+            else:
+                cell_attr = data[13:16]
+                xf_index = self.fixed_BIFF2_xfindex(cell_attr, rowx, colx=-1)
+            key = (bits1, bits2, xf_index)
+            r = rowinfo_sharing_dict.get(key)
+            if r is None:
+                rowinfo_sharing_dict[key] = r = Rowinfo()
+                r.height = bits1 & 0x7fff
+                r.has_default_height = (bits1 >> 15) & 1
+                r.has_default_xf_index = bits2 & 1
+                r.xf_index = xf_index
+                # r.outline_level = 0             # set in __init__
+                # r.outline_group_starts_ends = 0 # set in __init__
+                # r.hidden = 0                    # set in __init__
+                # r.height_mismatch = 0           # set in __init__
+                # r.additional_space_above = 0    # set in __init__
+                # r.additional_space_below = 0    # set in __init__
+            self.rowinfo_map[rowx] = r
+            if 0 and r.xf_index > -1:
+                fprintf(self.logfile,
+                    "**ROW %d %d %d\n",
+                    self.number, rowx, r.xf_index)
+            if blah_rows:
+                print('ROW_B2', rowx, bits1, has_defaults, file=self.logfile)
+                r.dump(self.logfile,
+                    header="--- sh #%d, rowx=%d ---" % (self.number, rowx))
+
+        def do_colwidth(buf, pos, data_len): # BIFF2 only
+            first_colx, last_colx, width\
+                = local_unpack("<BBH", buf[pos:pos+4])
+            if not(first_colx <= last_colx):
+                print("*** NOTE: COLWIDTH record has first col index %d, last %d; " \
+                    "should have first <= last -- record ignored!" \
+                    % (first_colx, last_colx), file=self.logfile)
+                return
+            for colx in xrange(first_colx, last_colx+1):
+                if colx in self.colinfo_map:
+                    c = self.colinfo_map[colx]
                 else:
-                    while pos < data_len:
-                        self.vertical_page_breaks.append(local_unpack("<HHH", data[pos:pos+6]))
-                        pos += 6
-            #### all of the following are for BIFF <= 4W
-            elif bv <= 45:
-                if rc == XL_FORMAT or rc == XL_FORMAT2:
-                    bk.handle_format(data, rc)
-                elif rc == XL_FONT or rc == XL_FONT_B3B4:
-                    bk.handle_font(data)
-                elif rc == XL_STYLE:
-                    if not self.book._xf_epilogue_done:
-                        self.book.xf_epilogue()
-                    bk.handle_style(data)
-                elif rc == XL_PALETTE:
-                    bk.handle_palette(data)
-                elif rc == XL_BUILTINFMTCOUNT:
-                    bk.handle_builtinfmtcount(data)
-                elif rc == XL_XF4 or rc == XL_XF3 or rc == XL_XF2: #### N.B. not XL_XF
-                    bk.handle_xf(data)
-                elif rc == XL_DATEMODE:
-                    bk.handle_datemode(data)
-                elif rc == XL_CODEPAGE:
-                    bk.handle_codepage(data)
-                elif rc == XL_FILEPASS:
-                    bk.handle_filepass(data)
-                elif rc == XL_WRITEACCESS:
-                    bk.handle_writeaccess(data)
-                elif rc == XL_IXFE:
-                    self._ixfe = local_unpack('<H', data)[0]
-                elif rc == XL_NUMBER_B2:
-                    rowx, colx, cell_attr, d = local_unpack('<HH3sd', data)
-                    self_put_cell(rowx, colx, None, d, self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
-                elif rc == XL_INTEGER:
-                    rowx, colx, cell_attr, d = local_unpack('<HH3sH', data)
-                    self_put_cell(rowx, colx, None, float(d), self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
-                elif rc == XL_LABEL_B2:
-                    rowx, colx, cell_attr = local_unpack('<HH3s', data[0:7])
-                    strg = unpack_string(data, 7, bk.encoding or bk.derive_encoding(), lenlen=1)
-                    self_put_cell(rowx, colx, XL_CELL_TEXT, strg, self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
-                elif rc == XL_BOOLERR_B2:
-                    rowx, colx, cell_attr, value, is_err = local_unpack('<HH3sBB', data)
-                    cellty = (XL_CELL_BOOLEAN, XL_CELL_ERROR)[is_err]
-                    # if DEBUG: print "XL_BOOLERR_B2", rowx, colx, cell_attr, value, is_err
-                    self_put_cell(rowx, colx, cellty, value, self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
-                elif rc == XL_BLANK_B2:
-                    if not fmt_info: continue
-                    rowx, colx, cell_attr = local_unpack('<HH3s', data[:7])
-                    self_put_cell(rowx, colx, XL_CELL_BLANK, '', self.fixed_BIFF2_xfindex(cell_attr, rowx, colx))
-                elif rc == XL_EFONT:
-                    bk.handle_efont(data)
-                elif rc == XL_ROW_B2:
-                    if not fmt_info: continue
-                    rowx, bits1, bits2 = local_unpack('<H4xH2xB', data[0:11])
-                    if not(0 <= rowx < self.utter_max_rows):
-                        print("*** NOTE: ROW_B2 record has row index %d; " \
-                            "should have 0 <= rowx < %d -- record ignored!" \
-                            % (rowx, self.utter_max_rows), file=self.logfile)
-                        continue
-                    if not (bits2 & 1):  # has_default_xf_index is false
-                        xf_index = -1
-                    elif data_len == 18:
-                        # Seems the XF index in the cell_attr is dodgy
-                         xfx = local_unpack('<H', data[16:18])[0]
-                         xf_index = self.fixed_BIFF2_xfindex(cell_attr=None, rowx=rowx, colx=-1, true_xfx=xfx)
-                    else:
-                        cell_attr = data[13:16]
-                        xf_index = self.fixed_BIFF2_xfindex(cell_attr, rowx, colx=-1)
-                    key = (bits1, bits2, xf_index)
-                    r = rowinfo_sharing_dict.get(key)
-                    if r is None:
-                        rowinfo_sharing_dict[key] = r = Rowinfo()
-                        r.height = bits1 & 0x7fff
-                        r.has_default_height = (bits1 >> 15) & 1
-                        r.has_default_xf_index = bits2 & 1
-                        r.xf_index = xf_index
-                        # r.outline_level = 0             # set in __init__
-                        # r.outline_group_starts_ends = 0 # set in __init__
-                        # r.hidden = 0                    # set in __init__
-                        # r.height_mismatch = 0           # set in __init__
-                        # r.additional_space_above = 0    # set in __init__
-                        # r.additional_space_below = 0    # set in __init__
-                    self.rowinfo_map[rowx] = r
-                    if 0 and r.xf_index > -1:
-                        fprintf(self.logfile,
-                            "**ROW %d %d %d\n",
-                            self.number, rowx, r.xf_index)
-                    if blah_rows:
-                        print('ROW_B2', rowx, bits1, has_defaults, file=self.logfile)
-                        r.dump(self.logfile,
-                            header="--- sh #%d, rowx=%d ---" % (self.number, rowx))
-                elif rc == XL_COLWIDTH: # BIFF2 only
-                    if not fmt_info: continue
-                    first_colx, last_colx, width\
-                        = local_unpack("<BBH", data[:4])
-                    if not(first_colx <= last_colx):
-                        print("*** NOTE: COLWIDTH record has first col index %d, last %d; " \
-                            "should have first <= last -- record ignored!" \
-                            % (first_colx, last_colx), file=self.logfile)
-                        continue
-                    for colx in xrange(first_colx, last_colx+1):
-                        if colx in self.colinfo_map:
-                            c = self.colinfo_map[colx]
-                        else:
-                            c = Colinfo()
-                            self.colinfo_map[colx] = c
-                        c.width = width
-                    if blah:
-                        fprintf(
-                            self.logfile,
-                            "COLWIDTH sheet #%d cols %d-%d: wid=%d\n",
-                            self.number, first_colx, last_colx, width
-                            )
-                elif rc == XL_COLUMNDEFAULT: # BIFF2 only
-                    if not fmt_info: continue
-                    first_colx, last_colx = local_unpack("<HH", data[:4])
-                    #### Warning OOo docs wrong; first_colx <= colx < last_colx
-                    if blah:
-                        fprintf(
-                            self.logfile,
-                            "COLUMNDEFAULT sheet #%d cols in range(%d, %d)\n",
-                            self.number, first_colx, last_colx
-                            )
-                    if not(0 <= first_colx < last_colx <= 256):
-                        print("*** NOTE: COLUMNDEFAULT record has first col index %d, last %d; " \
-                            "should have 0 <= first < last <= 256" \
-                            % (first_colx, last_colx), file=self.logfile)
-                        last_colx = min(last_colx, 256)
-                    for colx in xrange(first_colx, last_colx):
-                        offset = 4 + 3 * (colx - first_colx)
-                        cell_attr = data[offset:offset+3]
-                        xf_index = self.fixed_BIFF2_xfindex(cell_attr, rowx=-1, colx=colx)
-                        if colx in self.colinfo_map:
-                            c = self.colinfo_map[colx]
-                        else:
-                            c = Colinfo()
-                            self.colinfo_map[colx] = c
-                        c.xf_index = xf_index
-                elif rc == XL_WINDOW2_B2: # BIFF 2 only
-                    attr_names = ("show_formulas", "show_grid_lines", "show_sheet_headers",
-                        "panes_are_frozen", "show_zero_values")
-                    for attr, char in zip(attr_names, data[0:5]):
-                        setattr(self, attr, int(char != b'\0'))
-                    (self.first_visible_rowx, self.first_visible_colx,
-                    self.automatic_grid_line_colour,
-                    ) = unpack("<HHB", data[5:10])
-                    self.gridline_colour_rgb = unpack("<BBB", data[10:13])
-                    self.gridline_colour_index = nearest_colour_index(
-                        self.book.colour_map, self.gridline_colour_rgb, debug=0)
+                    c = Colinfo()
+                    self.colinfo_map[colx] = c
+                c.width = width
+            if blah:
+                fprintf(
+                    self.logfile,
+                    "COLWIDTH sheet #%d cols %d-%d: wid=%d\n",
+                    self.number, first_colx, last_colx, width
+                    )
+
+        def do_columndefault(buf, pos, data_len): # BIFF2 only
+            data = buf[pos:pos+data_len]
+            first_colx, last_colx = local_unpack("<HH", data[:4])
+            #### Warning OOo docs wrong; first_colx <= colx < last_colx
+            if blah:
+                fprintf(
+                    self.logfile,
+                    "COLUMNDEFAULT sheet #%d cols in range(%d, %d)\n",
+                    self.number, first_colx, last_colx
+                    )
+            if not(0 <= first_colx < last_colx <= 256):
+                print("*** NOTE: COLUMNDEFAULT record has first col index %d, last %d; " \
+                    "should have 0 <= first < last <= 256" \
+                    % (first_colx, last_colx), file=self.logfile)
+                last_colx = min(last_colx, 256)
+            for colx in xrange(first_colx, last_colx):
+                offset = 4 + 3 * (colx - first_colx)
+                cell_attr = data[offset:offset+3]
+                xf_index = self.fixed_BIFF2_xfindex(cell_attr, rowx=-1, colx=colx)
+                if colx in self.colinfo_map:
+                    c = self.colinfo_map[colx]
+                else:
+                    c = Colinfo()
+                    self.colinfo_map[colx] = c
+                c.xf_index = xf_index
+
+        def do_window2_b2(buf, pos, data_len): # BIFF 2 only
+            data = buf[pos:pos+data_len]
+            attr_names = ("show_formulas", "show_grid_lines", "show_sheet_headers",
+                "panes_are_frozen", "show_zero_values")
+            for attr, char in zip(attr_names, data[0:5]):
+                setattr(self, attr, int(char != b'\0'))
+            (self.first_visible_rowx, self.first_visible_colx,
+            self.automatic_grid_line_colour,
+            ) = unpack("<HHB", data[5:10])
+            self.gridline_colour_rgb = unpack("<BBB", data[10:13])
+            self.gridline_colour_index = nearest_colour_index(
+                self.book.colour_map, self.gridline_colour_rgb, debug=0)
+
+        handlers = {
+            XL_FORMAT: do_format,
+            XL_FORMAT2: do_format2,
+            XL_FONT: do_font,
+            XL_FONT_B3B4: do_font,
+            XL_STYLE: do_style,
+            XL_PALETTE: do_palette,
+            XL_BUILTINFMTCOUNT: do_builtinfmtcount,
+            XL_XF4: do_xf,
+            XL_XF3: do_xf,
+            XL_XF2: do_xf,
+            XL_DATEMODE: do_datemode,
+            XL_CODEPAGE: do_codepage,
+            XL_FILEPASS: do_filepass,
+            XL_WRITEACCESS: do_writeaccess,
+            XL_IXFE: do_ixfe,
+            XL_NUMBER_B2: do_number_b2,
+            XL_INTEGER: do_integer,
+            XL_LABEL_B2: do_label_b2,
+            XL_BOOLERR_B2: do_boolerr_b2,
+            XL_EFONT: do_efont,
+            XL_WINDOW2_B2: do_window2_b2,
+            }
+        if fmt_info:
+            handlers.update({
+                XL_BLANK_B2: do_blank_b2,
+                XL_ROW_B2: do_row_b2,
+                XL_COLWIDTH: do_colwidth,
+                XL_COLUMNDEFAULT: do_columndefault,
+                })
+        return handlers
+
+    def read(self, bk):
+        for _ in self.iter_read(bk):
+            pass
+        return 1
+
+    ##
+    # Generator version of read(). If row_buffer is a RowBuffer whose put_cell
+    # receives the cells, each row it has completed is yielded as (rowx, values)
+    # while the sheet's records are being read; otherwise nothing is yielded.
+    # Between rows the book's record position is restored, so other sheets may
+    # be read while the generator is suspended.
+    def iter_read(self, bk, row_buffer=None):
+        oldpos = bk._position
+        bk._position = self._position
+        self_put_cell = self.put_cell
+        stop_state = None
+        if bk.stop_at_row is not None and row_buffer is None:
+            stop_state = [-1, 0] # [highest rowx seen, stop requested]
+            self_put_cell = self.make_stopping_put_cell(bk.stop_at_row, stop_state)
+        local_unpack_from = unpack_from
+        mem = bk.mem
+        mem_record_at = bk._mem_record_at
+        # Records within the run [run_start, run_end) of the stream are read
+        # straight from file_mem; mem_record_at is only called at run boundaries.
+        if mem_record_at is None:
+            file_mem = mem
+            run_start, run_end, run_delta = 0, sys.maxsize, 0
+        else:
+            file_mem = mem.mem
+            run_start = run_end = run_delta = 0
+        run_header_end = run_end - 4
+        if stop_state is not None:
+            self_put_number_cells = None
+        elif row_buffer is not None:
+            self_put_number_cells = row_buffer.put_number_cells
+        else:
+            self_put_number_cells = self.put_number_cells
+        get_handler = self.record_handlers(bk, self_put_cell, self_put_number_cells).get
+        eof_found = 0
+        done_rows = None
+        if row_buffer is not None:
+            done_rows = row_buffer.done_rows
+        while 1:
+            if done_rows:
+                for row in done_rows:
+                    posn = bk._position
+                    bk._position = oldpos
+                    yield row
+                    bk._position = posn
+                del done_rows[:]
+            if stop_state is not None and stop_state[1]:
+                # stop_at_row asked for the rest of the sheet to be skipped
+                eof_found = 1
+                break
+            # Same as bk.get_record_parts(), but the record body is left in place;
+            # the handlers copy it only when they need to.
+            recpos = bk._position
+            if run_start <= recpos <= run_header_end:
+                buf = file_mem
+                pos = recpos + run_delta
+                rc, data_len = local_unpack_from('<HH', buf, pos)
+                pos += 4
+                if recpos + 4 + data_len > run_end:
+                    buf, pos, rc, data_len = mem_record_at(recpos)
             else:
-                # if DEBUG: print "SHEET.READ: Unhandled record type %02x %d bytes %r" % (rc, data_len, data)
-                pass
+                buf, pos, rc, data_len = mem_record_at(recpos)
+                run_start, run_end, run_delta = mem.find_run(recpos)
+                run_header_end = run_end - 4
+            bk._position = recpos + 4 + data_len
+            handler = get_handler(rc)
+            if handler is not None and handler(buf, pos, data_len):
+                eof_found = 1
+                break
         if not eof_found:
             raise XLRDError("Sheet %d (%r) missing EOF record" \
                 % (self.number, self.name))
-        self.tidy_dimensions()
+        if row_buffer is None:
+            # Streamed cells never reach the sheet, so it has no dimensions to tidy,
+            # and the cell put in for merged cells would be passed on as data.
+            self.tidy_dimensions()
         self.update_cooked_mag_factors()
         bk._position = oldpos
-        return 1
+        if done_rows:
+            for row in done_rows:
+                yield row
+            del done_rows[:]
     
     def string_record_contents(self, data):
         bv = self.biff_version
@@ -2065,6 +2340,289 @@ class Sheet(BaseObject):
             rupBuild, unusedShort,listFlags, lPosStmCache, cbStmCache,
             cchStmCache, lem, rgbHashParam, cchName), file=self.logfile)
 
+##
+# <p>A {@link #Sheet} that stores its cells column by column; used instead of Sheet
+# when open_workbook(..., compact_cells=True) is called.</p>
+#
+# <p>Each column has an array('B') of cell types and an array('d') of cell values:
+# numbers and dates are stored as they are, booleans and error codes as numbers,
+# and text as an index into a table of the distinct strings in the sheet (the
+# strings themselves are shared with the Book's SST). Empty and blank cells take
+# one type byte and one value slot each; no '' value objects are created.
+# Cell values are rebuilt by the usual accessors, cell_value(), row_values(),
+# col_values() etc., and are equal to those of a Sheet.</p>
+#
+# <p>So every cell up to nrows x ncols costs about 9 bytes (11 with formatting_info,
+# for the array('h') of XF indexes), whether it holds a value or not; blanks are
+# not stored sparsely, so that any cell is found by indexing its column.
+# Text is not stored as SST indexes, because LABEL, RSTRING and formula
+# result cells, and xlsx inline strings, have no SST entry; the per-sheet text
+# table costs one reference per distinct string in the sheet.
+# A sheet of mostly text therefore takes about as much memory as a Sheet, and
+# a sparse one more than a Sheet read with ragged_rows=True.</p>
+#
+# <p>Rows are always padded out to ncols cells: open_workbook(ragged_rows=True)
+# is ignored.</p>
+
+class ColumnarSheet(Sheet):
+
+    _cell_storage_attrs = ('_col_types', '_col_values', '_col_xf_indexes', '_text_table')
+
+    def __init__(self, book, position, name, number):
+        Sheet.__init__(self, book, position, name, number)
+        self.ragged_rows = False
+        self.put_cell = self.put_cell_columnar
+        self.bv = array('d', [0.0])
+        self._col_types = []
+        self._col_values = []
+        self._col_xf_indexes = []
+        self._text_table = []
+        self._text_index = {}
+
+    def cell(self, rowx, colx):
+        if self.formatting_info:
+            xfx = self.cell_xf_index(rowx, colx)
+        else:
+            xfx = None
+        ctype = self._col_types[colx][rowx]
+        return Cell(
+            ctype,
+            _columnar_value(ctype, self._col_values[colx][rowx], self._text_table),
+            xfx,
+            )
+
+    def cell_value(self, rowx, colx):
+        return _columnar_value(
+            self._col_types[colx][rowx],
+            self._col_values[colx][rowx],
+            self._text_table,
+            )
+
+    def cell_type(self, rowx, colx):
+        return self._col_types[colx][rowx]
+
+    def cell_xf_index(self, rowx, colx):
+        self.req_fmt_info()
+        xfx = self._col_xf_indexes[colx][rowx]
+        if xfx > -1:
+            self._xf_index_stats[0] += 1
+            return xfx
+        return self.default_xf_index(rowx, colx)
+
+    def row_len(self, rowx):
+        if rowx >= self.nrows:
+            raise IndexError(rowx)
+        return self.ncols
+
+    def row_types(self, rowx, start_colx=0, end_colx=None):
+        return array('B', [
+            types[rowx]
+            for types in self._col_types[start_colx:end_colx]
+            ])
+
+    def row_values(self, rowx, start_colx=0, end_colx=None):
+        if rowx >= self.nrows:
+            raise IndexError(rowx)
+        text_table = self._text_table
+        empty = UNICODE_LITERAL('')
+        values = []
+        append = values.append
+        # _columnar_value(), inlined
+        for types, col_values in zip(self._col_types[start_colx:end_colx],
+                                     self._col_values[start_colx:end_colx]):
+            try:
+                ctype = types[rowx]
+            except IndexError:
+                # While the sheet is being read, a column may not reach rowx yet.
+                append(empty)
+                continue
+            if ctype == XL_CELL_NUMBER or ctype == XL_CELL_DATE:
+                append(col_values[rowx])
+            elif ctype == XL_CELL_TEXT:
+                append(text_table[int(col_values[rowx])])
+            elif ctype == XL_CELL_EMPTY or ctype == XL_CELL_BLANK:
+                append(empty)
+            else:
+                append(int(col_values[rowx]))
+        return values
+
+    def col_values(self, colx, start_rowx=0, end_rowx=None):
+        text_table = self._text_table
+        return [
+            _columnar_value(ctype, value, text_table)
+            for ctype, value in zip(self._col_types[colx][start_rowx:end_rowx],
+                                    self._col_values[colx][start_rowx:end_rowx])
+            ]
+
+    def col_types(self, colx, start_rowx=0, end_rowx=None):
+        return self._col_types[colx][start_rowx:end_rowx].tolist()
+
+    # === Following methods are used in building the worksheet.
+    # === They are not part of the API.
+
+    def fix_ragged_rows(self):
+        # make every column exactly nrows cells long
+        nrows = self.nrows
+        self.add_columns(self.ncols)
+        fmt_info = self.formatting_info
+        for colx, types in enumerate(self._col_types):
+            nextra = nrows - len(types)
+            if nextra > 0:
+                types.extend(self.bt * nextra)
+                self._col_values[colx].extend(self.bv * nextra)
+                if fmt_info:
+                    self._col_xf_indexes[colx].extend(self.bf * nextra)
+            elif nextra < 0:
+                del types[nrows:]
+                del self._col_values[colx][nrows:]
+                if fmt_info:
+                    del self._col_xf_indexes[colx][nrows:]
+        # Only needed if more text cells are added; rebuilt by add_text().
+        self._text_index = None
+
+    def add_columns(self, ncols):
+        col_types = self._col_types
+        fmt_info = self.formatting_info
+        for _unused in xrange(len(col_types), ncols):
+            col_types.append(self.bt * 0)
+            self._col_values.append(self.bv * 0)
+            if fmt_info:
+                self._col_xf_indexes.append(self.bf * 0)
+        if ncols > self.ncols:
+            self.ncols = ncols
+
+    def add_text(self, value):
+        text_index = self._text_index
+        if text_index is None:
+            text_index = self._text_index = dict(
+                (text, index) for index, text in enumerate(self._text_table))
+            if value in text_index:
+                return text_index[value]
+        index = text_index[value] = len(self._text_table)
+        self._text_table.append(value)
+        return index
+
+    def put_number_cells(self, rowx, first_colx, values, xf_indexes):
+        put_cell = self.put_cell
+        for i, value in enumerate(values):
+            put_cell(rowx, first_colx + i, None, value, xf_indexes[i])
+
+    def put_cell_columnar(self, rowx, colx, ctype, value, xf_index):
+        if ctype is None:
+            # we have a number, so look up the cell type
+            ctype = self._xf_index_to_xl_type_map[xf_index]
+        elif ctype == XL_CELL_TEXT:
+            try:
+                value = self._text_index[value]
+            except (KeyError, TypeError):
+                value = self.add_text(value)
+        elif ctype == XL_CELL_EMPTY or ctype == XL_CELL_BLANK:
+            value = 0.0
+        if rowx >= self.nrows:
+            assert 0 <= rowx < self.utter_max_rows
+            self.nrows = rowx + 1
+        try:
+            self._col_types[colx][rowx] = ctype
+            self._col_values[colx][rowx] = value
+            if self.formatting_info:
+                self._col_xf_indexes[colx][rowx] = xf_index
+        except IndexError:
+            if colx >= len(self._col_types):
+                assert 0 <= colx < self.utter_max_cols
+                self.add_columns(colx + 1)
+            types = self._col_types[colx]
+            # Over-allocate, as for a list, so that adding a row to the
+            # sheet does not resize every column.
+            nextra = rowx + 1 - len(types) + (rowx >> 3) + 16
+            types.extend(self.bt * nextra)
+            self._col_values[colx].extend(self.bv * nextra)
+            if self.formatting_info:
+                self._col_xf_indexes[colx].extend(self.bf * nextra)
+            self._col_types[colx][rowx] = ctype
+            self._col_values[colx][rowx] = value
+            if self.formatting_info:
+                self._col_xf_indexes[colx][rowx] = xf_index
+
+def _columnar_value(ctype, value, text_table):
+    if ctype == XL_CELL_NUMBER or ctype == XL_CELL_DATE:
+        return value
+    if ctype == XL_CELL_TEXT:
+        return text_table[int(value)]
+    if ctype == XL_CELL_EMPTY or ctype == XL_CELL_BLANK:
+        return UNICODE_LITERAL('')
+    return int(value)
+
+##
+# Stands in for Sheet.put_cell when rows are streamed by Book.iter_rows():
+# the cell values of the current row are kept, and each row is moved to
+# done_rows as (rowx, values) when a cell of another row arrives.
+# Only one row's values are held at a time, whatever the size of the sheet.
+
+class RowBuffer(object):
+
+    def __init__(self):
+        self.rowx = -1
+        self.values = []
+        self.done_rows = []
+
+    def put_cell(self, rowx, colx, ctype, value, xf_index):
+        if rowx != self.rowx:
+            if self.values:
+                self.done_rows.append((self.rowx, self.values))
+            self.rowx = rowx
+            self.values = []
+        values = self.values
+        nvalues = len(values)
+        if colx >= nvalues:
+            if colx > nvalues:
+                values.extend([UNICODE_LITERAL('')] * (colx - nvalues))
+            values.append(value)
+        else:
+            values[colx] = value
+
+    def put_number_cells(self, rowx, first_colx, values, xf_indexes):
+        nvalues = len(values)
+        if not nvalues:
+            return
+        last_colx = first_colx + nvalues - 1
+        self.put_cell(rowx, last_colx, None, values[-1], xf_indexes[-1])
+        self.values[first_colx:last_colx] = values[:-1]
+
+    ##
+    # Move the current row, if any, to done_rows; called when the sheet has been read.
+    def flush(self):
+        if self.values:
+            self.done_rows.append((self.rowx, self.values))
+        self.values = []
+
+##
+# Stands in for the shared string table in a worker process parsing sheets for
+# open_workbook(..., sheet_workers=n): text cells from the SST get the string's
+# index as their value, and resolve_sst_indexes() looks the strings up afterwards.
+class SSTIndexes(object):
+
+    def __getitem__(self, index):
+        return index
+
+##
+# Replace the SST indexes left in text cells by a worker process with the strings.
+def resolve_sst_indexes(sheet, sst):
+    if isinstance(sheet, ColumnarSheet):
+        sheet._text_table = [
+            sst[text] if isinstance(text, int) else text
+            for text in sheet._text_table
+            ]
+        sheet._text_index = None
+        return
+    for types_row, values_row in zip(sheet._cell_types, sheet._cell_values):
+        if XL_CELL_TEXT not in types_row:
+            continue
+        for colx, ctype in enumerate(types_row):
+            if ctype == XL_CELL_TEXT:
+                value = values_row[colx]
+                if isinstance(value, int):
+                    values_row[colx] = sst[value]
+
 class MSODrawing(BaseObject):
     pass
 
@@ -2172,6 +2730,43 @@ def unpack_RK(rk_str):
             return d / 100.0
         return d
 
+# Struct objects for MULRK records, keyed by the number of cells in the record.
+_mulrk_structs = {}
+# row, col, xf_index, then the SST index (LABELSST) or the RK value (RK)
+_cell_header_struct = Struct('<HHHi')
+# row, col, xf_index, value of a NUMBER record
+_number_struct = Struct('<HHHd')
+
+##
+# Decode a sequence of RK values, each given as a signed 32-bit int, e.g. all
+# those of a MULRK record. Returns a list of floats, as from unpack_RK().
+# Integer values are decoded directly; the float ones are converted by a
+# single pair of pack/unpack calls for the whole sequence.
+def unpack_RK_values(rks):
+    values = list(rks)
+    float_posns = []
+    for i, rk in enumerate(rks):
+        if rk & 2:
+            if rk & 1:
+                values[i] = (rk >> 2) / 100.0
+            else:
+                values[i] = float(rk >> 2)
+        else:
+            float_posns.append(i)
+    if float_posns:
+        # the most significant 30 bits of IEEE 754 64-bit FP numbers
+        words = []
+        for i in float_posns:
+            words.append(0)
+            words.append(rks[i] & -4)
+        nfloats = len(float_posns)
+        floats = unpack('<%dd' % nfloats, pack('<%di' % (2 * nfloats), *words))
+        for i, d in zip(float_posns, floats):
+            if rks[i] & 1:
+                d /= 100.0
+            values[i] = d
+    return values
+
 ##### =============== Cell ======================================== #####
 
 cellty_from_fmtty = {
@@ -0,0 +1,302 @@
+##
+# Snapshots of loaded workbooks, for open_workbook(..., snapshot_dir=...).
+# <p>This module is part of the xlrd package, which is released under a BSD-style licence.</p>
+##
+
+# A snapshot file holds, in order:
+# - SNAPSHOT_MAGIC, then the length of the metadata as '<Q';
+# - the metadata: a pickle of the Book's and each Sheet's attributes, less the
+#   cells, with the position in the cell data of each sheet's parts;
+# - the cell data. Each line of cells (a row of a Sheet, a column of a ColumnarSheet)
+#   is stored as ColumnarSheet stores a column: the cell types as bytes and the
+#   values as doubles, a text cell holding the index of its string in the sheet's
+#   text table. The text table is stored as UTF-8, with the offset of each string.
+# The snapshot is keyed by a hash of the file's contents, the xlrd version and the
+# open_workbook options that affect the result, so a stale one is never used.
+
+from __future__ import print_function
+
+import sys
+import os
+import errno
+import hashlib
+from array import array
+from struct import pack, unpack
+from .timemachine import *
+from .biffh import XL_CELL_EMPTY, XL_CELL_BLANK, XL_CELL_TEXT, XL_CELL_NUMBER, XL_CELL_DATE
+from .book import Book, _UNSENT_SHEET_ATTRS
+from .info import __VERSION__
+from .sheet import ColumnarSheet
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import mmap
+    MMAP_AVAILABLE = 1
+except ImportError:
+    MMAP_AVAILABLE = 0
+
+SNAPSHOT_MAGIC = b'XLRDSNP1'
+SNAPSHOT_SUFFIX = '.xlrdsnap'
+
+_unicode_type = type(UNICODE_LITERAL(''))
+
+# Book attributes that are not saved: the file's contents, the sheets
+# (saved separately), and what open_workbook sets for each call.
+_UNSAVED_BOOK_ATTRS = (
+    'logfile', 'verbosity', 'mem', 'filestr', '_sheet_loader', '_mem_record_at',
+    '_sheet_list', '_sharedstrings', '_rich_text_runlist_map', 'stop_at_row', 'sheet_filter',
+    )
+
+if python_version >= (3, 2):
+    def array_to_bytes(a):
+        return a.tobytes()
+
+    def array_from_bytes(typecode, data):
+        a = array(typecode)
+        a.frombytes(data)
+        return a
+else:
+    def array_to_bytes(a):
+        return a.tostring()
+
+    def array_from_bytes(typecode, data):
+        a = array(typecode)
+        a.fromstring(data)
+        return a
+
+##
+# @param options The open_workbook options that affect the Book, as a dict.
+# @return The path of the snapshot for the file, whether or not it exists.
+def snapshot_path(snapshot_dir, filename=None, file_contents=None, options=None):
+    h = hashlib.sha1()
+    h.update(repr((
+        __VERSION__, SNAPSHOT_MAGIC, sys.version_info[0], sys.byteorder,
+        sorted((options or {}).items()),
+        )).encode('ascii'))
+    if file_contents:
+        h.update(file_contents)
+    else:
+        with open(filename, 'rb') as f:
+            while 1:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                h.update(chunk)
+    return os.path.join(snapshot_dir, h.hexdigest() + SNAPSHOT_SUFFIX)
+
+##
+# @return (kind, types_lines, values_lines, text_table) for a sheet's cells,
+# where kind is 'row' or 'col' and each line is an array.
+def sheet_lines(sh):
+    if isinstance(sh, ColumnarSheet):
+        return 'col', sh._col_types, sh._col_values, sh._text_table
+    text_table = []
+    text_index = {}
+    values_lines = []
+    for types, values in zip(sh._cell_types, sh._cell_values):
+        ncells = len(types)
+        if types.count(XL_CELL_NUMBER) + types.count(XL_CELL_DATE) == ncells:
+            values_lines.append(array('d', values))
+            continue
+        line = array('d', [0.0]) * ncells
+        for colx, ctype in enumerate(types):
+            if ctype == XL_CELL_TEXT:
+                value = values[colx]
+                index = text_index.get(value)
+                if index is None:
+                    index = text_index[value] = len(text_table)
+                    text_table.append(value)
+                line[colx] = index
+            elif ctype != XL_CELL_EMPTY and ctype != XL_CELL_BLANK:
+                line[colx] = values[colx]
+        values_lines.append(line)
+    return 'row', sh._cell_types, values_lines, text_table
+
+##
+# Write a snapshot of a Book loaded with formatting_info=False, on_demand=False.
+# The snapshot is written under a temporary name and then renamed, so that a
+# process reading it never sees a partial file. snapshot_dir is created if need be.
+# A snapshot that cannot be written is reported on bk.logfile; the Book is
+# unaffected, so open_workbook() still succeeds.
+def save_snapshot(path, bk):
+    blobs = []
+    data_size = [0]
+    def add_blob(blob):
+        blobs.append(blob)
+        offset = data_size[0]
+        data_size[0] += len(blob)
+        return offset, len(blob)
+    sheet_metas = []
+    for sh in bk._sheet_list:
+        kind, types_lines, values_lines, text_table = sheet_lines(sh)
+        lengths = array('i', [len(types) for types in types_lines])
+        # Values that are not unicode strings are kept as they are, in the metadata:
+        # e.g. None for an empty inline string in an xlsx file, or a str in Python 2.
+        odd_texts = dict(
+            (index, text) for index, text in enumerate(text_table)
+            if type(text) is not _unicode_type)
+        encoded = [
+            b'' if index in odd_texts else text.encode('utf-8')
+            for index, text in enumerate(text_table)]
+        text_ends = array('i')
+        end = 0
+        for text in encoded:
+            end += len(text)
+            text_ends.append(end)
+        parts = (
+            add_blob(array_to_bytes(lengths)),
+            add_blob(b''.join([array_to_bytes(types) for types in types_lines])),
+            add_blob(b''.join([array_to_bytes(values) for values in values_lines])),
+            add_blob(array_to_bytes(text_ends)),
+            add_blob(b''.join(encoded)),
+            )
+        skip = _UNSENT_SHEET_ATTRS + sh._cell_storage_attrs + ('_text_index', )
+        sheet_state = dict(
+            (attr, value) for attr, value in sh.__dict__.items() if attr not in skip)
+        sheet_metas.append((sheet_state, kind, parts, odd_texts))
+    book_state = dict(
+        (attr, value) for attr, value in bk.__dict__.items() if attr not in _UNSAVED_BOOK_ATTRS)
+    meta_file = BYTES_IO()
+    pickler = pickle.Pickler(meta_file, 2)
+    # e.g. Name.book refers back to the Book, which is rebuilt on loading
+    pickler.persistent_id = lambda obj: 'book' if obj is bk else None
+    pickler.dump((book_state, sheet_metas))
+    meta = meta_file.getvalue()
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(pack('<Q', len(meta)))
+            f.write(meta)
+            for blob in blobs:
+                f.write(blob)
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except OSError:
+            pass
+        if os.path.exists(path):
+            # e.g. on Windows, when another process has just saved the same snapshot
+            if bk.verbosity:
+                fprintf(bk.logfile, "Snapshot %r was saved by another process\n", path)
+        else:
+            fprintf(bk.logfile, "*** WARNING: could not save snapshot %r: %s\n", path, e)
+
+##
+# @return A Book rebuilt from the snapshot at path, or None if there is no usable snapshot.
+# A snapshot that cannot be read, e.g. a truncated or corrupt one, is reported on
+# logfile and removed, so that it is replaced by the next save_snapshot().
+def load_snapshot(path, logfile=sys.stdout, verbosity=0):
+    try:
+        f = open(path, 'rb')
+    except (IOError, OSError):
+        return None
+    mem = None
+    try:
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size < 16:
+                raise ValueError('only %d bytes' % size)
+            if MMAP_AVAILABLE:
+                mem = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            else:
+                mem = f.read()
+        bk = rebuild_book(mem, size, logfile, verbosity)
+    except Exception as e:
+        fprintf(logfile, "*** WARNING: removing unusable snapshot %r: %s: %s\n",
+            path, type(e).__name__, e)
+        if MMAP_AVAILABLE and mem is not None:
+            mem.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    if MMAP_AVAILABLE:
+        mem.close()
+    bk.release_resources()
+    return bk
+
+##
+# Rebuild a Book from the contents of a snapshot file.
+# Raises an exception if the contents are not a complete snapshot.
+def rebuild_book(mem, size, logfile, verbosity):
+    if mem[:8] != SNAPSHOT_MAGIC:
+        raise ValueError('bad magic %r' % mem[:8])
+    meta_len = unpack('<Q', mem[8:16])[0]
+    if 16 + meta_len > size:
+        raise ValueError('metadata of %d bytes in a file of %d bytes' % (meta_len, size))
+    bk = Book()
+    unpickler = pickle.Unpickler(BYTES_IO(mem[16:16+meta_len]))
+    unpickler.persistent_load = lambda pid: bk
+    book_state, sheet_metas = unpickler.load()
+    data_pos = 16 + meta_len
+    data_end = data_pos + sum(
+        [nbytes for _, _, parts, _ in sheet_metas for _, nbytes in parts])
+    if data_end != size:
+        raise ValueError('cell data ends at %d in a file of %d bytes' % (data_end, size))
+    bk.__dict__.update(book_state)
+    bk.logfile = logfile
+    bk.verbosity = verbosity
+    def part(offset_size):
+        offset, nbytes = offset_size
+        return mem[data_pos+offset:data_pos+offset+nbytes]
+    for sheet_state, kind, parts, odd_texts in sheet_metas:
+        sh = bk.new_sheet(sheet_state['_position'], sheet_state['name'], sheet_state['number'])
+        sh.__dict__.update(sheet_state)
+        lengths = array_from_bytes('i', part(parts[0]))
+        all_types = array_from_bytes('B', part(parts[1]))
+        all_values = array_from_bytes('d', part(parts[2]))
+        text_ends = array_from_bytes('i', part(parts[3]))
+        text_data = part(parts[4])
+        text_table = []
+        start = 0
+        for end in text_ends:
+            text_table.append(unicode(text_data[start:end], 'utf-8'))
+            start = end
+        for index, text in odd_texts.items():
+            text_table[index] = text
+        if kind == 'col':
+            load_columns(sh, lengths, all_types, all_values, text_table)
+        else:
+            load_rows(sh, lengths, all_types, all_values, text_table)
+        bk._sheet_list.append(sh)
+    return bk
+
+def load_columns(sh, lengths, all_types, all_values, text_table):
+    pos = 0
+    for length in lengths:
+        sh._col_types.append(all_types[pos:pos+length])
+        sh._col_values.append(all_values[pos:pos+length])
+        pos += length
+    sh._text_table = text_table
+    sh._text_index = None
+
+def load_rows(sh, lengths, all_types, all_values, text_table):
+    empty = UNICODE_LITERAL('')
+    pos = 0
+    for length in lengths:
+        types = all_types[pos:pos+length]
+        values = all_values[pos:pos+length].tolist()
+        pos += length
+        if types.count(XL_CELL_NUMBER) + types.count(XL_CELL_DATE) != length:
+            for colx, ctype in enumerate(types):
+                if ctype == XL_CELL_TEXT:
+                    values[colx] = text_table[int(values[colx])]
+                elif ctype == XL_CELL_EMPTY or ctype == XL_CELL_BLANK:
+                    values[colx] = empty
+                elif ctype != XL_CELL_NUMBER and ctype != XL_CELL_DATE:
+                    values[colx] = int(values[colx])
+        sh._cell_types.append(types)
+        sh._cell_values.append(values)
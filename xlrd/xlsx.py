@@ -10,11 +10,12 @@ DEBUG = 0
 from os.path import normpath, join
 import sys
 import re
+from array import array
 from .timemachine import *
 from .book import Book, Name
 from .biffh import error_text_from_code, XLRDError, XL_CELL_BLANK, XL_CELL_TEXT, XL_CELL_BOOLEAN, XL_CELL_ERROR
 from .formatting import is_date_format_string, Format, XF
-from .sheet import Sheet
+from .sheet import Sheet, ColumnarSheet, RowBuffer, SSTIndexes, resolve_sst_indexes
 
 DLF = sys.stdout # Default Log File
 
@@ -106,6 +107,30 @@ def cell_name_to_rowx_colx(cell_name, letter_value=_UPPERCASE_1_REL_INDEX,
     rowx = int(cell_name[charx:]) - 1
     return rowx, colx
 
+##
+# Decode the column part of a cell name as found in a worksheet's <c r="..."> attribute.
+# @return (colx, charx), where charx is the index in cell_name at which the row number starts
+def cell_name_to_colx_charx(cell_name, letter_value=_UPPERCASE_1_REL_INDEX):
+    # Extract column index from cell name
+    # A<row number> => 0, Z =>25, AA => 26, XFD => 16383
+    colx = 0
+    charx = -1
+    try:
+        for c in cell_name:
+            charx += 1
+            if c == '$':
+                continue
+            lv = letter_value[c]
+            if lv:
+                colx = colx * 26 + lv
+            else: # start of row number; can't be '0'
+                colx = colx - 1
+                assert 0 <= colx < X12_MAX_COLS
+                break
+    except KeyError:
+        raise Exception('Unexpected character %r in cell name %r' % (c, cell_name))
+    return colx, charx
+
 error_code_from_text = {}
 for _code, _text in error_text_from_code.items():
     error_code_from_text[_text] = _code
@@ -250,6 +275,45 @@ def make_name_access_maps(bk):
     bk.name_and_scope_map = name_and_scope_map
     bk.name_map = name_map
 
+# === XML parser backends ===================================================
+#
+# 'etree' (the default) parses the parts of an xlsx file with the ElementTree
+# implementation chosen by ensure_elementtree_imported().
+# 'expat' drives pyexpat directly: styles, shared strings and worksheets are
+# decoded from its start/end/text events, so no Element objects are created
+# for them. The workbook part, relationships and comments always use ElementTree.
+
+XML_BACKENDS = ('etree', 'expat')
+
+def make_expat_parser():
+    from xml.parsers import expat
+    # names in a namespace are reported as "uri}local", cf. ElementTree's "{uri}local"
+    parser = expat.ParserCreate(None, '}')
+    parser.buffer_text = True
+    return parser
+
+X_SSML12 = U_SSML12[1:]
+XML_SPACE_ATTR_EXPAT = XML_SPACE_ATTR[1:]
+
+# feed the parser in large chunks; ParseFile() reads the stream 2 KB at a time
+def expat_parse_stream(parser, stream, chunk_size=1 << 16):
+    while 1:
+        data = stream.read(chunk_size)
+        parser.Parse(data, not data)
+        if not data:
+            break
+
+# same result as cooked_text() on an element with text t
+def cook_text(t, preserve):
+    if t is None:
+        return ''
+    if not preserve:
+        t = t.strip(XML_WHITESPACE)
+    return ensure_unicode(unescape(t))
+
+class X12StopParsing(Exception):
+    pass
+
 class X12General(object):
 
     def process_stream(self, stream, heading=None):
@@ -265,6 +329,24 @@ class X12General(object):
                 meth(self, elem)
         self.finish_off()
 
+    def process_stream_expat(self, stream, heading=None):
+        if self.verbosity >= 2 and heading is not None:
+            fprintf(self.logfile, "\n=== %s (expat) ===\n", heading)
+        getmethod = self.tag2meth.get
+        verbosity = self.verbosity
+        logfile = self.logfile
+        def start_element(name, attrs):
+            if verbosity >= 3:
+                fprintf(logfile, "===\ntag=%r attrib=%r\n", name.rsplit('}', 1)[-1], attrs)
+            # the handlers only use elem.get(), which the attributes dict provides
+            meth = getmethod('{' + name)
+            if meth:
+                meth(self, attrs)
+        parser = make_expat_parser()
+        parser.StartElementHandler = start_element
+        expat_parse_stream(parser, stream)
+        self.finish_off()
+
     def finish_off(self):
         pass
 
@@ -289,6 +371,8 @@ class X12Book(X12General):
         self.relid2reltype = {}
         self.sheet_targets = [] # indexed by sheetx
         self.sheetIds = [] # indexed by sheetx
+        self.zf = None
+        self.component_names = None
 
     core_props_menu = {
         U_CP+"lastModifiedBy": ("last_modified_by", cnv_ST_Xstring),
@@ -381,6 +465,10 @@ class X12Book(X12General):
             if self.verbosity >= 2:
                 self.dumpout('Ignoring sheet of type %r (name=%r)', reltype, name)
             return
+        if not bk.want_sheet(name):
+            if self.verbosity >= 2:
+                self.dumpout('Ignoring sheet not selected by sheet_filter (name=%r)', name)
+            return
         state = elem.get('state')
         visibility_map = {
             None: 0,
@@ -389,10 +477,7 @@ class X12Book(X12General):
             'veryHidden': 2
             }
         bk._sheet_visibility.append(visibility_map[state])
-        sheet = Sheet(bk, position=None, name=name, number=sheetx)
-        sheet.utter_max_rows = X12_MAX_ROWS
-        sheet.utter_max_cols = X12_MAX_COLS
-        bk._sheet_list.append(sheet)
+        bk._sheet_list.append(None) # filled in by get_sheet()
         bk._sheet_names.append(name)
         bk.nsheets += 1
         self.sheet_targets.append(target)
@@ -405,6 +490,94 @@ class X12Book(X12General):
             self.dumpout('datemode=%r', datemode)
         self.bk.datemode = datemode
 
+    def get_sheet(self, sheetx):
+        sheet = self.load_sheet(sheetx)
+        self.bk._sheet_list[sheetx] = sheet
+        return sheet
+
+    def load_sheet(self, sheetx):
+        bk = self.bk
+        zf = self.zf
+        component_names = self.component_names
+        logfile = self.logfile
+        verbosity = self.verbosity
+        sheet = bk.new_sheet(position=None, name=bk._sheet_names[sheetx], number=sheetx)
+        sheet.utter_max_rows = X12_MAX_ROWS
+        sheet.utter_max_cols = X12_MAX_COLS
+        fname = self.sheet_targets[sheetx]
+        zflo = zf.open(component_names[fname])
+        x12sheet = X12Sheet(sheet, logfile, verbosity)
+        heading = "Sheet %r (sheetx=%d) from %r" % (sheet.name, sheetx, fname)
+        x12sheet.process_stream(zflo, heading)
+        del zflo
+
+        rels_fname = 'xl/worksheets/_rels/%s.rels' % fname.rsplit('/', 1)[-1]
+        if rels_fname in component_names:
+            zfrels = zf.open(rels_fname)
+            x12sheet.process_rels(zfrels)
+            del zfrels
+
+        for relid, reltype in x12sheet.relid2reltype.items():
+            if reltype == 'comments':
+                comments_fname = x12sheet.relid2path.get(relid)
+                if comments_fname and comments_fname in component_names:
+                    comments_stream = zf.open(comments_fname)
+                    x12sheet.process_comments_stream(comments_stream)
+                    del comments_stream
+
+        sheet.tidy_dimensions()
+        return sheet
+
+    ##
+    # Stream the rows of a worksheet; see Book.iter_rows().
+    def iter_rows(self, sheetx):
+        bk = self.bk
+        sheet = Sheet(bk, position=None, name=bk._sheet_names[sheetx], number=sheetx)
+        sheet.utter_max_rows = X12_MAX_ROWS
+        sheet.utter_max_cols = X12_MAX_COLS
+        row_buffer = RowBuffer()
+        sheet.put_cell = row_buffer.put_cell
+        fname = self.sheet_targets[sheetx]
+        zflo = self.zf.open(self.component_names[fname])
+        x12sheet = X12Sheet(sheet, self.logfile, self.verbosity)
+        for row in x12sheet.iter_process_stream(zflo, row_buffer.done_rows):
+            yield row
+        row_buffer.flush()
+        for row in row_buffer.done_rows:
+            yield row
+
+    ##
+    # Load all worksheets in a pool of worker processes. Each worker opens its own
+    # copy of the zip file and is given the styles information; shared strings are
+    # stored in the worker's sheets as SST indexes, which are resolved against
+    # this book's SST when the sheets are assembled here.
+    def get_sheets_parallel(self, nworkers, filename=None, file_contents=None):
+        import multiprocessing
+        bk = self.bk
+        book_state = dict((attr, getattr(bk, attr)) for attr in _WORKER_BOOK_ATTRS)
+        pool = multiprocessing.Pool(
+            min(nworkers, bk.nsheets),
+            _init_sheet_worker,
+            (filename, file_contents, self.component_names, self.sheet_targets, book_state),
+            )
+        try:
+            for sheetx, sheet_state in pool.imap_unordered(_load_sheet_state, range(bk.nsheets)):
+                sheet = bk.new_sheet(position=None, name=bk._sheet_names[sheetx], number=sheetx)
+                sheet.utter_max_rows = X12_MAX_ROWS
+                sheet.utter_max_cols = X12_MAX_COLS
+                sheet.__dict__.update(sheet_state)
+                resolve_sst_indexes(sheet, bk._sharedstrings)
+                bk._sheet_list[sheetx] = sheet
+        finally:
+            pool.close()
+            pool.join()
+
+    def release_resources(self):
+        if self.zf is not None:
+            self.zf.close()
+        self.zf = None
+        self.component_names = None
+
     tag2meth = {
         'definedNames':  do_defined_names,
         'workbookPr':   do_workbookpr,
@@ -412,13 +585,52 @@ class X12Book(X12General):
         }
     augment_keys(tag2meth, U_SSML12)
 
+# Book attributes needed to parse worksheets in a worker process.
+_WORKER_BOOK_ATTRS = (
+    'verbosity', 'formatting_info', 'ragged_rows', 'xml_backend', 'compact_cells',
+    '_sheet_names', '_sheet_visibility', '_xf_index_to_xl_type_map',
+    )
+
+# Sheet attributes filled in by X12Sheet, sent back from a worker process
+# together with the cell data named by the sheet's _cell_storage_attrs.
+_WORKER_SHEET_ATTRS = (
+    'nrows', 'ncols', '_maxdatarowx', '_maxdatacolx', '_dimnrows', '_dimncols',
+    '_first_full_rowx', 'merged_cells', 'cell_note_map',
+    )
+
+_worker_x12book = None
+
+def _init_sheet_worker(filename, file_contents, component_names, sheet_targets, book_state):
+    global _worker_x12book
+    import zipfile
+    ensure_elementtree_imported(0, DLF)
+    bk = Book()
+    bk.__dict__.update(book_state)
+    bk.logfile = DLF
+    bk._sharedstrings = SSTIndexes()
+    x12book = X12Book(bk, DLF, bk.verbosity)
+    if file_contents:
+        x12book.zf = zipfile.ZipFile(BYTES_IO(file_contents))
+    else:
+        x12book.zf = zipfile.ZipFile(filename)
+    x12book.component_names = component_names
+    x12book.sheet_targets = sheet_targets
+    _worker_x12book = x12book
+
+def _load_sheet_state(sheetx):
+    sheet = _worker_x12book.load_sheet(sheetx)
+    attrs = _WORKER_SHEET_ATTRS + sheet._cell_storage_attrs
+    return sheetx, dict((attr, getattr(sheet, attr)) for attr in attrs)
+
 class X12SST(X12General):
 
     def __init__(self, bk, logfile=DLF, verbosity=0):
         self.bk = bk
         self.logfile = logfile
         self.verbosity = verbosity
-        if ET_has_iterparse:
+        if bk.xml_backend == 'expat':
+            self.process_stream = self.process_stream_expat
+        elif ET_has_iterparse:
             self.process_stream = self.process_stream_iterparse
         else:
             self.process_stream = self.process_stream_findall
@@ -461,6 +673,128 @@ class X12SST(X12General):
         if self.verbosity >= 2:
             self.dumpout('Entries in SST: %d', len(sst))
 
+    def process_stream_expat(self, stream, heading=None):
+        if self.verbosity >= 2 and heading is not None:
+            fprintf(self.logfile, "\n=== %s (expat) ===\n", heading)
+        sst = self.bk._sharedstrings
+        handler = X12ExpatSSTHandler(sst)
+        parser = make_expat_parser()
+        parser.StartElementHandler = handler.start_element
+        parser.EndElementHandler = handler.end_element
+        parser.CharacterDataHandler = handler.char_data
+        expat_parse_stream(parser, stream)
+        if self.verbosity >= 2:
+            self.dumpout('Entries in SST: %d', len(sst))
+
+    ##
+    # Index the <si> elements of the SST without decoding them; see X12LazySST.
+    # Falls back to process_stream if the SST is not in the form that the
+    # index scan understands (UTF-8, default namespace).
+    def process_data_lazy(self, data, heading=None):
+        if self.verbosity >= 2 and heading is not None:
+            fprintf(self.logfile, "\n=== %s (lazy) ===\n", heading)
+        sst_start = data.find(b'<sst')
+        decl = _xml_encoding_decl.match(data)
+        if (sst_start < 0
+            or not data.startswith(_sst_default_ns, data.find(b'xmlns=', sst_start))
+            or decl is not None and decl.group(1).lower() not in (b'utf-8', b'utf8')):
+            self.process_stream(BYTES_IO(data), heading)
+            return
+        starts = array('l', [mobj.start() for mobj in _si_start_finder(data)])
+        sst_end = data.rfind(b'</sst>')
+        self.bk._sharedstrings = X12LazySST(data, starts, sst_end)
+        if self.verbosity >= 2:
+            self.dumpout('Entries in SST: %d', len(starts))
+
+_xml_encoding_decl = re.compile(br'<\?xml[^>]*encoding=["\']([^"\']*)["\']')
+_sst_default_ns = b'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_si_start_finder = re.compile(br'<si[\s>/]').finditer
+# the usual form of an <si> element, holding only unformatted text
+# (no entity references, and no CR, which an XML parser would normalise)
+_plain_si_match = re.compile(br'<si><t( xml:space="preserve")?>([^<&\r]*)</t></si>').match
+
+##
+# A shared string table that decodes each string when it is first looked up.
+# It holds the undecoded sharedStrings.xml data and the offset of each <si>
+# element in it, found by one scan of the data. Strings are cached once decoded.
+class X12LazySST(object):
+
+    def __init__(self, data, starts, sst_end):
+        self.data = data
+        self.starts = starts
+        self.sst_end = sst_end
+        self.decoded = [None] * len(starts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        for index in xrange(len(self.starts)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        value = self.decoded[index]
+        if value is not None:
+            return value
+        start = self.starts[index]
+        mobj = _plain_si_match(self.data, start)
+        if mobj is not None:
+            # same result as cooked_text() on the <t> element
+            t = mobj.group(2)
+            if not mobj.group(1):
+                t = t.strip(b"\t\n \r")
+            value = unescape(t.decode('utf-8'))
+        else:
+            if index + 1 < len(self.starts):
+                end = self.starts[index + 1]
+            else:
+                end = self.sst_end
+            root = ET.fromstring(b'<sst ' + _sst_default_ns + b'>' + self.data[start:end] + b'</sst>')
+            value = get_text_from_si_or_is(self, root[0])
+        self.decoded[index] = value
+        return value
+
+##
+# Collects the text of each <si> element as get_text_from_si_or_is() does:
+# its <t> children and the <t> children of its <r> (rich text run) children.
+class X12ExpatSSTHandler(object):
+
+    si_tag = X_SSML12 + 'si'
+    r_tag = X_SSML12 + 'r'
+    t_tag = X_SSML12 + 't'
+
+    def __init__(self, sst):
+        self.sst = sst
+        self.tags = [] # names of the open elements
+        self.accum = None
+        self.text = None # text chunks of the <t> being read
+        self.preserve = False
+
+    def start_element(self, name, attrs):
+        tags = self.tags
+        if name == self.t_tag and tags and (
+                tags[-1] == self.si_tag
+                or tags[-1] == self.r_tag and len(tags) >= 2 and tags[-2] == self.si_tag):
+            self.text = []
+            self.preserve = attrs.get(XML_SPACE_ATTR_EXPAT) == 'preserve'
+        elif name == self.si_tag:
+            self.accum = []
+        tags.append(name)
+
+    def end_element(self, name):
+        self.tags.pop()
+        if self.text is not None and name == self.t_tag:
+            t = cook_text(''.join(self.text) or None, self.preserve)
+            if t:
+                self.accum.append(t)
+            self.text = None
+        elif name == self.si_tag:
+            self.sst.append(''.join(self.accum))
+
+    def char_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
 class X12Styles(X12General):
 
     def __init__(self, bk, logfile=DLF, verbosity=0):
@@ -474,6 +808,8 @@ class X12Styles(X12General):
             self.fmt_is_date[x] = 1
         # dummy entry for XF 0 in case no Styles section
         self.bk._xf_index_to_xl_type_map[0] = 2
+        if bk.xml_backend == 'expat':
+            self.process_stream = self.process_stream_expat
         # fill_in_standard_formats(bk) #### pre-integration kludge
 
     def do_cellstylexfs(self, elem):
@@ -534,7 +870,12 @@ class X12Sheet(X12General):
         self.merged_cells = sheet.merged_cells
         self.warned_no_cell_name = 0
         self.warned_no_row_num = 0
-        if ET_has_iterparse:
+        # Maps the column part of cell names (e.g. "AB" or "$AB$") to colx;
+        # filled in by do_row, and dropped with the X12Sheet when the sheet is loaded
+        self.colx_from_cell_name_prefix = {}
+        if self.bk.xml_backend == 'expat':
+            self.process_stream = self.process_stream_expat
+        elif ET_has_iterparse:
             self.process_stream = self.own_process_stream
 
     def own_process_stream(self, stream, heading=None):
@@ -543,16 +884,79 @@ class X12Sheet(X12General):
         getmethod = self.tag2meth.get
         row_tag = U_SSML12 + "row"
         self_do_row = self.do_row
+        stop_at_row = self.bk.stop_at_row
         for event, elem in ET.iterparse(stream):
             if elem.tag == row_tag:
                 self_do_row(elem)
                 elem.clear() # destroy all child elements (cells)
+                if stop_at_row is not None and stop_at_row(self.sheet, self.rowx):
+                    # the rest of the sheet (including any mergeCell elements) is not read
+                    break
             elif elem.tag == U_SSML12 + "dimension":
                 self.do_dimension(elem)
             elif elem.tag == U_SSML12 + "mergeCell":
                 self.do_merge_cell(elem)
         self.finish_off()
 
+    def process_stream_expat(self, stream, heading=None):
+        if self.verbosity >= 2 and heading is not None:
+            fprintf(self.logfile, "\n=== %s (expat) ===\n", heading)
+        parser = make_expat_parser()
+        handler = X12ExpatSheetHandler(self, parser)
+        parser.StartElementHandler = handler.start_element
+        parser.EndElementHandler = handler.end_element
+        try:
+            expat_parse_stream(parser, stream)
+        except X12StopParsing:
+            # the rest of the sheet (including any mergeCell elements) is not read
+            pass
+        finally:
+            handler.parser = None # break the reference cycle, so the sheet can be freed when unloaded
+        self.finish_off()
+
+    ##
+    # Generator version of process_stream() for Book.iter_rows(): the rows that the
+    # sheet's put_cell has moved to done_rows are yielded as each <row> (or, with the
+    # expat backend, each chunk of the stream) is processed. Unlike process_stream(),
+    # the parsed rows are not kept in the element tree.
+    def iter_process_stream(self, stream, done_rows):
+        if self.bk.xml_backend == 'expat':
+            parser = make_expat_parser()
+            handler = X12ExpatSheetHandler(self, parser)
+            handler.stop_at_row = None
+            parser.StartElementHandler = handler.start_element
+            parser.EndElementHandler = handler.end_element
+            try:
+                while 1:
+                    data = stream.read(1 << 16)
+                    parser.Parse(data, not data)
+                    for row in done_rows:
+                        yield row
+                    del done_rows[:]
+                    if not data:
+                        break
+            finally:
+                handler.parser = None
+            return
+        row_tag = U_SSML12 + "row"
+        sheet_data_tag = U_SSML12 + "sheetData"
+        sheet_data = None
+        self_do_row = self.do_row
+        # str(): cElementTree in Python 2 rejects unicode event names
+        for event, elem in ET.iterparse(stream, events=(str('start'), str('end'))):
+            if event == 'start':
+                if elem.tag == sheet_data_tag:
+                    sheet_data = elem
+            elif elem.tag == row_tag:
+                self_do_row(elem)
+                if sheet_data is not None:
+                    sheet_data.clear() # the <row> and its cells
+                else:
+                    elem.clear()
+                for row in done_rows:
+                    yield row
+                del done_rows[:]
+
     def process_rels(self, stream):
         if self.verbosity >= 2:
             fprintf(self.logfile, "\n=== Sheet Relationships ===\n")
@@ -634,6 +1038,10 @@ class X12Sheet(X12General):
             self.dumpout("<row> row_number=%r rowx=%d explicit=%d",
                 row_number, self.rowx, explicit_row_number)
         letter_value = _UPPERCASE_1_REL_INDEX
+        colx_from_prefix = self.colx_from_cell_name_prefix
+        # a cached prefix is only valid if the row number is what the slow path accepts
+        fast_row_number = explicit_row_number and row_number[:1] in '123456789'
+        row_number_len = explicit_row_number and len(row_number)
         for cell_elem in row_elem:
             cell_name = cell_elem.get('r')
             if cell_name is None: # Yes, it's optional.
@@ -642,26 +1050,17 @@ class X12Sheet(X12General):
                     self.dumpout("no cellname; assuming rowx=%d colx=%d", rowx, colx)
                     self.warned_no_cell_name = 1
             else:
-                # Extract column index from cell name
-                # A<row number> => 0, Z =>25, AA => 26, XFD => 16383
-                colx = 0
-                charx = -1
-                try:
-                    for c in cell_name:
-                        charx += 1
-                        if c == '$':
-                            continue
-                        lv = letter_value[c]
-                        if lv:
-                            colx = colx * 26 + lv
-                        else: # start of row number; can't be '0'
-                            colx = colx - 1
-                            assert 0 <= colx < X12_MAX_COLS
-                            break
-                except KeyError:
-                    raise Exception('Unexpected character %r in cell name %r' % (c, cell_name))
-                if explicit_row_number and cell_name[charx:] != row_number:
-                    raise Exception('cell name %r but row number is %r' % (cell_name, row_number))
+                # Cell names in a row share its row number, so the column letters
+                # before it are looked up in the cache of prefixes already decoded.
+                colx = None
+                if fast_row_number and cell_name[-row_number_len:] == row_number:
+                    colx = colx_from_prefix.get(cell_name[:-row_number_len])
+                if colx is None:
+                    colx, charx = cell_name_to_colx_charx(cell_name, letter_value)
+                    if explicit_row_number:
+                        if cell_name[charx:] != row_number:
+                            raise Exception('cell name %r but row number is %r' % (cell_name, row_number))
+                        colx_from_prefix[cell_name[:charx]] = colx
             xf_index = int(cell_elem.get('s', '0'))
             cell_type = cell_elem.get('t', 'n')
             tvalue = None
@@ -771,6 +1170,199 @@ class X12Sheet(X12General):
         }
     augment_keys(tag2meth, U_SSML12)
 
+##
+# Decodes worksheet rows from expat events as X12Sheet.do_row does from <row> elements.
+# The text of a <v> element is collected by making the list's append method the
+# parser's character data handler while the element is open.
+class X12ExpatSheetHandler(object):
+
+    def __init__(self, x12sheet, parser):
+        self.x12sheet = x12sheet
+        self.parser = parser
+        self.sheet = x12sheet.sheet
+        self.put_cell = x12sheet.sheet.put_cell
+        self.sst = x12sheet.sst
+        self.colx_from_prefix = x12sheet.colx_from_cell_name_prefix
+        self.formatting_info = x12sheet.bk.formatting_info
+        self.stop_at_row = x12sheet.bk.stop_at_row
+        self.row_number = None
+        self.explicit_row_number = 0
+        self.fast_row_number = 0
+        self.row_number_len = 0
+        self.rowx = -1
+        self.colx = -1
+        self.cell_type = None # None when not inside a <c> element
+        self.cell_tags = [] # names of the open elements inside the <c>
+        self.xf_index = 0
+        self.has_v = False
+        self.v_text = None
+        self.v_preserve = False
+        self.inline_value = None
+        self.inline_accum = None
+        self.text = None # text chunks of the <v> or inline <t> being read
+        self.preserve = False
+
+    def start_element(self, name, attrs,
+            c_tag=X_SSML12 + 'c', v_tag=X_SSML12 + 'v', row_tag=X_SSML12 + 'row',
+            ):
+        if name == c_tag:
+            cell_name = attrs.get('r')
+            if cell_name is None: # Yes, it's optional.
+                self.colx += 1
+                x12sheet = self.x12sheet
+                if x12sheet.verbosity and not x12sheet.warned_no_cell_name:
+                    x12sheet.dumpout("no cellname; assuming rowx=%d colx=%d", self.rowx, self.colx)
+                    x12sheet.warned_no_cell_name = 1
+            else:
+                row_number_len = self.row_number_len
+                colx = None
+                if self.fast_row_number and cell_name[-row_number_len:] == self.row_number:
+                    colx = self.colx_from_prefix.get(cell_name[:-row_number_len])
+                if colx is None:
+                    colx = self.decode_cell_name(cell_name)
+                self.colx = colx
+            self.xf_index = int(attrs.get('s', '0'))
+            self.cell_type = attrs.get('t', 'n')
+            self.has_v = False
+            self.v_text = None
+            self.inline_value = None
+        elif name == v_tag and not self.cell_tags:
+            self.text = text = []
+            self.parser.CharacterDataHandler = text.append
+            self.preserve = attrs.get(XML_SPACE_ATTR_EXPAT) == 'preserve'
+            self.cell_tags.append(name)
+        elif self.cell_type is not None:
+            self.start_cell_child(name, attrs)
+        elif name == row_tag:
+            self.start_row(attrs)
+        elif name == X_SSML12 + 'dimension':
+            self.x12sheet.do_dimension(attrs)
+        elif name == X_SSML12 + 'mergeCell':
+            self.x12sheet.do_merge_cell(attrs)
+
+    def end_element(self, name,
+            c_tag=X_SSML12 + 'c', v_tag=X_SSML12 + 'v', row_tag=X_SSML12 + 'row',
+            ):
+        cell_tags = self.cell_tags
+        if cell_tags:
+            cell_tags.pop()
+            if name == v_tag and not cell_tags:
+                self.parser.CharacterDataHandler = None
+                self.v_text = self.inline_value = ''.join(self.text) or None
+                self.v_preserve = self.preserve
+                self.has_v = True
+                self.text = None
+            else:
+                self.end_cell_child(name)
+        elif name == c_tag:
+            self.end_cell()
+        elif name == row_tag:
+            stop_at_row = self.stop_at_row
+            if stop_at_row is not None and stop_at_row(self.sheet, self.rowx):
+                raise X12StopParsing()
+
+    def start_row(self, attrs):
+        x12sheet = self.x12sheet
+        row_number = attrs.get('r')
+        if row_number is None: # Yes, it's optional.
+            x12sheet.rowx += 1
+            explicit_row_number = 0
+            if x12sheet.verbosity and not x12sheet.warned_no_row_num:
+                x12sheet.dumpout("no row number; assuming rowx=%d", x12sheet.rowx)
+                x12sheet.warned_no_row_num = 1
+        else:
+            x12sheet.rowx = int(row_number) - 1
+            explicit_row_number = 1
+        assert 0 <= x12sheet.rowx < X12_MAX_ROWS
+        self.rowx = x12sheet.rowx
+        self.colx = -1
+        self.row_number = row_number
+        self.explicit_row_number = explicit_row_number
+        self.fast_row_number = explicit_row_number and row_number[:1] in '123456789'
+        self.row_number_len = explicit_row_number and len(row_number)
+
+    # cell names not found in the prefix cache
+    def decode_cell_name(self, cell_name):
+        row_number = self.row_number
+        colx, charx = cell_name_to_colx_charx(cell_name)
+        if self.explicit_row_number:
+            if cell_name[charx:] != row_number:
+                raise Exception('cell name %r but row number is %r' % (cell_name, row_number))
+            self.colx_from_prefix[cell_name[:charx]] = colx
+        return colx
+
+    # children of <c> other than <v>, and their descendants
+    def start_cell_child(self, name, attrs,
+            f_tag=X_SSML12 + 'f', is_tag=X_SSML12 + 'is', r_tag=X_SSML12 + 'r', t_tag=X_SSML12 + 't',
+            ):
+        cell_tags = self.cell_tags
+        cell_type = self.cell_type
+        if not cell_tags:
+            if name == f_tag:
+                pass # formulas are not used
+            elif name == is_tag and cell_type == 'inlineStr':
+                self.inline_accum = []
+            elif cell_type == 'n':
+                raise Exception('unexpected tag %r' % ('{' + name))
+            elif cell_type in ('s', 'str', 'b', 'e', 'inlineStr'):
+                raise Exception('cell type %s has unexpected child <%s> at rowx=%r colx=%r'
+                    % (cell_type, '{' + name, self.rowx, self.colx))
+        elif name == t_tag and cell_tags[0] == is_tag and (
+                len(cell_tags) == 1 or len(cell_tags) == 2 and cell_tags[1] == r_tag):
+            # text of an inline string, directly or in a rich text run
+            self.text = text = []
+            self.parser.CharacterDataHandler = text.append
+            self.preserve = attrs.get(XML_SPACE_ATTR_EXPAT) == 'preserve'
+        cell_tags.append(name)
+
+    def end_cell_child(self, name, is_tag=X_SSML12 + 'is', t_tag=X_SSML12 + 't'):
+        if name == t_tag and self.text is not None:
+            self.parser.CharacterDataHandler = None
+            t = cook_text(''.join(self.text) or None, self.preserve)
+            if t:
+                self.inline_accum.append(t)
+            self.text = None
+        elif name == is_tag and not self.cell_tags and self.inline_accum is not None:
+            self.inline_value = ''.join(self.inline_accum)
+            self.inline_accum = None
+
+    def end_cell(self):
+        rowx = self.rowx
+        colx = self.colx
+        xf_index = self.xf_index
+        cell_type = self.cell_type
+        tvalue = self.v_text
+        self.cell_type = None
+        if cell_type == 'n':
+            if not tvalue:
+                if self.formatting_info:
+                    self.put_cell(rowx, colx, XL_CELL_BLANK, '', xf_index)
+            else:
+                self.put_cell(rowx, colx, None, float(tvalue), xf_index)
+        elif cell_type == "s":
+            if not tvalue:
+                if self.formatting_info:
+                    self.put_cell(rowx, colx, XL_CELL_BLANK, '', xf_index)
+            else:
+                self.put_cell(rowx, colx, XL_CELL_TEXT, self.sst[int(tvalue)], xf_index)
+        elif cell_type == "str":
+            if self.has_v:
+                tvalue = cook_text(tvalue, self.v_preserve)
+            self.put_cell(rowx, colx, XL_CELL_TEXT, tvalue, xf_index)
+        elif cell_type == "b":
+            self.put_cell(rowx, colx, XL_CELL_BOOLEAN, int(tvalue), xf_index)
+        elif cell_type == "e":
+            self.put_cell(rowx, colx, XL_CELL_ERROR, error_code_from_text[tvalue], xf_index)
+        elif cell_type == "inlineStr":
+            tvalue = self.inline_value
+            if not tvalue:
+                if self.formatting_info:
+                    self.put_cell(rowx, colx, XL_CELL_BLANK, '', xf_index)
+            else:
+                self.put_cell(rowx, colx, XL_CELL_TEXT, tvalue, xf_index)
+        else:
+            raise Exception("Unknown cell type %r in rowx=%d colx=%d" % (cell_type, rowx, colx))
+
 def open_workbook_2007_xml(
     zf,
     component_names,
@@ -780,6 +1372,14 @@ def open_workbook_2007_xml(
     formatting_info=0,
     on_demand=0,
     ragged_rows=0,
+    stop_at_row=None,
+    sheet_filter=None,
+    sheet_workers=0,
+    lazy_sst=False,
+    xml_backend='etree',
+    compact_cells=False,
+    filename=None,
+    file_contents=None,
     ):
     ensure_elementtree_imported(verbosity, logfile)
     bk = Book()
@@ -790,13 +1390,17 @@ def open_workbook_2007_xml(
         raise NotImplementedError("formatting_info=True not yet implemented")
     bk.use_mmap = False #### Not supported initially
     bk.on_demand = on_demand
-    if on_demand:
-        if verbosity:
-            print("WARNING *** on_demand=True not yet implemented; falling back to False", file=bk.logfile)
-        bk.on_demand = False
     bk.ragged_rows = ragged_rows
+    bk.stop_at_row = stop_at_row
+    bk.sheet_filter = sheet_filter
+    if xml_backend not in XML_BACKENDS:
+        raise XLRDError('Unknown xml_backend %r; expected one of %r' % (xml_backend, XML_BACKENDS))
+    bk.xml_backend = xml_backend
+    bk.compact_cells = compact_cells
 
     x12book = X12Book(bk, logfile, verbosity)
+    x12book.zf = zf
+    x12book.component_names = component_names
     zflo = zf.open(component_names['xl/_rels/workbook.xml.rels'])
     x12book.process_rels(zflo)
     del zflo
@@ -820,33 +1424,20 @@ def open_workbook_2007_xml(
     sst_fname = 'xl/sharedstrings.xml'
     x12sst = X12SST(bk, logfile, verbosity)
     if sst_fname in component_names:
-        zflo = zf.open(component_names[sst_fname])
-        x12sst.process_stream(zflo, 'SST')
-        del zflo
-
-    for sheetx in range(bk.nsheets):
-        fname = x12book.sheet_targets[sheetx]
-        zflo = zf.open(component_names[fname])
-        sheet = bk._sheet_list[sheetx]
-        x12sheet = X12Sheet(sheet, logfile, verbosity)
-        heading = "Sheet %r (sheetx=%d) from %r" % (sheet.name, sheetx, fname)
-        x12sheet.process_stream(zflo, heading)
-        del zflo
-
-        rels_fname = 'xl/worksheets/_rels/%s.rels' % fname.rsplit('/', 1)[-1]
-        if rels_fname in component_names:
-            zfrels = zf.open(rels_fname)
-            x12sheet.process_rels(zfrels)
-            del zfrels
-
-        for relid, reltype in x12sheet.relid2reltype.items():
-            if reltype == 'comments':
-                comments_fname = x12sheet.relid2path.get(relid)
-                if comments_fname and comments_fname in component_names:
-                    comments_stream = zf.open(comments_fname)
-                    x12sheet.process_comments_stream(comments_stream)
-                    del comments_stream
+        if lazy_sst:
+            x12sst.process_data_lazy(zf.read(component_names[sst_fname]), 'SST')
+        else:
+            zflo = zf.open(component_names[sst_fname])
+            x12sst.process_stream(zflo, 'SST')
+            del zflo
 
-        sheet.tidy_dimensions()
+    if on_demand:
+        # worksheets are parsed by Book.get_sheet() when first requested
+        bk._sheet_loader = x12book
+    elif sheet_workers > 1 and bk.nsheets > 1 and stop_at_row is None and (filename or file_contents):
+        x12book.get_sheets_parallel(sheet_workers, filename, file_contents)
+    else:
+        for sheetx in range(bk.nsheets):
+            x12book.get_sheet(sheetx)
 
     return bk
@@ -1,7 +1,17 @@
 # coding:utf-8
+import os
+import re
 import sys
+import time
 import xlrd
 import codecs
+import getopt
+import itertools
+import fnmatch
+import shutil
+import hashlib
+import traceback
+import multiprocessing
 reload(sys)
 sys.setdefaultencoding( "utf-8" )
 type = sys.getfilesystemencoding()
@@ -16,6 +26,9 @@ type_string = 'string'
 type_function = 'function'
 type_table = 'table'
 
+# 输出文件缓冲区大小
+output_buffer_size = 1 << 16
+
 # 定义简单类型
 simple_type_def = {
     type_int: True,
@@ -64,21 +77,18 @@ def eval_error(msg):
     exit(2)
 
 
+# 字符串中需要转义的字符
+quout_escape_pattern = re.compile(u'["\\\\\n\r]')
+
+
 # 为字符串内容添加双引号
 def add_quout(text):
-    out = ''
-    for c in text:
-        if c == '"':
-            out += '\\"'
-        elif c == '\\':
-            out += '\\\\'
-        elif c == '\n':
-            out += '\\n'
-        elif c == '\r':
-            out += '\\r'
-        else:
-            out += c
-    return '"' + out + '"'
+    # 大部分单元格文本不含需要转义的字符，直接添加引号
+    if quout_escape_pattern.search(text) is None:
+        return '"' + text + '"'
+    # 反斜杠必须最先转义，避免重复转义后续添加的反斜杠
+    text = text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+    return '"' + text + '"'
 
 
 # 表头符号，每个符号由类型和名字组成，用于构造表格数据结构
@@ -107,8 +117,7 @@ class NodeParser:
         self.required = None           # 该节点必须有值，对于容器类型则表示全部子项为空时仍会输出容器节点本身
         self.unique = None
         self.token = token
-        self.eval_table = {}           # 求值存档
-        self.unique_check = {}         # 重复检查
+        self.unique_check = {}         # 重复检查，由UniqueIndex按字段路径在各sheet间共享
         if token is not None:
             self.begin_col = token.col
             self.end_col = token.col
@@ -127,99 +136,122 @@ class NodeParser:
                 return value
         return None
 
-    def is_all_member_nil(self, row, row_cells):
-        for _, m in self.members:
-            if m.eval(row, row_cells) != 'nil':
-                return False
-        return True
-
-    def eval(self, coord, row_data):
-        if coord in self.eval_table:
-            return self.eval_table[coord]
+    # 编译节点，生成按行求值的函数，求值时不再逐节点判断类型
+    def compile(self):
+        if self.type == type_array or self.type == type_dict:
+            emitters = self.compile_members()
+            join = self.compile_join()
 
-        eval_str = 'nil'
-        # 单列类型空值处理
-        if (self.type != type_array and self.type != type_dict) and row_data[self.begin_col].value == '':
-            eval_str = 'nil'
+            # 子项的求值结果只在本行内使用，拼接后即丢弃
+            def emit(coord, row_data):
+                return join([member_emit(coord, row_data) for member_emit in emitters])
         else:
-            if self.type == type_int:
-                val = row_data[self.begin_col].value
-                i = int(val)
-                eval_str = str(i)
-            elif self.type == type_string:
-                val = row_data[self.begin_col].value
-                if val == '':
-                    eval_str = 'nil'
-                else:
-                    eval_str = add_quout(val)
-            elif self.type == type_number:
-                val = row_data[self.begin_col].value
-                eval_str = str('%g' % val)
-            elif self.type == type_bool:
-                val = row_data[self.begin_col].value
+            emit = self.compile_simple()
+        return self.compile_check(emit)
+
+    # 编译根节点，返回的函数按行求值得到(主键, 行数据)
+    def compile_row(self):
+        emitters = self.compile_members()
+        join = self.compile_join()
+
+        def emit_row(coord, row_data):
+            evals = [member_emit(coord, row_data) for member_emit in emitters]
+            return evals[0], join(evals)    # 约定第一项为key，只求值一次
+        return emit_row
+
+    # 编译各子项，返回子项求值函数的元组
+    def compile_members(self):
+        return tuple(m.compile() for _, m in self.members)
+
+    # 编译容器拼接函数
+    def compile_join(self):
+        # 全部子项为空，且该节点为可选类型，则不输出
+        empty_str = '{}' if self.required else 'nil'
+        if self.type == type_array:
+            def join(evals):
+                if evals.count('nil') == len(evals):
+                    return empty_str
+                return '{' + ','.join(evals) + '}'
+        else:
+            # 预先拼好"key="前缀，求值时不再格式化
+            prefixes = tuple(key + '=' for key, _ in self.members)
+
+            def join(evals):
+                fields = [prefix + meval for prefix, meval in zip(prefixes, evals) if meval != 'nil']
+                if fields:
+                    return '{' + ','.join(fields) + '}'
+                return empty_str
+        return join
+
+    def compile_simple(self):
+        col = self.begin_col
+        if self.type == type_int:
+            def convert(val):
+                return str(int(val))
+        elif self.type == type_string:
+            convert = add_quout
+        elif self.type == type_number:
+            def convert(val):
+                return str('%g' % val)
+        elif self.type == type_bool:
+            def convert(val):
                 lower_str = str(val).lower()
                 if lower_str == '0' or lower_str == 'false':
-                    eval_str = 'false'
-                else:
-                    eval_str = 'true'
-            elif self.type == type_table:
-                val = row_data[self.begin_col].value
-                eval_str = '{' + val + '}'
-            elif self.type == type_function:
-                val = row_data[self.begin_col].value
-                eval_str = '%s return %s end' % (self.token.decl_type, val)
-            elif self.type == type_array:
-                all_member_nil = self.is_all_member_nil(coord, row_data)
-                # 全部子项为空，且该节点为可选类型，则不输出
-                if all_member_nil and not self.required:
-                    eval_str = 'nil'
-                elif all_member_nil:
-                    eval_str = '{}'
-                else:
-                    eval_str = '{'
-                    mcount = len(self.members)
-                    for i in range(mcount):
-                        (_, m) = self.members[i]
-                        eval_str += m.eval(coord, row_data)
-                        eval_str += ','
-                    if eval_str.endswith(','):
-                        eval_str = eval_str[:-1]
-                    eval_str += '}'
-            elif self.type == type_dict:
-                all_member_nil = self.is_all_member_nil(coord, row_data)
-                # 全部子项为空，且该节点为可选类型，则不输出
-                if all_member_nil and not self.required:
-                    eval_str = 'nil'
-                elif all_member_nil:
-                    eval_str = '{}'
-                else:
-                    eval_str = '{'
-                    mcount = len(self.members)
-                    for i in range(mcount):
-                        (key, m) = self.members[i]
-                        meval = m.eval(coord, row_data)
-                        if meval != 'nil':
-                            eval_str += '%s=%s' % (key, meval)
-                            eval_str += ','
-                    if eval_str.endswith(','):
-                        eval_str = eval_str[:-1]
-                    eval_str += '}'
-            else:
-                eval_error('无法求值列%s未知类型%s' % (to_xls_col(self.begin_col), str(self.type)))
+                    return 'false'
+                return 'true'
+        elif self.type == type_table:
+            def convert(val):
+                return '{' + val + '}'
+        elif self.type == type_function:
+            decl_type = self.token.decl_type
+
+            def convert(val):
+                return '%s return %s end' % (decl_type, val)
+        else:
+            eval_error('无法求值列%s未知类型%s' % (to_xls_col(self.begin_col), str(self.type)))
+            return None
 
-        # 空值检查
-        if self.required and eval_str == 'nil':
-            eval_error('列%s项%s类型节点不能为空' % (to_xls_col(self.begin_col), str(self.type)))
+        # 单列类型空值处理
+        def emit(coord, row_data):
+            val = row_data[col]
+            if val == '':
+                return 'nil'
+            return convert(val)
+        return emit
+
+    # 为求值函数附加空值检查和重复赋值检查
+    def compile_check(self, emit):
+        # 必须有值的容器为空时拼接为{}，不会求值为nil，不需要空值检查
+        check_required = self.required and self.type != type_array and self.type != type_dict
+        if not check_required and not self.unique:
+            return emit
+        col_name = to_xls_col(self.begin_col)
+        node_type = str(self.type)
 
-        # 重复赋值检查
-        if self.unique:
-            if eval_str in self.unique_check:
-                exist_coord = self.unique_check[eval_str]
+        # 空值检查
+        if not self.unique:
+            def emit_checked(coord, row_data):
+                eval_str = emit(coord, row_data)
+                if eval_str == 'nil':
+                    eval_error('列%s项%s类型节点不能为空' % (col_name, node_type))
+                return eval_str
+            return emit_checked
+
+        # 重复赋值检查，unique_check已由UniqueIndex.bind指向全局索引
+        unique_check = self.unique_check
+        name = str(self.token.name)
+
+        def emit_checked(coord, row_data):
+            eval_str = emit(coord, row_data)
+            if check_required and eval_str == 'nil':
+                eval_error('列%s项%s类型节点不能为空' % (col_name, node_type))
+            exist_coord = unique_check.get(eval_str)
+            if exist_coord is not None:
                 eval_error('列%s项%s表%s第%d行与表%s第%d行重复赋值' %
-                           (to_xls_col(self.begin_col), str(self.token.name), str(coord[0]), coord[1], str(exist_coord[0]), exist_coord[1]))
-            self.unique_check[eval_str] = coord
-        self.eval_table[coord] = eval_str
-        return eval_str
+                           (col_name, name, str(coord[0]), coord[1], str(exist_coord[0]), exist_coord[1]))
+            unique_check[eval_str] = coord
+            return eval_str
+        return emit_checked
 
     # 塌陷解析树，将所有子节点平铺
     def flat(self):
@@ -227,9 +259,13 @@ class NodeParser:
         self.__flat__(None, self.flat_fields)
 
     def __flat__(self, prefix_path, flat_paths):
-        for name, m in self.members:
-            path = name
-            if prefix_path is not None:
+        for i, (name, m) in enumerate(self.members):
+            if self.type == type_array and not name:
+                # 数组元素没有名字，以下标作为路径
+                path = '%s[%d]' % (prefix_path or '', i + 1)
+            elif prefix_path is None:
+                path = name
+            else:
                 path = prefix_path + '.' + name
             flat_paths[path] = m
             m.__flat__(path, flat_paths)
@@ -354,98 +390,450 @@ class SheetParser:
             cur = self.cur_token()
 
 
-# 读取xls文件内容，并过滤注释行
-def read_sheets_from_xls(file_path):
-    workbook = xlrd.open_workbook(file_path)
+# 表头行数，依次为修饰、类型、名字
+header_row_count = 3
+
+
+# 判断是否有效行，全空白行和注释行都会被过滤
+def is_data_row(values):
+    # 过滤全空白行
+    all_empty = True
+    for v in values:
+        if v != '':
+            all_empty = False
+            break
+    if all_empty:
+        return False
+    text = values[0]
+    # 过滤注释行
+    if isinstance(text, unicode) and text.startswith('//'):
+        return False
+    return True
+
+
+# 只读取表头时使用，各sheet读够表头行数后即停止读取该sheet剩余的行
+class HeaderProbe:
+    def __init__(self, row_count):
+        self.row_count = row_count
+        self.progress = {}             # sheet序号 -> (下一个待检查的行, 已读到的有效行数)
+
+    def __call__(self, sheet, rowx):
+        next_rowx, count = self.progress.get(sheet.number, (0, 0))
+        end_rowx = min(rowx + 1, sheet.nrows)
+        for y in range(next_rowx, end_rowx):
+            if is_data_row(sheet.row_values(y)):
+                count += 1
+        self.progress[sheet.number] = (max(next_rowx, end_rowx), count)
+        return count >= self.row_count
+
+
+# sheet选择器，include和exclude为sheet名通配符列表，未被选中的sheet不会被解析
+class SheetFilter:
+    def __init__(self, include=None, exclude=None):
+        self.include = include
+        self.exclude = exclude
+
+    def __call__(self, sheet_name):
+        if self.include and not any(fnmatch.fnmatchcase(sheet_name, p) for p in self.include):
+            return False
+        if self.exclude and any(fnmatch.fnmatchcase(sheet_name, p) for p in self.exclude):
+            return False
+        return True
+
+    # 用于增量导出缓存的键，选择条件不同时导出结果不同
+    def cache_key(self):
+        return repr((self.include, self.exclude))
+
+
+# 读取xls文件内容，并过滤注释行，返回[(sheet名, 各行单元格的值, 各行在excel中的行号)]
+# header_only为真时每个sheet只读取表头，sheet_filter为sheet名的判断函数，未选中的sheet不会被读取
+def read_sheets_from_xls(file_path, header_only=False, sheet_filter=None):
+    stop_at_row = None
+    if header_only:
+        stop_at_row = HeaderProbe(header_row_count)
+    # 只读取部分内容时，共享字符串表只解码用到的字符串
+    lazy_sst = header_only or sheet_filter is not None
+    workbook = xlrd.open_workbook(file_path, stop_at_row=stop_at_row, sheet_filter=sheet_filter,
+                                  lazy_sst=lazy_sst)
     sheets = []
     for sheet in workbook.sheets():
         if sheet.ncols <= 0:
             continue
         cells = []
+        row_numbers = []
         for y in range(0, sheet.nrows):
-            # 过滤全空白行
-            all_empty = True
-            for v in sheet.row_values(y):
-                if v != '':
-                    all_empty = False
-                    break
-            if all_empty:
-                continue
-            text = sheet.cell_value(y, 0)
-            # 过滤注释行
-            if isinstance(text, unicode) and text.startswith('//'):
+            # 只读取单元格的值，不构造Cell对象
+            values = sheet.row_values(y)
+            if not is_data_row(values):
                 continue
-            cells.append(sheet.row(y))
+            cells.append(values)
+            row_numbers.append(y + 1)
+            if header_only and len(cells) >= header_row_count:
+                break
         if len(cells) > 0:
-            sheets.append((sheet.name, cells))
+            sheets.append((sheet.name, cells, row_numbers))
     return sheets
 
 
+# 逐行读取sheet，过滤空白行和注释行，生成(在excel中的行号, 各单元格的值)
+def iter_data_rows(workbook, sheet_name):
+    for rowx, values in workbook.iter_rows(sheet_name):
+        if is_data_row(values):
+            yield rowx + 1, values
+
+
+# 只读取表头构造各sheet的解析树，返回[(sheet名, 解析树)]，数据行不会被解析
+def probe_headers(file_path, sheet_filter=None):
+    return [(sheet_name, build_parser_tree(sheet_name, cells))
+            for sheet_name, cells, _ in read_sheets_from_xls(file_path, True, sheet_filter)]
+
+
 def build_parser_tree(sheet_name, sheet_cells):
     ts = []
     for col in range(len(sheet_cells[0])):
-        option = sheet_cells[0][col].value
-        decl_type = sheet_cells[1][col].value
-        name = sheet_cells[2][col].value
+        option = sheet_cells[0][col]
+        decl_type = sheet_cells[1][col]
+        name = sheet_cells[2][col]
         t = Token(option, decl_type, name, col, sheet_name)
         ts.append(t)
     sp = SheetParser(ts)
     return sp.root_parser
 
 
-def parser_check(from_sheet_name, from_ps, to_sheet_name, to_ps):
-    for path, m in from_ps.flat_fields.items():
-        if not m.unique:
+# 全局唯一值索引，记录unique字段每个取值首次出现的位置，求值时即可发现表内及跨表的重复
+class UniqueIndex:
+    def __init__(self):
+        self.fields = {}               # 字段路径 -> {值: (sheet名, 行号)}
+        self.field_sheets = {}         # 字段路径 -> 首个定义该unique字段的sheet名
+
+    # 检查所有sheet都定义了其他sheet中的unique字段，并将unique节点的重复检查表指向全局索引
+    def bind(self, parsers):
+        for sheet_name, parser in parsers:
+            for path, m in parser.flat_fields.items():
+                if m.unique and path not in self.field_sheets:
+                    self.field_sheets[path] = sheet_name
+        for sheet_name, parser in parsers:
+            for path in self.field_sheets:
+                if path not in parser.flat_fields:
+                    parse_error('unique field %s not define in sheet %s' % (path, sheet_name))
+            for path, m in parser.flat_fields.items():
+                if m.unique:
+                    m.unique_check = self.fields.setdefault(path, {})
+
+
+# 输出器，将lua内容逐段写入可写对象，不在内存中拼接整个文件
+class LuaWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def begin(self):
+        self.stream.write('{\n')
+
+    def begin_sheet(self, sheet_name):
+        self.stream.write('--%s\n' % sheet_name)
+
+    def write_row(self, key, value):
+        self.stream.write('[%s]=%s,\n' % (key, value))
+
+    def end(self):
+        self.stream.write('}')
+
+
+# 求值并将结果写入输出器
+def export_lua(file_path, writer, sheet_filter=None, sheet_jobs=0):
+    # 逐行解析并求值，不在内存中保存整个sheet；sheet_jobs大于1时各sheet先由多个进程并行解析，
+    # 这时整个文件都在内存中，单元格按列紧凑存储；只导出部分sheet时，共享字符串表只解码用到的字符串
+    workbook = xlrd.open_workbook(file_path, on_demand=sheet_jobs <= 1, sheet_filter=sheet_filter,
+                                  sheet_workers=sheet_jobs, compact_cells=sheet_jobs > 1,
+                                  lazy_sst=sheet_filter is not None)
+    sheets = []
+    for sheet_name in workbook.sheet_names():
+        rows = iter_data_rows(workbook, sheet_name)    # 过滤注释行
+        header = [values for _, values in itertools.islice(rows, header_row_count)]
+        if len(header) == 0:
             continue
-        if path not in to_ps.flat_fields:
-            parse_error('unique field %s not define in sheet %s' % (path, to_sheet_name))
-        else:
-            unique_node = to_ps.flat_fields[path]
-            for eval_str in unique_node.unique_check.keys():
-                if eval_str in m.unique_check:
-                    eval_error('sheet %s unique field %s val=%s is dup to sheet %s' %
-                               (from_sheet_name, path, eval_str, to_sheet_name))
-
-
-def xls2lua(file_path, out_file_path):
-    sheets = read_sheets_from_xls(file_path)    # 过滤注释行
-    exist_parsers = {}
-
-    # 求值
-    out = '{\n'
-    for sheet_name, cells in sheets:
-        parser = build_parser_tree(sheet_name, cells)
-        exist_parsers[sheet_name] = parser
-        _, key_node = parser.members[0]    # 约定第一项为key
-        out += '--%s\n' % sheet_name
-        for row in range(3, len(cells)):
-            row_data = cells[row]
-            coord = (sheet_name, row)
-            out += '[%s]=%s,\n' % (key_node.eval(coord, row_data), parser.eval(coord, row_data))
-    out += '}'
-
-    # 交叉检查
-    for from_name, from_ps in exist_parsers.items():
-        for to_name, to_ps in exist_parsers.items():
-            if from_ps == to_ps:
-                continue
-            parser_check(from_name, from_ps, to_name, to_ps)
-            parser_check(to_name, to_ps, from_name, from_ps)
+        width = max(len(values) for values in header)
+        for values in header:
+            values.extend([''] * (width - len(values)))
+        sheets.append((sheet_name, header, rows))
+    parsers = [(sheet_name, build_parser_tree(sheet_name, header)) for sheet_name, header, _ in sheets]
+
+    # unique字段在求值时通过全局索引检查表内及跨表重复
+    unique_index = UniqueIndex()
+    unique_index.bind(parsers)
+
+    # 求值，每读到一行即求值并写出
+    writer.begin()
+    for (sheet_name, header, rows), (_, parser) in zip(sheets, parsers):
+        width = len(header[0])
+        emit_row = parser.compile_row()
+        writer.begin_sheet(sheet_name)
+        for row_number, values in rows:
+            if len(values) < width:
+                values.extend([''] * (width - len(values)))
+            elif len(values) > width:
+                # 数据行超出表头的列没有变量名，与按整个sheet的列数读取表头时的错误一致
+                parse_error('解析列%d的%s类型元素时,遇到位于列%d的元素缺少变量名' % (parser.begin_col, parser.type, width))
+            key, value = emit_row((sheet_name, row_number), values)
+            writer.write_row(key, value)
+    writer.end()
+    workbook.release_resources()
+
+
+# 用src文件替换dst文件，posix下rename直接覆盖目标文件，替换是原子的，不会丢失原来的输出；
+# windows下rename不能覆盖已有文件，只能先删除
+def replace_file(src, dst):
+    if os.name == 'nt' and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+cached_tool_version = None
+
+
+# 工具版本，由脚本内容、xlrd版本和xlrd各源文件的内容计算，脚本或xlrd修改后缓存自动失效
+def tool_version():
+    global cached_tool_version
+    if cached_tool_version is None:
+        h = hashlib.sha1(xlrd.__VERSION__)
+        source_files = [os.path.splitext(os.path.abspath(__file__))[0] + '.py']
+        xlrd_dir = os.path.dirname(os.path.abspath(xlrd.__file__))
+        source_files += [os.path.join(xlrd_dir, name) for name in sorted(os.listdir(xlrd_dir))
+                         if name.endswith('.py')]
+        for source_file in source_files:
+            h.update(os.path.basename(source_file))
+            with open(source_file, 'rb') as f:
+                h.update(f.read())
+        cached_tool_version = h.hexdigest()
+    return cached_tool_version
+
+
+# 增量导出缓存，以表格文件内容和工具版本的哈希为键，保存导出的lua
+# unique字段的表内及跨表检查在生成缓存项时已经完成，缓存项只在文件内容不变时使用，不需要再检查
+class BuildCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError:
+                # 批量导出时其他进程可能已经创建
+                if not os.path.isdir(cache_dir):
+                    raise
+
+    def make_key(self, file_path, sheet_filter=None):
+        h = hashlib.sha1(tool_version())
+        if sheet_filter is not None:
+            h.update(sheet_filter.cache_key())
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(output_buffer_size)
+                if not chunk:
+                    break
+                h.update(chunk)
+        return h.hexdigest()
+
+    def entry_path(self, key, ext):
+        return os.path.join(self.cache_dir, key + ext)
+
+    # 命中时将缓存的lua复制到输出文件并返回True，未命中返回False
+    def load(self, key, out_file_path):
+        lua_path = self.entry_path(key, '.lua')
+        if not os.path.exists(lua_path):
+            return False
+        tmp_file_path = out_file_path + '.tmp'
+        shutil.copyfile(lua_path, tmp_file_path)
+        replace_file(tmp_file_path, out_file_path)
+        return True
 
-    # 输出文件
-    with codecs.open(out_file_path, "w+", "utf-8") as f:
-        f.write(out)
+    # 先写入临时文件再改名，其他进程不会读到不完整的缓存项
+    def save(self, key, out_file_path):
+        lua_path = self.entry_path(key, '.lua')
+        tmp_path = lua_path + '.%d.tmp' % os.getpid()
+        shutil.copyfile(out_file_path, tmp_path)
+        replace_file(tmp_path, lua_path)
+
+
+# 导出表格，返回是否命中缓存
+def xls2lua(file_path, out_file_path, cache_dir=None, sheet_filter=None, sheet_jobs=0):
+    cache = None
+    if cache_dir is not None:
+        cache = BuildCache(cache_dir)
+        cache_key = cache.make_key(file_path, sheet_filter)
+        if cache.load(cache_key, out_file_path):
+            return True
+
+    # 先写入临时文件，检查全部通过后再替换目标文件，避免出错时留下不完整的输出
+    tmp_file_path = out_file_path + '.tmp'
+    try:
+        with codecs.open(tmp_file_path, 'w+', 'utf-8', buffering=output_buffer_size) as f:
+            export_lua(file_path, LuaWriter(f), sheet_filter, sheet_jobs)
+    except BaseException:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+        raise
+    replace_file(tmp_file_path, out_file_path)
+
+    if cache is not None:
+        cache.save(cache_key, out_file_path)
+    return False
+
+
+# 批量导出时单个文件的任务，在工作进程中执行
+def batch_task(task):
+    input_file, output_file, cache_dir, sheet_filter = task
+    start = time.time()
+    error = None
+    cached = False
+    try:
+        cached = xls2lua(input_file, output_file, cache_dir, sheet_filter)
+    except SystemExit as e:
+        # 解析和求值错误会调用exit，错误信息已经输出
+        error = 'exit code %s' % e.code
+    except Exception:
+        error = traceback.format_exc()
+    return input_file, time.time() - start, cached, error
+
+
+# 收集批量导出的文件，source为目录或每行一个文件路径的列表文件
+def collect_batch_files(source, output_dir):
+    if os.path.isdir(source):
+        input_files = []
+        for name in sorted(os.listdir(source)):
+            # 跳过excel打开文件时生成的临时文件
+            if name.startswith('~$'):
+                continue
+            if os.path.splitext(name)[1].lower() in ('.xls', '.xlsx'):
+                input_files.append(os.path.join(source, name))
+    else:
+        with open(source) as f:
+            input_files = [line.strip() for line in f if line.strip() != '' and not line.startswith('#')]
+    outputs = []
+    for input_file in input_files:
+        name = os.path.splitext(os.path.basename(input_file))[0]
+        outputs.append((input_file, os.path.join(output_dir, name + '.lua')))
+    return outputs
+
+
+# 检查是否有多个输入文件输出到同一个文件，如a.xls和a.xlsx，或列表文件中不同目录下的同名文件，
+# 这些文件并行导出时会写同一个临时文件，有重复时输出全部冲突并退出程序
+def check_batch_outputs(files):
+    inputs_by_output = {}
+    for input_file, output_file in files:
+        key = os.path.normcase(os.path.abspath(output_file))
+        inputs_by_output.setdefault(key, (output_file, []))[1].append(input_file)
+    conflicts = [(output_file, input_files) for output_file, input_files in inputs_by_output.values()
+                 if len(input_files) > 1]
+    if not conflicts:
+        return
+    for output_file, input_files in sorted(conflicts):
+        print '[batch error]%s <- %s' % (output_file, ', '.join(input_files))
+    print '[batch error]%s' % '以上输入文件的文件名相同，会导出到同一个文件'.decode('utf-8').encode(type)
+    exit(4)
+
+
+# 使用进程池批量导出，返回失败的文件数
+def batch_xls2lua(source, output_dir, jobs=None, cache_dir=None, sheet_filter=None):
+    files = collect_batch_files(source, output_dir)
+    check_batch_outputs(files)
+    tasks = [(input_file, output_file, cache_dir, sheet_filter) for input_file, output_file in files]
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    start = time.time()
+    if jobs == 1:
+        results = [batch_task(t) for t in tasks]
+    else:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            results = pool.map(batch_task, tasks, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+    failures = 0
+    for input_file, cost, cached, error in results:
+        if error is not None:
+            failures += 1
+            print '[failed]%s %.3fs %s' % (input_file, cost, error)
+        elif cached:
+            print '[cached]%s %.3fs' % (input_file, cost)
+        else:
+            print '[ok]%s %.3fs' % (input_file, cost)
+    print '%d files, %d failed, %.3fs' % (len(results), failures, time.time() - start)
+    return failures
+
+
+# 输出用法并退出程序，选项组合无效时exit_code为2
+def usage(exit_code=3):
+    print 'usage: xls2lua.py [options] <input_file> <output_file>'
+    print '       xls2lua.py --batch [options] <input_dir|list_file> <output_dir> [jobs]'
+    print 'options:'
+    print '  --cache <cache_dir>          skip workbooks unchanged since the last export'
+    print '  --sheets <pattern,...>       only export sheets whose names match a pattern'
+    print '  --exclude-sheets <pattern,...>  do not export sheets whose names match a pattern'
+    print '  --sheet-jobs <n>             parse the sheets in n processes (not with --batch)'
+    exit(exit_code)
+
+
+# 在一处检查选项和参数的组合，无效时输出用法并退出程序，参数不足时退出码为3，其余为2
+# 新增选项时需要在这里声明各模式是否支持，避免批量导出接受不生效的选项
+def check_options(options, args):
+    def check_positive_int(name, value):
+        try:
+            if int(value) > 0:
+                return
+        except ValueError:
+            pass
+        print '%s must be a positive integer: %s' % (name, value)
+        usage(2)
+
+    if '--batch' in options:
+        # 批量导出已按文件并行
+        if '--sheet-jobs' in options:
+            print '--sheet-jobs can not be used with --batch'
+            usage(2)
+        max_args = 3
+    else:
+        if '--sheet-jobs' in options:
+            check_positive_int('--sheet-jobs', options['--sheet-jobs'])
+        max_args = 2
+    if len(args) < 2:
+        usage()
+    if len(args) > max_args:
+        print 'unexpected arguments: %s' % ' '.join(args[max_args:])
+        usage(2)
+    if len(args) > 2:
+        check_positive_int('jobs', args[2])
 
 
 def main(argv):
-    argc = len(argv)
-    if argc < 3:
-        print 'usage: xls2lua.py <input_file> <output_file>'
-        exit(3)
+    try:
+        opts, args = getopt.getopt(argv[1:], '', ['batch', 'cache=', 'sheets=', 'exclude-sheets=', 'sheet-jobs='])
+    except getopt.GetoptError as e:
+        print e
+        usage(2)
+    options = dict(opts)
+    check_options(options, args)
+    cache_dir = options.get('--cache')
+    sheet_filter = None
+    if '--sheets' in options or '--exclude-sheets' in options:
+        include = None
+        exclude = None
+        if '--sheets' in options:
+            include = tuple(options['--sheets'].decode(type).split(','))
+        if '--exclude-sheets' in options:
+            exclude = tuple(options['--exclude-sheets'].decode(type).split(','))
+        sheet_filter = SheetFilter(include, exclude)
+    if '--batch' in options:
+        jobs = None
+        if len(args) > 2:
+            jobs = int(args[2])
+        if batch_xls2lua(args[0], args[1], jobs, cache_dir, sheet_filter) > 0:
+            exit(4)
     else:
-        input_file = argv[1]
-        output_file = argv[2]
-        xls2lua(input_file, output_file)
+        sheet_jobs = int(options.get('--sheet-jobs', 0))
+        xls2lua(args[0], args[1], cache_dir, sheet_filter, sheet_jobs)
 
 
 if __name__ == '__main__':